@@ -0,0 +1,75 @@
+"""Benchmark computing the bboxes of a page of item footprints.
+
+Compares the previous per-coordinate loops with the current min/max over each axis, for a page of polygons with
+increasing numbers of vertices, from simple PSScene footprints to detailed SkySat ones.
+
+Usage:
+    uv run python benchmarks/bbox.py [page size] [iterations]
+"""
+
+import math
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from stac_planet_api.geometry import get_bbox
+
+VERTICES = [5, 50, 500, 5000]
+
+
+def previous_line(coordinates: list[list[float]]) -> list[float]:
+    """The previous line bbox, which compared every coordinate in Python."""
+    bbox = [coordinates[0][0], coordinates[0][1], coordinates[0][0], coordinates[0][1]]
+
+    for coordinate in coordinates[1:]:
+        if coordinate[0] < bbox[0]:
+            bbox[0] = coordinate[0]
+        elif coordinate[0] > bbox[2]:
+            bbox[2] = coordinate[0]
+
+        if coordinate[1] < bbox[1]:
+            bbox[1] = coordinate[1]
+        elif coordinate[1] > bbox[3]:
+            bbox[3] = coordinate[1]
+
+    return bbox
+
+
+def previous_get_bboxes(geometries: list[dict[str, Any]]) -> list[list[float]]:
+    """The previous polygon bbox, called for each item in turn."""
+    return [previous_line(geometry["coordinates"][0][1:]) for geometry in geometries]
+
+
+def footprint(vertices: int, offset: float) -> dict[str, Any]:
+    ring = [
+        [offset + math.cos(2 * math.pi * i / vertices), math.sin(2 * math.pi * i / vertices)] for i in range(vertices)
+    ]
+    return {"type": "Polygon", "coordinates": [[*ring, ring[0]]]}
+
+
+def seconds_per_page(
+    function: Callable[[list[dict[str, Any]]], Any], geometries: list[dict[str, Any]], iterations: int
+) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(geometries)
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 250
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print(f"{'vertices':>8} {'previous':>12} {'current':>12}")
+    for vertices in VERTICES:
+        geometries = [footprint(vertices, offset=i) for i in range(page_size)]
+
+        previous = seconds_per_page(previous_get_bboxes, geometries, iterations)
+        current = seconds_per_page(lambda page: [get_bbox(geometry) for geometry in page], geometries, iterations)
+
+        print(f"{vertices:>8} {previous * 1e3:>10.2f}ms {current * 1e3:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark translating CQL2 filters to Planet filters.
+
+Compares the previous translator, which converted every child of an `and`/`or` twice and so grew exponentially with
+nesting depth, with the single-pass translator and its memoised entry point.
+
+Usage:
+    uv run python benchmarks/cql2_translation.py [max depth] [iterations]
+"""
+
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from stac_planet_api.request_adaptor import (
+    _convert_canonical_filter,
+    comparison_filter,
+    convert_filter,
+    translate_filter,
+)
+
+CLOUD_COVER = {"op": "<=", "args": [{"property": "cloud_cover"}, 0.1]}
+
+
+def previous_convert_filter(stac_filter: dict[str, Any]) -> dict[str, Any] | None:
+    """The translation of `and`/`or` before it was compiled, reduced to comparisons."""
+    if stac_filter["op"] in ["and", "or"]:
+        config = []
+        for sub_filter in stac_filter["args"]:
+            if previous_convert_filter(sub_filter) is not None:
+                config.append(previous_convert_filter(sub_filter))
+        return {"type": f"{stac_filter['op'].title()}Filter", "config": config}
+
+    return comparison_filter(stac_filter)
+
+
+def nested_filter(depth: int) -> dict[str, Any]:
+    stac_filter: dict[str, Any] = CLOUD_COVER
+    for level in range(depth):
+        stac_filter = {"op": "and" if level % 2 else "or", "args": [stac_filter, CLOUD_COVER]}
+    return stac_filter
+
+
+def seconds_per_call(function: Callable[[dict[str, Any]], Any], stac_filter: dict[str, Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(stac_filter)
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print(f"{'depth':>5} {'previous':>12} {'single pass':>12} {'memoised':>12}")
+    for depth in range(2, max_depth + 1, 2):
+        stac_filter = nested_filter(depth)
+        _convert_canonical_filter.cache_clear()
+        convert_filter(stac_filter)
+
+        previous = seconds_per_call(previous_convert_filter, stac_filter, iterations)
+        single_pass = seconds_per_call(translate_filter, stac_filter, iterations)
+        cached = seconds_per_call(convert_filter, stac_filter, iterations)
+
+        print(f"{depth:>5} {previous * 1e6:>10.1f}us {single_pass * 1e6:>10.1f}us {cached * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
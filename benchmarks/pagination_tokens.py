@@ -0,0 +1,79 @@
+"""Benchmark encoding and decoding pagination tokens.
+
+Compares the previous Fernet tokens, encrypted for every next and previous link and decrypted for every follow-up,
+with the compact tokens, both uncached and memoised as they are when the same page is served or followed again.
+
+Usage:
+    uv run python benchmarks/pagination_tokens.py [iterations]
+"""
+
+import sys
+import time
+from collections.abc import Callable
+
+import orjson
+from cryptography.fernet import Fernet
+
+from stac_planet_api.tokens import TokenCodec
+
+KEY = Fernet.generate_key().decode()
+API_KEY = "PLAK0123456789abcdef0123456789abcdef"
+LINK = (
+    "https://api.planet.com/data/v1/searches/0f1e2d3c4b5a69788796a5b4c3d2e1f0/results?_page="
+    "eyJxdWVyeV9wYXJhbXMiOiB7fSwgInNvcnRfYnkiOiAiYWNxdWlyZWQiLCAic29ydF9kZXNjIjogdHJ1ZSwgInNvcnRfc3RhcnQiOiAiMjAyNC0w"
+    "MS0wMVQwMDowMDowMC4wMDAwMDBaIiwgInNvcnRfbGFzdF9pZCI6ICIyMDI0MDEwMV8xMDAwMDBfMTJfMjRjZiJ9"
+    "&_page_size=250&_sort=acquired+desc"
+)
+RESIDUAL = {"op": "s_intersects", "args": [{"property": "geometry"}, {"type": "Point", "coordinates": [0.5, 51.5]}]}
+
+
+def previous_encode(fernet: Fernet, link: str, residual_json: bytes) -> bytes:
+    """The previous token, the link, key and residual filter encrypted with Fernet."""
+    return fernet.encrypt(f"{link}\\{API_KEY}\\{residual_json.decode()}".encode())
+
+
+def previous_decode(fernet: Fernet, token: bytes) -> list[str]:
+    return fernet.decrypt(token).decode().split("\\", 2)
+
+
+def per_second(function: Callable[[int], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        function(i)
+    return iterations / (time.perf_counter() - start)
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    fernet = Fernet(KEY)
+    residual_json = orjson.dumps(RESIDUAL)
+    links = [f"{LINK}&n={i}" for i in range(iterations)]
+
+    previous_tokens = [previous_encode(fernet, link, residual_json) for link in links]
+    codec = TokenCodec(KEY, cache_size=0)
+    tokens = [codec.encode(link, API_KEY, residual_json) for link in links]
+    memoised = TokenCodec(KEY, cache_size=iterations)
+
+    print(f"{'':>10} {'length':>8} {'encode/s':>12} {'decode/s':>12}")
+    print(
+        f"{'previous':>10} {len(previous_tokens[0]):>8} "
+        f"{per_second(lambda i: previous_encode(fernet, links[i], residual_json), iterations):>12.0f} "
+        f"{per_second(lambda i: previous_decode(fernet, previous_tokens[i]), iterations):>12.0f}"
+    )
+    print(
+        f"{'compact':>10} {len(tokens[0]):>8} "
+        f"{per_second(lambda i: codec.encode(links[i], API_KEY, residual_json), iterations):>12.0f} "
+        f"{per_second(lambda i: codec.decode(tokens[i]), iterations):>12.0f}"
+    )
+    for token in tokens:
+        memoised.decode(token)
+    print(
+        f"{'memoised':>10} {len(tokens[0]):>8} "
+        f"{per_second(lambda i: memoised.encode(LINK, API_KEY, residual_json), iterations):>12.0f} "
+        f"{per_second(lambda i: memoised.decode(tokens[i]), iterations):>12.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark serialising a page of search results.
+
+Compares the per-page CPU time of validating the mapped FeatureCollection against the STAC response model and
+serialising it the way FastAPI does for a declared response model, with serialising it directly with orjson.
+
+Usage:
+    uv run python benchmarks/search_response.py [page size] [iterations]
+"""
+
+import json
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+import orjson
+from pydantic import TypeAdapter
+from stac_pydantic.item_collection import ItemCollection
+
+from stac_planet_api.response_adaptor import get_item_links
+
+BASE_URL = "http://localhost/"
+
+
+def stac_item(item_id: str) -> dict[str, Any]:
+    return {
+        "type": "Feature",
+        "stac_version": "1.0.0",
+        "stac_extensions": [],
+        "id": item_id,
+        "collection": "PSScene",
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[-1.0 + i / 100, 51.0 + (i % 7) / 100] for i in range(40)] + [[-1.0, 51.0]]],
+        },
+        "bbox": [-1.0, 51.0, -0.61, 51.06],
+        "properties": {
+            "acquired": "2024-01-01T10:00:00.000000Z",
+            "datetime": "2024-01-01T10:00:00.000000Z",
+            "cloud_cover": 0.12,
+            "clear_percent": 88,
+            "gsd": 3.7,
+            "instrument": "PSB.SD",
+            "item_type": "PSScene",
+            "publishing_stage": "finalized",
+            "sun_azimuth": 156.1,
+            "sun_elevation": 14.2,
+            "view_angle": 3.1,
+        },
+        "links": get_item_links(base_url=BASE_URL, collection_id="PSScene", item_id=item_id),
+        "assets": {
+            name: {"href": f"https://api.planet.com/data/v1/assets/{item_id}/{name}", "roles": ["data"]}
+            for name in ["ortho_analytic_4b", "ortho_analytic_4b_sr", "ortho_udm2", "ortho_visual", "basic_udm2"]
+        },
+    }
+
+
+def page(size: int) -> dict[str, Any]:
+    return {
+        "type": "FeatureCollection",
+        "features": [stac_item(f"20240101_100000_{i:02d}_24a3") for i in range(size)],
+        "links": [{"rel": "root", "type": "application/json", "href": BASE_URL}],
+    }
+
+
+def response_model_path(content: dict[str, Any]) -> bytes:
+    adapter = TypeAdapter(ItemCollection | dict[str, Any])
+    return json.dumps(adapter.dump_python(adapter.validate_python(content), mode="json")).encode()
+
+
+def orjson_path(content: dict[str, Any]) -> bytes:
+    return orjson.dumps(content)
+
+
+def cpu_per_call(function: Callable[[dict[str, Any]], bytes], content: dict[str, Any], iterations: int) -> float:
+    function(content)
+    start = time.process_time()
+    for _ in range(iterations):
+        function(content)
+    return (time.process_time() - start) / iterations
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 250
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    content = page(size)
+
+    before = cpu_per_call(response_model_path, content, iterations)
+    after = cpu_per_call(orjson_path, content, iterations)
+
+    print(f"{size} items per page, {iterations} iterations")
+    print(f"response model validation + json: {before * 1000:8.2f} ms CPU per page")
+    print(f"orjson fast path:                 {after * 1000:8.2f} ms CPU per page")
+    print(f"speed-up:                         {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
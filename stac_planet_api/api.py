@@ -1,67 +1,151 @@
+import asyncio
+import contextlib
 import itertools
 import json
 import logging
+import math
 import os
 import re
-from collections.abc import Callable
-from typing import Annotated, Any, cast
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Annotated, Any
 from urllib.parse import unquote_plus
 
 import fastapi
 import fastapi.security
 import httpx
 import orjson
-from cryptography.fernet import Fernet
-from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.responses import FileResponse, Response
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from pygeofilter import ast as pygeofilter_ast
-from pygeofilter.backends.cql2_json import to_cql2
-from pygeofilter.parsers.cql2_text import parse as parse_cql2_text
+from pydantic import BaseModel
+from stac_pydantic.item import Item
 from stac_pydantic.item_collection import ItemCollection
+from starlette.background import BackgroundTask
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from stac_planet_api.cache import Cache, TTLCache
+from stac_planet_api.client import PlanetClientManager, PlanetSession
 from stac_planet_api.config import Settings
-from stac_planet_api.request_adaptor import stac_to_planet_request
+from stac_planet_api.disk_cache import DiskLRUCache
+from stac_planet_api.fields import FieldsProjector
+from stac_planet_api.geometry import GeometrySimplifier
+from stac_planet_api.http_cache import cache_control, conditional_response, etag_matches, weak_etag
+from stac_planet_api.item_types import ITEM_TYPES
+from stac_planet_api.keys import KeyPoolAuth, KeyScheduler
+from stac_planet_api.post_filter import Predicate, compile_predicate, filter_planet_items
+from stac_planet_api.request_adaptor import cql2_text_to_json, get_residual_filter, stac_to_planet_request
+from stac_planet_api.resilience import Deadline, UpstreamUnavailable
 from stac_planet_api.response_adaptor import (
-    get_quertables,
+    ASSET_CACHE,
+    CACHE_BACKEND,
+    QUERYABLES_DOCUMENTS,
+    TOKENS,
+    get_assets,
+    get_thumbnail_url,
+    iter_mapped_items,
     map_item,
+    map_items,
     planet_to_stac_response,
+    stream_stac_response,
 )
 from stac_planet_api.search_model import POST_REQUEST_MODEL
+from stac_planet_api.thumbnails import (
+    DEFAULT_SPRITE_CELL_SIZE,
+    Thumbnail,
+    ThumbnailReference,
+    ThumbnailsRequest,
+    can_resize,
+    downscale,
+    multipart,
+    sprite,
+    sprite_grid,
+)
+from stac_planet_api.tokens import InvalidToken
 
 settings = Settings()
 
-FERNET = Fernet(settings.fernet_key)
-
 logger = logging.getLogger(__name__)
 
 root_path = os.environ.get("ROOT_PATH", "/")
 default_base_url = os.environ.get("BASE_URL")
 
-# Load all the planet api keys from the environment and setup a cycle so we can always use the next one.
-try:
-    planet_api_keys_env = os.environ.get("PLANET_API_KEYS")
-    PLANET_API_KEYS = itertools.cycle(planet_api_keys_env.split(":")) if planet_api_keys_env else None
-except NameError:
-    PLANET_API_KEYS = None
+# Load all the planet api keys from the environment and share calls between them by load and throttling.
+planet_api_keys_env = os.environ.get("PLANET_API_KEYS")
+PLANET_API_KEYS = (
+    KeyScheduler(
+        planet_api_keys_env.split(":"),
+        bench_time=settings.planet_key_bench_time,
+        max_bench_time=settings.planet_key_max_bench_time,
+    )
+    if planet_api_keys_env
+    else None
+)
 
-app = FastAPI(root_path=root_path)
+planet_clients = PlanetClientManager(settings)
+
+ITEM_CACHE = Cache(CACHE_BACKEND, "items", ttl=settings.item_cache_ttl)
+THUMBNAIL_CACHE = DiskLRUCache(
+    settings.thumbnail_cache_dir, max_bytes=settings.thumbnail_cache_max_bytes, ttl=settings.thumbnail_cache_ttl
+)
+
+# The collection each recently seen item belongs to, used to look up items by id without probing every collection
+ITEM_COLLECTION_HINTS: TTLCache[str] = TTLCache(
+    maxsize=settings.cache_max_entries, ttl=settings.item_collection_hint_ttl
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await planet_clients.open()
+    if PLANET_API_KEYS is not None:
+        await ITEM_TYPES.start(lambda: get_authenticated_client(get_auth(None)[0]))
+    yield
+    await ITEM_TYPES.stop()
+    await planet_clients.aclose()
+    await CACHE_BACKEND.aclose()
+
+
+app = FastAPI(root_path=root_path, lifespan=lifespan)
 
 
 class HeaderMiddleware(BaseHTTPMiddleware):
+    """Apply the default caching policy to responses whose endpoint hasn't set one, and never cache errors."""
+
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         response = await call_next(request)
-        response.headers["Cache-Control"] = f"max-age={os.environ.get('CACHE_LENGTH', '3600')}"
+        if response.status_code >= 400:
+            response.headers["Cache-Control"] = "no-store"
+        else:
+            response.headers.setdefault("Cache-Control", cache_control(settings.cache_length)["Cache-Control"])
         return response
 
 
 app.add_middleware(HeaderMiddleware)
 
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable(request: Request, exc: UpstreamUnavailable) -> Response:
+    """
+    Answer requests that Planet can't serve now, because it is failing, too slow or would be called too often, with
+    503 and when to come back if that is known.
+    """
+    logger.warning("Planet unavailable for %s: %s", request.url.path, exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Planet is unavailable, try again later: {exc}"},
+        headers={"Retry-After": str(max(math.ceil(exc.retry_after), 1))} if exc.retry_after is not None else None,
+    )
+
+
 security = HTTPBasic(auto_error=False)
 
 MAX_ITEMS = int(os.environ.get("MAX_ITEMS", "10"))
 
+# Largest page size accepted by the Planet quick-search API
+PLANET_MAX_PAGE_SIZE = 250
+
 
 def get_base_url(request: Request) -> str:
     global default_base_url
@@ -74,17 +158,132 @@ def get_base_url(request: Request) -> str:
         return str(request.base_url)
 
 
-def get_auth(credentials: HTTPBasicCredentials | None) -> tuple[httpx.BasicAuth, str]:
+def use_streaming(request: Request) -> bool:
+    """Whether to stream the search response, from the `stream` query parameter or the configured default."""
+    stream = request.query_params.get("stream")
+
+    if stream is None:
+        return settings.stream_search_responses
+
+    return stream.lower() in ["1", "true", "yes"]
+
+
+def expand_assets(request: Request) -> bool:
+    """Whether search results should include full assets.
+
+    Assets are left to be resolved lazily if requested with `?assets=lazy` or, if not given, `lazy_search_assets`
+    is set.
+    """
+    if (assets := request.query_params.get("assets")) is not None:
+        return assets.lower() != "lazy"
+
+    return not settings.lazy_search_assets
+
+
+def geometry_simplifier(request: Request) -> GeometrySimplifier | None:
+    """How to reduce the size of response geometries, from the `simplify` (tolerance) and `precision` query parameters.
+
+    Raises a 400 error if the parameters are invalid or simplification isn't available.
+    """
+    simplify = request.query_params.get("simplify")
+    precision = request.query_params.get("precision")
+
+    if simplify is None and precision is None:
+        return None
+
+    try:
+        tolerance = float(simplify) if simplify is not None else None
+        digits = int(precision) if precision is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="`simplify` must be a number and `precision` an integer.") from e
+
+    if (tolerance is not None and tolerance < 0) or (digits is not None and digits < 0):
+        raise HTTPException(status_code=400, detail="`simplify` and `precision` must not be negative.")
+
+    try:
+        return GeometrySimplifier(tolerance=tolerance, precision=digits)
+    except ImportError as e:
+        raise HTTPException(status_code=400, detail="Geometry simplification isn't available on this server.") from e
+
+
+def request_deadline(request: Request) -> Deadline | None:
+    """The deadline for assembling a search response, from the `timeout` query parameter or `search_timeout`, in
+    seconds.
+
+    It is never later than `planet_request_budget`. Raises a 400 error if `timeout` isn't a positive number.
+    """
+    seconds = settings.search_timeout
+    if (timeout := request.query_params.get("timeout")) is not None:
+        try:
+            seconds = float(timeout)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="`timeout` must be a number of seconds.") from e
+        if not seconds > 0:
+            raise HTTPException(status_code=400, detail="`timeout` must be positive.")
+
+    if settings.planet_request_budget > 0:
+        seconds = min(seconds, settings.planet_request_budget) if seconds > 0 else settings.planet_request_budget
+
+    return Deadline(seconds) if seconds > 0 else None
+
+
+def request_budget() -> Deadline | None:
+    """The deadline for the Planet calls made for a request, `planet_request_budget` seconds from now."""
+    return Deadline(settings.planet_request_budget) if settings.planet_request_budget > 0 else None
+
+
+def mark_partial(response: Response, deadline: Deadline | None) -> Response:
+    """Say how many items of a search response are incomplete because of its deadline, and don't cache it if any
+    are."""
+    if deadline is not None and deadline.degraded:
+        response.headers["X-Partial-Results"] = str(deadline.degraded)
+        response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def stac_response(
+    request: Request, content: dict[str, Any], model: type[BaseModel], max_age: int, etag: str | None = None
+) -> Response:
+    """Serialise a mapped STAC response directly with orjson, as a conditional response.
+
+    Responses are only validated against their STAC model when `validate_responses` is set, as validation dominates
+    the cost of large pages. The ETag is a hash of the response unless given.
+    """
+    if settings.validate_responses:
+        model.model_validate(content)
+
+    return conditional_response(
+        request,
+        orjson.dumps(content),
+        media_type="application/geo+json",
+        etag=etag,
+        headers=cache_control(max_age),
+    )
+
+
+def search_etag(content: dict[str, Any]) -> str:
+    """A weak ETag for a page of search results.
+
+    Pagination tokens depend on the credentials used, so the page is identified by its features alone.
+    """
+    return weak_etag(orjson.dumps(content["features"]))
+
+
+def get_auth(credentials: HTTPBasicCredentials | None) -> tuple[httpx.Auth, str]:
     """Create a httpx auth for the planet apis."""
     # Use the api key if available, otherwise pass through basic credentials from the user.
+    # Keys from the configured pool, e.g. in pagination tokens, are scheduled with the rest of the pool.
 
-    if credentials is not None:
+    if credentials is not None and not (
+        PLANET_API_KEYS is not None and credentials.username in PLANET_API_KEYS and not credentials.password
+    ):
         api_key = credentials.username
         auth = httpx.BasicAuth(username=credentials.username, password=credentials.password)
 
     elif PLANET_API_KEYS is not None:
-        api_key = next(PLANET_API_KEYS)
-        auth = httpx.BasicAuth(username=api_key, password="")
+        # Calls are made with whichever key the pool picks, so tokens carry no key and are followed with the pool too
+        api_key = ""
+        auth = KeyPoolAuth(PLANET_API_KEYS)
 
     else:
         raise fastapi.HTTPException(status_code=401, detail="Credentials were not provided.")
@@ -92,27 +291,33 @@ def get_auth(credentials: HTTPBasicCredentials | None) -> tuple[httpx.BasicAuth,
     return auth, api_key
 
 
-def get_authenticated_client(auth: httpx.BasicAuth) -> httpx.AsyncClient:
-    """Create a httpx client with correct auth for the planet apis."""
+def get_authenticated_client(auth: httpx.Auth, deadline: Deadline | None = None) -> PlanetSession:
+    """Get a session on the shared, pooled planet client with the correct auth for the planet apis.
 
-    return httpx.AsyncClient(
-        auth=auth,
-        verify=False,
-        timeout=180,
-    )
+    The session's calls, retries included, stop at `deadline` if one is given.
+    """
+
+    return planet_clients.session(auth, deadline=deadline)
 
 
 @app.get("/queryables")
 async def get_queryables(
     request: Request,
     credentials: Annotated[HTTPBasicCredentials, Depends(security)],
-) -> dict:
+) -> Response:
     """GET queryables for catalog.
 
     Returns:
         dict: Queryables for the catalog.
     """
-    return get_quertables()
+    document = QUERYABLES_DOCUMENTS[""]
+    return conditional_response(
+        request,
+        document.content,
+        media_type="application/json",
+        etag=document.etag,
+        headers=cache_control(settings.queryables_max_age),
+    )
 
 
 @app.get("/collections/{collection_id}/queryables")
@@ -120,16 +325,26 @@ async def get_collection_queryables(
     request: Request,
     credentials: Annotated[HTTPBasicCredentials, Depends(security)],
     collection_id: str,
-) -> dict:
+) -> Response:
     """GET queryables for collection.
 
     Returns:
-        dict: Queryables for the catalog.
+        dict: Queryables for the collection.
     """
-    return get_quertables(collection_id=collection_id)
+    document = QUERYABLES_DOCUMENTS.get(collection_id.lower())
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Collection `{collection_id}` not found.")
+
+    return conditional_response(
+        request,
+        document.content,
+        media_type="application/json",
+        etag=document.etag,
+        headers=cache_control(settings.queryables_max_age),
+    )
 
 
-@app.get("/search")
+@app.get("/search", response_model=ItemCollection | dict[str, Any])
 async def get_search(
     request: Request,
     credentials: Annotated[fastapi.security.HTTPBasicCredentials, fastapi.Depends(security)],
@@ -145,7 +360,7 @@ async def get_search(
     intersects: str | None = None,
     filter: str | None = None,
     filter_lang: str | None = None,
-) -> ItemCollection | dict[str, Any]:
+) -> Response:
     """GET Search planet items.
 
     Args:
@@ -201,9 +416,7 @@ async def get_search(
     if filter:
         search_request["filter-lang"] = "cql2-json"
         search_request["filter"] = orjson.loads(
-            unquote_plus(filter)
-            if filter_lang == "cql2-json"
-            else to_cql2(cast(pygeofilter_ast.Node, parse_cql2_text(filter)))
+            unquote_plus(filter) if filter_lang == "cql2-json" else cql2_text_to_json(filter)
         )
 
     if fields:
@@ -222,12 +435,12 @@ async def get_search(
     )
 
 
-@app.post("/search")
+@app.post("/search", response_model=ItemCollection | dict[str, Any])
 async def post_search(
     search_request: POST_REQUEST_MODEL,  # pyright: ignore[reportInvalidTypeForm]
     request: Request,
     credentials: Annotated[fastapi.security.HTTPBasicCredentials, fastapi.Depends(security)],
-) -> ItemCollection | dict[str, Any]:
+) -> Response:
     """Search planet items.
 
     Args:
@@ -237,43 +450,59 @@ async def post_search(
         ItemCollection: The items.
     """
     base_url = get_base_url(request)
+    simplifier = geometry_simplifier(request)
+    deadline = request_deadline(request)
 
     if token := search_request.token:
-        token_parts = FERNET.decrypt(token).decode("utf-8").split("\\")
+        try:
+            page_token = TOKENS.decode(token)
+        except InvalidToken as e:
+            raise HTTPException(status_code=400, detail="Invalid `token`.") from e
+
+        # Tokens issued for the pool of keys carry no key of their own
+        token_credentials = (
+            fastapi.security.HTTPBasicCredentials(username=page_token.api_key, password="")
+            if page_token.api_key
+            else None
+        )
 
-        credentials = fastapi.security.HTTPBasicCredentials(username=token_parts[1], password="")
+        auth, api_key = get_auth(token_credentials)
+        client = get_authenticated_client(auth=auth, deadline=deadline)
 
-        auth, api_key = get_auth(credentials)
-        client = get_authenticated_client(auth=auth)
+        residual = page_token.residual
+        predicate = compile_predicate(residual) if residual is not None else None
 
-        planet_response = await client.get(token_parts[0])
+        planet_response = await client.get(page_token.link)
 
     else:
+        page_token = None
         auth, api_key = get_auth(credentials)
-        client = get_authenticated_client(auth)
+        client = get_authenticated_client(auth, deadline=deadline)
 
         search_request.limit = min(search_request.limit or MAX_ITEMS, MAX_ITEMS)
 
+        residual = get_residual_filter(search_request)
+        predicate = compile_predicate(residual) if residual is not None else None
+
         if search_request.ids:
-            all_collections = search_request.collections or await get_collections(client)
-
-            all_items = []
-
-            for item_id in search_request.ids:
-                for collection_id in all_collections:
-                    try:
-                        item = await get_item(
-                            collection_id=collection_id,
-                            item_id=item_id,
-                            request=request,
-                            credentials=credentials,
-                        )
-                        all_items.append(item)
-                    except httpx.HTTPStatusError:  # unable to find item in catalogue
-                        pass
-
-            return ItemCollection(
-                **{
+            planet_items = await search_planet_items_by_id(
+                client,
+                ids=search_request.ids,
+                collections=search_request.collections or ITEM_TYPES.item_types,
+            )
+            all_items = await map_items(
+                filter_planet_items(planet_items, predicate),
+                base_url=base_url,
+                client=client,
+                expand_assets=expand_assets(request),
+                fields=FieldsProjector.from_request(search_request),
+                simplifier=simplifier,
+                deadline=deadline,
+            )
+
+            response = stac_response(
+                request,
+                {
                     "type": "FeatureCollection",
                     "features": all_items,
                     "links": [
@@ -284,8 +513,11 @@ async def post_search(
                         },
                         {"rel": "root", "href": base_url, "type": "application/json"},
                     ],
-                }
+                },
+                model=ItemCollection,
+                max_age=settings.search_max_age,
             )
+            return mark_partial(response, deadline)
 
         planet_parameters, planet_request = stac_to_planet_request(stac_request=search_request)
 
@@ -296,22 +528,246 @@ async def post_search(
         )
 
     planet_response.raise_for_status()
+    planet_data = planet_response.json()
+
+    if predicate is not None:
+        planet_data = await post_filter_planet_items(
+            client,
+            planet_data,
+            predicate=predicate,
+            limit=search_request.limit or MAX_ITEMS,
+            page_url=page_token.link if page_token else None,
+            offset=page_token.offset if page_token else 0,
+        )
 
-    return planet_to_stac_response(
-        planet_response=planet_response.json(),
+    for planet_item in planet_data["features"]:
+        ITEM_COLLECTION_HINTS.set(planet_item["id"], planet_item["properties"]["item_type"])
+
+    if use_streaming(request):
+        return StreamingResponse(
+            stream_stac_response(
+                planet_response=planet_data,
+                base_url=base_url,
+                client=client,
+                api_key=api_key,
+                expand_assets=expand_assets(request),
+                fields=FieldsProjector.from_request(search_request),
+                simplifier=simplifier,
+                residual=residual,
+                deadline=deadline,
+            ),
+            media_type="application/geo+json",
+            headers=cache_control(settings.search_max_age),
+        )
+
+    content = await planet_to_stac_response(
+        planet_response=planet_data,
         base_url=base_url,
-        auth=auth,
+        client=client,
         api_key=api_key,
+        expand_assets=expand_assets(request),
+        fields=FieldsProjector.from_request(search_request),
+        simplifier=simplifier,
+        residual=residual,
+        deadline=deadline,
+    )
+    response = stac_response(
+        request, content, model=ItemCollection, max_age=settings.search_max_age, etag=search_etag(content)
     )
+    return mark_partial(response, deadline)
+
+
+async def post_filter_planet_items(
+    client: PlanetSession,
+    planet_data: dict[str, Any],
+    predicate: Predicate,
+    limit: int,
+    page_url: str | None = None,
+    offset: int = 0,
+) -> dict[str, Any]:
+    """Filter a Planet result page with the part of a search filter that Planet doesn't apply.
+
+    The first `offset` items of the page, at `page_url` (or its `_self` link), are skipped. Further pages are read
+    until `limit` items match, up to `post_filter_max_pages` pages. If the last page read matches more items than
+    fit, the next link leads back to that page, with `_next_offset` set to the number of its items already covered, or
+    is left out if the page has no link of its own. Otherwise the result has the links of the last page read.
+    """
+    page_url = page_url or planet_data["_links"].get("_self")
+    features: list[dict[str, Any]] = []
+    pages = 0
+
+    while True:
+        page_features = planet_data["features"]
+        for index in range(offset, len(page_features)):
+            if not predicate(page_features[index]):
+                continue
+            if len(features) == limit:
+                # The rest of the page is left for the next one, if the page can be read again to resume from here
+                links = {rel: link for rel, link in planet_data["_links"].items() if rel != "_next"}
+                if not page_url:
+                    return {**planet_data, "features": features, "_links": links}
+                return {
+                    **planet_data,
+                    "features": features,
+                    "_links": links | {"_next": page_url},
+                    "_next_offset": index,
+                }
+            features.append(page_features[index])
+        pages += 1
+
+        if not (
+            len(features) < limit
+            and pages < settings.post_filter_max_pages
+            and page_features
+            and (next_url := planet_data["_links"].get("_next"))
+        ):
+            return {**planet_data, "features": features}
+
+        planet_response = await client.get(next_url)
+        planet_response.raise_for_status()
+        planet_data = planet_response.json()
+        page_url = next_url
+        offset = 0
+
+
+@app.post("/search/export")
+async def post_search_export(
+    search_request: POST_REQUEST_MODEL,  # pyright: ignore[reportInvalidTypeForm]
+    request: Request,
+    credentials: Annotated[fastapi.security.HTTPBasicCredentials, fastapi.Depends(security)],
+    max_items: Annotated[int | None, Query(gt=0)] = None,
+) -> StreamingResponse:
+    """Export planet items matching a search as newline-delimited GeoJSON.
 
+    Planet result pages are followed server-side, so all matching items up to `max_items` are returned in a single
+    response.
 
-@app.get("/collections/{collection_id}/items")
-@app.post("/collections/{collection_id}/items")
+    Args:
+        search request: The search request.
+        max_items: int: maximum number of items to return.
+
+    Returns:
+        StreamingResponse: The items, one GeoJSON feature per line.
+    """
+    base_url = get_base_url(request)
+    simplifier = geometry_simplifier(request)
+    auth, _ = get_auth(credentials)
+    # No deadline: an export reads as many Planet pages as it takes, for as long as the client keeps reading
+    client = get_authenticated_client(auth)
+
+    max_items = min(max_items or settings.export_max_items, settings.export_max_items)
+
+    residual = get_residual_filter(search_request)
+    predicate = compile_predicate(residual) if residual is not None else None
+
+    if search_request.ids:
+        planet_items = await search_planet_items_by_id(
+            client,
+            ids=search_request.ids[:max_items],
+            collections=search_request.collections or ITEM_TYPES.item_types,
+        )
+        planet_data: dict[str, Any] = {"features": planet_items, "_links": {}}
+
+    else:
+        search_request.limit = min(max_items, PLANET_MAX_PAGE_SIZE)
+        planet_parameters, planet_request = stac_to_planet_request(stac_request=search_request)
+
+        planet_response = await client.post(
+            "https://api.planet.com/data/v1/quick-search",
+            params=planet_parameters,
+            json=planet_request,
+        )
+        planet_response.raise_for_status()
+        planet_data = planet_response.json()
+
+    return StreamingResponse(
+        export_planet_items(
+            planet_data,
+            base_url=base_url,
+            client=client,
+            max_items=max_items,
+            expand_assets=expand_assets(request),
+            fields=FieldsProjector.from_request(search_request),
+            simplifier=simplifier,
+            predicate=predicate,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
+async def export_planet_items(
+    planet_data: dict[str, Any],
+    base_url: str,
+    client: PlanetSession,
+    max_items: int,
+    expand_assets: bool = True,
+    fields: FieldsProjector | None = None,
+    predicate: Predicate | None = None,
+    simplifier: GeometrySimplifier | None = None,
+) -> AsyncIterator[bytes]:
+    """Map and serialise Planet result pages one feature per line, following `_next` links up to `max_items`.
+
+    The next page is fetched while the current one is being mapped. With a `predicate`, only matching items are
+    exported and the export ends after `post_filter_max_pages` consecutive pages without a match. If Planet fails part
+    way through, the export ends with an `{"type": "Error", "detail": ...}` line instead, as the response status has
+    already been sent.
+    """
+    remaining = max_items
+    pages_without_match = 0
+
+    try:
+        while True:
+            planet_items = filter_planet_items(planet_data["features"], predicate)[:remaining]
+            remaining -= len(planet_items)
+            pages_without_match = 0 if planet_items else pages_without_match + 1
+
+            next_url = planet_data["_links"].get("_next")
+            next_page = (
+                asyncio.ensure_future(client.get(next_url))
+                if next_url
+                and planet_data["features"]
+                and remaining
+                and pages_without_match < settings.post_filter_max_pages
+                else None
+            )
+
+            try:
+                async for stac_item in iter_mapped_items(
+                    planet_items,
+                    base_url=base_url,
+                    client=client,
+                    expand_assets=expand_assets,
+                    fields=fields,
+                    simplifier=simplifier,
+                ):
+                    yield orjson.dumps(stac_item) + b"\n"
+            except BaseException:
+                if next_page is not None:
+                    next_page.cancel()
+                raise
+
+            if next_page is None:
+                return
+
+            planet_response = await next_page
+            planet_response.raise_for_status()
+            planet_data = planet_response.json()
+    except (httpx.HTTPError, UpstreamUnavailable, ValueError):
+        # The 200 status has already been sent, so say that the export is incomplete in the body
+        logger.warning("Export ended early", exc_info=True)
+        yield (
+            orjson.dumps({"type": "Error", "detail": "Unable to get every item from Planet, export incomplete."})
+            + b"\n"
+        )
+
+
+@app.get("/collections/{collection_id}/items", response_model=ItemCollection | dict[str, Any])
+@app.post("/collections/{collection_id}/items", response_model=ItemCollection | dict[str, Any])
 async def get_item_collection(
     collection_id: str,
     request: Request,
     credentials: Annotated[HTTPBasicCredentials, Depends(security)],
-) -> ItemCollection | dict[str, Any]:
+) -> Response:
     """GET Get planet items for collection.
 
     Args:
@@ -335,14 +791,14 @@ async def get_item_collection(
     )
 
 
-@app.get("/collections/{collection_id}/items/{item_id}")
-@app.post("/collections/{collection_id}/items/{item_id}")
+@app.get("/collections/{collection_id}/items/{item_id}", response_model=dict[str, Any])
+@app.post("/collections/{collection_id}/items/{item_id}", response_model=dict[str, Any])
 async def get_item(
     collection_id: str,
     item_id: str,
     request: Request,
     credentials: Annotated[HTTPBasicCredentials, Depends(security)],
-) -> dict[str, Any]:
+) -> Response:
     """Get planet item.
 
     Args:
@@ -353,21 +809,49 @@ async def get_item(
         dict: The item.
     """
     auth, _ = get_auth(credentials)
-    client = get_authenticated_client(auth)
+    client = get_authenticated_client(auth, deadline=request_budget())
     base_url = get_base_url(request)
 
-    planet_response = await client.get(
-        f"https://api.planet.com/data/v1/item-types/{collection_id}/items/{item_id}",
-    )
-
-    planet_response.raise_for_status()
+    planet_item = await get_planet_item(client, collection_id=collection_id, item_id=item_id)
 
     item_path = f"{base_url}collections/{collection_id}/items/{item_id}"
 
-    _, planet_data = map_item(
-        order=0, planet_item=planet_response.json(), base_url=base_url, auth=auth, path=item_path
+    _, planet_data = await map_item(order=0, planet_item=planet_item, base_url=base_url, client=client, path=item_path)
+    return stac_response(request, planet_data, model=Item, max_age=settings.item_max_age)
+
+
+@app.get("/collections/{collection_id}/items/{item_id}/assets", response_model=dict[str, Any])
+async def get_item_assets(
+    collection_id: str,
+    item_id: str,
+    request: Request,
+    credentials: Annotated[HTTPBasicCredentials, Depends(security)],
+) -> Response:
+    """Get planet item assets, for search results returned without them.
+
+    Args:
+        collection_id (str): The identifier of the collection that contains the item.
+        item_id (str): The identifier of the item.
+
+    Returns:
+        dict: The item's assets.
+    """
+    auth, _ = get_auth(credentials)
+    client = get_authenticated_client(auth, deadline=request_budget())
+    base_url = get_base_url(request)
+
+    planet_item = await get_planet_item(client, collection_id=collection_id, item_id=item_id)
+
+    assets = await get_assets(
+        collection_id=collection_id,
+        thumbnail_href=planet_item["_links"]["thumbnail"],
+        assets_href=planet_item["_links"]["assets"],
+        client=client,
+        path=f"{base_url}collections/{collection_id}/items/{item_id}",
+    )
+    return conditional_response(
+        request, orjson.dumps(assets), media_type="application/json", headers=cache_control(settings.item_max_age)
     )
-    return planet_data
 
 
 @app.get("/collections/{collection_id}/items/{item_id}/thumbnail")
@@ -388,8 +872,152 @@ async def get_item_thumbnail(
         Response: Thumbnail image
     """
     auth, _ = get_auth(credentials)
-    client = get_authenticated_client(auth)
-    base_url = get_base_url(request)
+    client = get_authenticated_client(auth, deadline=request_budget())
+
+    thumbnail_url = get_thumbnail_url(collection_id, item_id)
+    cache_key = f"{thumbnail_url}|{client.credential_hash}"
+    headers = cache_control(settings.thumbnail_max_age)
+
+    if (entry := THUMBNAIL_CACHE.get(cache_key)) is not None:
+        headers["ETag"] = entry.etag
+        if etag_matches(request, entry.etag):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(entry.path, media_type=entry.media_type, headers=headers)
+
+    return await stream_thumbnail(client, thumbnail_url, cache_key=cache_key, headers=headers)
+
+
+async def stream_thumbnail(
+    client: PlanetSession, thumbnail_url: str, cache_key: str, headers: dict[str, str]
+) -> StreamingResponse:
+    """Stream a thumbnail from Planet to the client, caching it on disk as it goes.
+
+    Planet's content type is passed on, and so is its content length unless the thumbnail is compressed in transit, as
+    it is streamed decompressed. The thumbnail is only cached if it is received in full.
+    """
+    exit_stack = contextlib.AsyncExitStack()
+    thumbnail_response = await exit_stack.enter_async_context(client.stream("GET", thumbnail_url))
+
+    if thumbnail_response.status_code != 200:
+        await exit_stack.aclose()
+        raise HTTPException(
+            status_code=404 if thumbnail_response.status_code == 404 else 502,
+            detail="Thumbnail not found" if thumbnail_response.status_code == 404 else "Unable to get thumbnail",
+        )
+
+    media_type = thumbnail_response.headers.get("content-type", "image/png")
+    content_length = thumbnail_response.headers.get("content-length")
+    if content_length and "content-encoding" not in thumbnail_response.headers:
+        headers = headers | {"Content-Length": content_length}
+
+    async def body() -> AsyncIterator[bytes]:
+        async with exit_stack:
+            with THUMBNAIL_CACHE.writer(cache_key, media_type=media_type) as writer:
+                async for chunk in thumbnail_response.aiter_bytes():
+                    if writer is not None:
+                        writer.write(chunk)
+                    yield chunk
+
+    # Also close the upstream response if the body is never read, e.g. the client disconnected
+    return StreamingResponse(
+        body(), media_type=media_type, headers=headers, background=BackgroundTask(exit_stack.aclose)
+    )
+
+
+@app.post("/thumbnails")
+async def get_thumbnails(
+    thumbnails_request: ThumbnailsRequest,
+    request: Request,
+    credentials: Annotated[HTTPBasicCredentials, Depends(security)],
+) -> Response:
+    """Get the thumbnails of a batch of items, for galleries and maps.
+
+    The thumbnails are fetched concurrently through the thumbnail cache and returned either as a `multipart/mixed`
+    response, with a part for each thumbnail found, or as a PNG sprite, with a cell for each item in request order.
+    Downscaling (`size`) and sprites need Pillow.
+
+    Args:
+        thumbnails_request: The items, the size to fit thumbnails within and the response format.
+
+    Returns:
+        Response: The thumbnails.
+    """
+    if len(thumbnails_request.items) > settings.thumbnail_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.thumbnail_batch_max_items} thumbnails can be requested at once.",
+        )
+
+    if (thumbnails_request.size or thumbnails_request.format == "sprite") and not can_resize():
+        raise HTTPException(status_code=400, detail="Resizing thumbnails isn't available on this server.")
+
+    cell_size = thumbnails_request.size or DEFAULT_SPRITE_CELL_SIZE
+    if thumbnails_request.format == "sprite":
+        columns, rows = sprite_grid(len(thumbnails_request.items))
+        if columns * rows * cell_size**2 > settings.thumbnail_sprite_max_pixels:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Sprites are limited to {settings.thumbnail_sprite_max_pixels} pixels, "
+                "request fewer items or a smaller size.",
+            )
+
+    auth, _ = get_auth(credentials)
+    client = get_authenticated_client(auth, deadline=request_budget())
+    semaphore = asyncio.Semaphore(settings.thumbnail_batch_concurrency)
+
+    async def fetch(reference: ThumbnailReference) -> Thumbnail | None:
+        async with semaphore:
+            thumbnail = await get_thumbnail(client, reference)
+
+        if thumbnail is not None and thumbnails_request.size and thumbnails_request.format == "multipart":
+            thumbnail = await asyncio.to_thread(downscale, thumbnail, thumbnails_request.size)
+        return thumbnail
+
+    thumbnails = await asyncio.gather(*(fetch(reference) for reference in thumbnails_request.items))
+
+    if thumbnails_request.format == "sprite":
+        content, columns = await asyncio.to_thread(sprite, thumbnails, cell_size)
+        return Response(
+            content,
+            media_type="image/png",
+            headers=cache_control(settings.thumbnail_max_age)
+            | {"X-Sprite-Columns": str(columns), "X-Sprite-Cell-Size": str(cell_size)},
+        )
+
+    content, media_type = multipart([thumbnail for thumbnail in thumbnails if thumbnail], path=get_base_url(request))
+    return Response(content, media_type=media_type, headers=cache_control(settings.thumbnail_max_age))
+
+
+async def get_thumbnail(client: PlanetSession, reference: ThumbnailReference) -> Thumbnail | None:
+    """Get a whole thumbnail from the thumbnail cache or Planet, or None if it can't be found."""
+    thumbnail_url = get_thumbnail_url(reference.collection, reference.id)
+    cache_key = f"{thumbnail_url}|{client.credential_hash}"
+
+    if (entry := THUMBNAIL_CACHE.get(cache_key)) is not None:
+        content = await asyncio.to_thread(entry.path.read_bytes)
+        return Thumbnail(reference=reference, content=content, media_type=entry.media_type)
+
+    try:
+        thumbnail_response = await client.get(thumbnail_url)
+        thumbnail_response.raise_for_status()
+    except httpx.HTTPError:
+        logger.warning("Unable to get thumbnail %s", thumbnail_url, exc_info=True)
+        return None
+
+    media_type = thumbnail_response.headers.get("content-type", "image/png")
+    with THUMBNAIL_CACHE.writer(cache_key, media_type=media_type) as writer:
+        if writer is not None:
+            writer.write(thumbnail_response.content)
+
+    return Thumbnail(reference=reference, content=thumbnail_response.content, media_type=media_type)
+
+
+async def get_planet_item(client: PlanetSession, collection_id: str, item_id: str) -> dict[str, Any]:
+    """Get an item from Planet, raising httpx.HTTPStatusError if it can't be found"""
+    cache_key = f"{collection_id}/{item_id}|{client.credential_hash}"
+
+    if (planet_item := await ITEM_CACHE.get_json(cache_key)) is not None:
+        return planet_item
 
     planet_response = await client.get(
         f"https://api.planet.com/data/v1/item-types/{collection_id}/items/{item_id}",
@@ -397,31 +1025,100 @@ async def get_item_thumbnail(
 
     planet_response.raise_for_status()
 
-    _, planet_data = map_item(
-        order=0,
-        planet_item=planet_response.json(),
-        base_url=base_url,
-        auth=auth,
-        path=str(request.url),
-    )
+    planet_item = planet_response.json()
+    await ITEM_CACHE.set_json(cache_key, planet_item)
+    ITEM_COLLECTION_HINTS.set(item_id, collection_id)
 
-    if planet_data["assets"].get("external_thumbnail"):
-        thumbnail_url = planet_data["assets"]["external_thumbnail"]["href"]
+    return planet_item
 
-        thumbnail_response = await client.get(thumbnail_url)
-        thumbnail_response.raise_for_status()
 
-        return Response(content=thumbnail_response.content, media_type="image/png")
+async def find_planet_item(
+    client: PlanetSession, item_id: str, collections: list[str], semaphore: asyncio.Semaphore
+) -> dict[str, Any] | None:
+    """Find an item in whichever of the collections contains it, or None if none do.
+
+    The collection the item was last seen in is tried first. Otherwise all collections are probed concurrently and
+    the remaining probes are abandoned as soon as one finds the item.
+    """
 
-    raise HTTPException(status_code=404, detail="External thumbnail link not found in item")
+    async def probe(collection_id: str) -> dict[str, Any] | None:
+        async with semaphore:
+            try:
+                return await get_planet_item(client, collection_id=collection_id, item_id=item_id)
+            except httpx.HTTPStatusError:  # unable to find item in catalogue
+                return None
+
+    hinted_collection = ITEM_COLLECTION_HINTS.get(item_id)
+    if hinted_collection in collections:
+        if (planet_item := await probe(hinted_collection)) is not None:
+            return planet_item
+        collections = [collection_id for collection_id in collections if collection_id != hinted_collection]
+
+    probes = [asyncio.ensure_future(probe(collection_id)) for collection_id in collections]
+    try:
+        for next_probe in asyncio.as_completed(probes):
+            if (planet_item := await next_probe) is not None:
+                return planet_item
+    finally:
+        for unfinished_probe in probes:
+            unfinished_probe.cancel()
+
+    return None
+
+
+async def search_planet_items_by_id(
+    client: PlanetSession, ids: list[str], collections: list[str]
+) -> list[dict[str, Any]]:
+    """Get the Planet items with the given ids, in the order requested.
+
+    Large id lists are looked up with quick-searches filtering on `id` rather than one item request per id and
+    collection.
+    """
+    if len(ids) >= settings.ids_quick_search_threshold:
+        responses = await asyncio.gather(
+            *(
+                client.post(
+                    "https://api.planet.com/data/v1/quick-search",
+                    params={"_page_size": PLANET_MAX_PAGE_SIZE},
+                    json={
+                        "item_types": collections,
+                        "filter": {"type": "StringInFilter", "field_name": "id", "config": list(batch)},
+                    },
+                )
+                for batch in itertools.batched(ids, PLANET_MAX_PAGE_SIZE // 2, strict=False)
+            )
+        )
 
+        found: dict[str, list[dict[str, Any]]] = {}
+        for response in responses:
+            response.raise_for_status()
+            for planet_item in response.json()["features"]:
+                found.setdefault(planet_item["id"], []).append(planet_item)
+                ITEM_COLLECTION_HINTS.set(planet_item["id"], planet_item["properties"]["item_type"])
 
-async def get_collections(client: httpx.AsyncClient) -> list[str]:
-    """Get collections from Planet"""
+        return [planet_item for item_id in ids for planet_item in found.get(item_id, [])]
 
-    planet_response = await client.get("https://api.planet.com/data/v1/item-types")
+    semaphore = asyncio.Semaphore(settings.ids_search_concurrency)
+    planet_items = await asyncio.gather(
+        *(find_planet_item(client, item_id=item_id, collections=collections, semaphore=semaphore) for item_id in ids)
+    )
 
-    return [collection["id"] for collection in planet_response.json()["item_types"]]
+    return [planet_item for planet_item in planet_items if planet_item is not None]
+
+
+@app.get("/_mgmt/stats", include_in_schema=False)
+async def get_stats() -> dict[str, Any]:
+    """Counters for the upstream request coalescing, rate limiting, retries, caches and API keys."""
+    return {
+        "single_flight": asdict(planet_clients.single_flight.stats),
+        "rate_limit": asdict(planet_clients.rate_limiter.stats) | {"waiting": planet_clients.rate_limiter.waiting},
+        "resilience": asdict(planet_clients.resilience.stats)
+        | {"open_circuits": [name for name, breaker in planet_clients.resilience.breakers.items() if breaker.open]},
+        "caches": {cache.namespace: asdict(cache.stats) for cache in [ASSET_CACHE, ITEM_CACHE]}
+        | {"backend": asdict(backend_stats) if (backend_stats := ITEM_CACHE.backend.stats()) is not None else {}}
+        | {"thumbnails": asdict(THUMBNAIL_CACHE.stats)},
+        "api_keys": PLANET_API_KEYS.stats() if PLANET_API_KEYS is not None else {},
+    }
 
 
 @app.get("/collections/{collection}/thumbnail")
@@ -0,0 +1,159 @@
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+import orjson
+
+from stac_planet_api.config import Settings
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+@dataclass
+class NamespaceStats:
+    hits: int = 0
+    misses: int = 0
+
+
+class TTLCache[V]:
+    """
+    In-process cache with LRU eviction once `maxsize` entries are held and a per-entry time to live.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> V | None:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: V, ttl: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def credential_hash(credential: str) -> str:
+    """Hash a credential so it can be used in a cache key without storing it."""
+    return hashlib.sha256(credential.encode()).hexdigest()[:16]
+
+
+class CacheBackend(ABC):
+    """
+    Storage for serialised cache payloads, shared by all of the caches in the application.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    async def aclose(self) -> None:
+        return None
+
+    def stats(self) -> CacheStats | None:
+        """Counters for the whole backend, including evictions and expirations, if it keeps them."""
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Cache payloads in this process only."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.entries: TTLCache[bytes] = TTLCache(maxsize=maxsize, ttl=0)
+
+    async def get(self, key: str) -> bytes | None:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.entries.set(key, value, ttl=ttl)
+
+    def stats(self) -> CacheStats | None:
+        return self.entries.stats
+
+
+def create_cache_backend(settings: Settings) -> CacheBackend:
+    if settings.cache_backend == "redis":
+        if not settings.redis_url:
+            raise ValueError("REDIS_URL must be set to use the redis cache backend")
+        from stac_planet_api.redis_cache import RedisCacheBackend  # noqa: PLC0415 - optional dependency
+
+        return RedisCacheBackend.from_url(settings.redis_url)
+
+    return MemoryCacheBackend(maxsize=settings.cache_max_entries)
+
+
+class Cache:
+    """
+    A namespace within a cache backend with its own default time to live.
+
+    Only hits and misses are counted per namespace, as entries are evicted and expire in the backend.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str, ttl: float) -> None:
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stats = NamespaceStats()
+
+    async def get_bytes(self, key: str) -> bytes | None:
+        if self.ttl <= 0:
+            return None
+
+        value = await self.backend.get(f"{self.namespace}:{key}")
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    async def set_bytes(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl > 0:
+            await self.backend.set(f"{self.namespace}:{key}", value, ttl)
+
+    async def get_json(self, key: str) -> Any | None:  # noqa: ANN401 - any JSON value
+        value = await self.get_bytes(key)
+        return None if value is None else orjson.loads(value)
+
+    async def set_json(self, key: str, value: Any, ttl: float | None = None) -> None:  # noqa: ANN401 - any JSON value
+        await self.set_bytes(key, orjson.dumps(value), ttl=ttl)
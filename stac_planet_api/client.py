@@ -0,0 +1,258 @@
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from functools import cached_property
+from typing import Any
+
+import httpx
+import orjson
+
+from stac_planet_api.cache import credential_hash
+from stac_planet_api.config import Settings
+from stac_planet_api.keys import KeyPoolAuth
+from stac_planet_api.rate_limit import RateLimiter
+from stac_planet_api.resilience import Deadline, Resilience, RetryPolicy
+from stac_planet_api.singleflight import SingleFlight
+
+
+class PlanetSession:
+    """
+    A view of the shared Planet client bound to a single set of credentials.
+
+    Auth is injected per request so that every caller shares the same connection pool. If a `single_flight` is
+    given, identical concurrent requests made with the same credentials share one upstream call. If a `rate_limiter` is
+    given, every upstream call waits for its turn, or raises `UpstreamOverloaded` when too many are waiting. If
+    `resilience` is given, failed calls are retried and failing endpoints are left alone, within the `deadline` of the
+    incoming request the session was made for.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        auth: httpx.Auth,
+        single_flight: SingleFlight[httpx.Response] | None = None,
+        rate_limiter: RateLimiter | None = None,
+        resilience: Resilience | None = None,
+        deadline: Deadline | None = None,
+    ) -> None:
+        self.client = client
+        self.auth = auth
+        self.single_flight = single_flight
+        self.rate_limiter = rate_limiter
+        self.resilience = resilience
+        self.deadline = deadline
+
+    @cached_property
+    def credential_hash(self) -> str:
+        """A stable, non-reversible identifier for these credentials, for use in cache keys."""
+        if isinstance(self.auth, KeyPoolAuth):
+            return self.auth.credential_hash
+
+        request = next(self.auth.auth_flow(httpx.Request("GET", "https://api.planet.com")))
+        return credential_hash(request.headers["Authorization"])
+
+    @property
+    def _retry_throttled(self) -> bool:
+        """A key pool has already retried a throttled call on every key, so retrying it again would multiply calls."""
+        return not isinstance(self.auth, KeyPoolAuth)
+
+    async def _throttle(self) -> None:
+        if self.rate_limiter is not None:
+            keys = len(self.auth.scheduler.keys) if isinstance(self.auth, KeyPoolAuth) else 1
+            await self.rate_limiter.acquire(self.credential_hash, keys=keys)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        params: dict[str, Any] | None = None,
+        json: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        retry_if: Callable[[httpx.Response], bool] | None = None,
+    ) -> httpx.Response:
+        """
+        Make a call to Planet. `retry_if` marks responses to retry as well as those failing with retryable statuses.
+        """
+        if self.single_flight is None:
+            return await self._send(method, url, params=params, json=json, headers=headers, retry_if=retry_if)
+
+        return await self.single_flight.do(
+            self._request_key(method, url, params=params, json=json, headers=headers),
+            lambda: self._send(method, url, params=params, json=json, headers=headers, retry_if=retry_if),
+        )
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        params: dict[str, Any] | None,
+        json: dict[str, Any] | None,
+        headers: dict[str, str] | None,
+        retry_if: Callable[[httpx.Response], bool] | None = None,
+    ) -> httpx.Response:
+        async def send(remaining: float | None) -> httpx.Response:
+            await self._throttle()
+            return await self.client.request(
+                method,
+                url,
+                params=params,
+                json=json,
+                headers=headers,
+                auth=self.auth,
+                timeout=self._timeout(remaining),
+            )
+
+        if self.resilience is None:
+            return await send(None)
+
+        return await self.resilience.call(
+            url, send, deadline=self.deadline, retry_if=retry_if, retry_throttled=self._retry_throttled
+        )
+
+    def _timeout(self, remaining: float | None) -> httpx.Timeout:
+        """The client's timeouts, cut short so that a call can't outlast the deadline."""
+        timeout = self.client.timeout
+        if remaining is None:
+            return timeout
+
+        def cap(value: float | None) -> float:
+            return remaining if value is None else min(value, remaining)
+
+        return httpx.Timeout(
+            connect=cap(timeout.connect), read=cap(timeout.read), write=cap(timeout.write), pool=cap(timeout.pool)
+        )
+
+    def _request_key(
+        self,
+        method: str,
+        url: str,
+        params: dict[str, Any] | None,
+        json: dict[str, Any] | None,
+        headers: dict[str, str] | None,
+    ) -> str:
+        """Identify a request by its method, URL, canonical body and credentials."""
+        return "|".join(
+            [
+                method,
+                str(httpx.URL(url, params=sorted((params or {}).items()))),
+                orjson.dumps(json, option=orjson.OPT_SORT_KEYS).decode(),
+                orjson.dumps(headers, option=orjson.OPT_SORT_KEYS).decode(),
+                self.credential_hash,
+            ]
+        )
+
+    async def get(
+        self,
+        url: str,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        retry_if: Callable[[httpx.Response], bool] | None = None,
+    ) -> httpx.Response:
+        return await self.request("GET", url, params=params, headers=headers, retry_if=retry_if)
+
+    async def post(
+        self,
+        url: str,
+        params: dict[str, Any] | None = None,
+        json: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        return await self.request("POST", url, params=params, json=json, headers=headers)
+
+    @asynccontextmanager
+    async def stream(
+        self, method: str, url: str, headers: dict[str, str] | None = None
+    ) -> AsyncIterator[httpx.Response]:
+        """
+        Make a call to Planet whose body is read as it arrives, retried and timed out like any other call. Reads of
+        the body time out at the deadline too.
+        """
+
+        async def send(remaining: float | None) -> httpx.Response:
+            await self._throttle()
+            request = self.client.build_request(method, url, headers=headers, timeout=self._timeout(remaining))
+            return await self.client.send(request, auth=self.auth, stream=True)
+
+        if self.resilience is None:
+            response = await send(None)
+        else:
+            response = await self.resilience.call(
+                url, send, deadline=self.deadline, retry_throttled=self._retry_throttled
+            )
+
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+
+class PlanetClientManager:
+    """
+    Owns the application-lifetime httpx client used for all calls to the Planet APIs.
+
+    The client is opened by the FastAPI lifespan hook and closed on shutdown. It is also created lazily on first
+    use so that code paths running outside the lifespan (e.g. tests without a context-managed TestClient) still work.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.single_flight: SingleFlight[httpx.Response] = SingleFlight()
+        self.rate_limiter = RateLimiter(
+            rate=settings.planet_rate_limit,
+            burst=settings.planet_rate_limit_burst,
+            credential_rate=settings.planet_key_rate_limit,
+            credential_burst=settings.planet_key_rate_limit_burst,
+            max_waiting=settings.planet_rate_limit_max_waiting,
+            max_wait=settings.planet_rate_limit_max_wait,
+            max_credentials=settings.cache_max_entries,
+        )
+        self.resilience = Resilience(
+            RetryPolicy(
+                attempts=settings.planet_retry_attempts,
+                base_delay=settings.planet_retry_base_delay,
+                max_delay=settings.planet_retry_max_delay,
+                statuses=settings.planet_retry_statuses,
+            ),
+            failure_threshold=settings.planet_circuit_failure_threshold,
+            reset_time=settings.planet_circuit_reset_time,
+        )
+        self._client: httpx.AsyncClient | None = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            verify=False,
+            http2=self.settings.planet_http2,
+            limits=httpx.Limits(
+                max_connections=self.settings.planet_max_connections,
+                max_keepalive_connections=self.settings.planet_max_keepalive_connections,
+                keepalive_expiry=self.settings.planet_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                self.settings.planet_timeout,
+                connect=self.settings.planet_connect_timeout,
+                pool=self.settings.planet_pool_timeout,
+            ),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def open(self) -> None:
+        _ = self.client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def session(self, auth: httpx.Auth, deadline: Deadline | None = None) -> PlanetSession:
+        return PlanetSession(
+            client=self.client,
+            auth=auth,
+            single_flight=self.single_flight if self.settings.planet_coalesce_requests else None,
+            rate_limiter=self.rate_limiter if self.rate_limiter.enabled else None,
+            resilience=self.resilience,
+            deadline=deadline,
+        )
@@ -1,3 +1,7 @@
+import os
+import tempfile
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -18,3 +22,97 @@ class Settings(BaseSettings):
         "Landsat8L1G",
         "Sentinel2L1C",
     ]
+
+    # Shared connection pool used for all calls to the Planet APIs
+    planet_http2: bool = False
+    planet_max_connections: int = 100
+    planet_max_keepalive_connections: int = 20
+    planet_keepalive_expiry: float = 30.0
+    planet_timeout: float = 180.0
+    planet_connect_timeout: float = 10.0
+    planet_pool_timeout: float = 30.0
+    # How long a key from PLANET_API_KEYS that Planet throttles is left unused, if Planet doesn't say, and at most
+    planet_key_bench_time: float = 10.0
+    planet_key_max_bench_time: float = 300.0
+    # Client-side limits on calls to Planet, in calls per second with bursts of up to `*_burst` calls, for all calls
+    # and per credential (each key of PLANET_API_KEYS counts once). A rate of 0 disables that limit. Calls over the
+    # rate wait, at most `planet_rate_limit_max_waiting` at a time for up to `planet_rate_limit_max_wait` seconds, and
+    # are otherwise answered with 503 and a Retry-After header.
+    planet_rate_limit: float = 0.0
+    planet_rate_limit_burst: float = 50.0
+    planet_key_rate_limit: float = 0.0
+    planet_key_rate_limit_burst: float = 10.0
+    planet_rate_limit_max_waiting: int = 100
+    planet_rate_limit_max_wait: float = 10.0
+    # Failed calls to Planet (transport errors and `planet_retry_statuses`) are made up to `planet_retry_attempts`
+    # times, backing off exponentially with jitter from `planet_retry_base_delay` up to `planet_retry_max_delay`
+    # seconds. An endpoint failing `planet_circuit_failure_threshold` times in a row isn't called for
+    # `planet_circuit_reset_time` seconds. All calls for one request, retries included, get `planet_request_budget`
+    # seconds, except for exports, which take as long as they need; 0 for no limit.
+    planet_retry_attempts: int = 3
+    planet_retry_base_delay: float = 0.2
+    planet_retry_max_delay: float = 5.0
+    planet_retry_statuses: list[int] = [429, 500, 502, 503, 504]
+    planet_circuit_failure_threshold: int = 5
+    planet_circuit_reset_time: float = 30.0
+    planet_request_budget: float = 60.0
+    # Share one upstream call between identical concurrent requests
+    planet_coalesce_requests: bool = True
+
+    # Maximum number of concurrent asset listing calls made while mapping a page of items
+    asset_concurrency: int = 16
+
+    # Cache of Planet responses, held in-process ("memory") or shared between replicas ("redis").
+    # A TTL of 0 disables caching for that kind of response.
+    cache_backend: Literal["memory", "redis"] = "memory"
+    cache_max_entries: int = 4096
+    redis_url: str | None = None
+    asset_cache_ttl: float = 300.0
+    item_cache_ttl: float = 300.0
+    thumbnail_cache_ttl: float = 86400.0
+    item_collection_hint_ttl: float = 86400.0
+
+    # Thumbnails are cached on local disk, for `thumbnail_cache_ttl`, up to a total size in bytes
+    thumbnail_cache_dir: str = os.path.join(tempfile.gettempdir(), "stac-planet-api-thumbnails")
+    thumbnail_cache_max_bytes: int = 256 * 1024 * 1024
+
+    # Largest batch of thumbnails fetched by one `/thumbnails` request, and how many are fetched concurrently
+    thumbnail_batch_max_items: int = 100
+    thumbnail_batch_concurrency: int = 16
+    # Largest sprite, in pixels, that `/thumbnails` builds; each pixel takes 4 bytes of memory while it's built
+    thumbnail_sprite_max_pixels: int = 4096 * 4096
+
+    # How often the list of item types is reloaded from Planet; `item_types` is used until it has loaded
+    item_types_refresh_interval: float = 3600.0
+
+    # Searches by `ids` probe collections concurrently, or use quick-searches filtering on `id` for longer id lists
+    ids_search_concurrency: int = 8
+    ids_quick_search_threshold: int = 10
+
+    # Stream search responses feature by feature unless the request says otherwise with `?stream=`
+    stream_search_responses: bool = False
+
+    # Validate responses against the STAC models before returning them, for debugging
+    validate_responses: bool = False
+
+    # Largest number of items returned by a single `/search/export`
+    export_max_items: int = 10000
+
+    # Leave search result assets to be resolved lazily unless the request says otherwise with `?assets=`
+    lazy_search_assets: bool = False
+
+    # Seconds a search may take before items whose assets haven't been listed are returned with lazy assets instead,
+    # unless the request says otherwise with `?timeout=`; 0 to wait up to `planet_request_budget`
+    search_timeout: float = 20.0
+
+    # Most Planet result pages read per search while looking for items matching the part of a filter that is
+    # evaluated locally, and the most consecutive pages without a match an export reads before giving up
+    post_filter_max_pages: int = 5
+
+    # Cache-Control max-age in seconds for successful responses, by endpoint, with `cache_length` for the rest. Error
+    # responses are never cached.
+    cache_length: int = 3600
+    item_max_age: int = 3600
+    search_max_age: int = 60
+    thumbnail_max_age: int = 86400
+    queryables_max_age: int = 86400
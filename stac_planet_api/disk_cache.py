@@ -0,0 +1,197 @@
+import contextlib
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from stac_planet_api.cache import CacheStats
+
+logger = logging.getLogger(__name__)
+
+# Entry files are named `<key hash>.<content hash><extension>`
+ENTRY_NAME = re.compile(r"(?P<name>[0-9a-f]{64})\.(?P<digest>[0-9a-f]{32})(?:\.|$)")
+
+
+@dataclass(frozen=True)
+class DiskCacheEntry:
+    path: Path
+    size: int
+    media_type: str
+    etag: str
+    expires_at: float
+
+
+class DiskCacheWriter:
+    """
+    Write a cache entry as it is received, so it can be streamed to the client at the same time.
+
+    The entry is only added to the cache if the writer's context exits normally, i.e. the whole body was received.
+    """
+
+    def __init__(self, file: tempfile._TemporaryFileWrapper, max_bytes: int) -> None:
+        self.file = file
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.too_large = False
+        self._hash = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.too_large or self.size > self.max_bytes:
+            self.too_large = True
+            return
+
+        self.file.write(chunk)
+        self._hash.update(chunk)
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()[:32]
+
+
+class DiskLRUCache:
+    """
+    Cache response bodies as files, evicting the least recently used once they total more than `max_bytes`.
+
+    Hits can be served straight from the file. Entries are named by a hash of their key and a hash of their content,
+    which is their ETag, with an extension for their media type, so the cache is reloaded from `directory` on first
+    use after a restart without reading the files.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int, ttl: float) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, DiskCacheEntry] = OrderedDict()
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        paths = [path for path in self.directory.iterdir() if path.is_file() and not path.name.startswith(".")]
+        for path in sorted(paths, key=lambda path: path.stat().st_mtime):
+            if (match := ENTRY_NAME.match(path.name)) is None:
+                # Written by an earlier release, without the hash of its content
+                path.unlink(missing_ok=True)
+                continue
+
+            stat = path.stat()
+            self._add(
+                match["name"],
+                DiskCacheEntry(
+                    path=path,
+                    size=stat.st_size,
+                    media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+                    etag=f'"{match["digest"]}"',
+                    expires_at=stat.st_mtime + self.ttl,
+                ),
+            )
+
+    def _add(self, name: str, entry: DiskCacheEntry) -> None:
+        if (replaced := self._entries.pop(name, None)) is not None:
+            self.size -= replaced.size
+            if replaced.path != entry.path:
+                replaced.path.unlink(missing_ok=True)
+
+        self._entries[name] = entry
+        self.size += entry.size
+
+        while self.size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+            evicted.path.unlink(missing_ok=True)
+            self.stats.evictions += 1
+
+    def _remove(self, name: str) -> None:
+        entry = self._entries.pop(name)
+        self.size -= entry.size
+        entry.path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key: str) -> DiskCacheEntry | None:
+        if not self.enabled:
+            return None
+        self._load()
+
+        name = self._name(key)
+        entry = self._entries.get(name)
+
+        if entry is not None and (entry.expires_at <= time.time() or not entry.path.exists()):
+            self._remove(name)
+            self.stats.expirations += 1
+            entry = None
+
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(name)
+        self.stats.hits += 1
+        return entry
+
+    @contextlib.contextmanager
+    def writer(self, key: str, media_type: str) -> Iterator[DiskCacheWriter | None]:
+        """Write an entry, or yield None if the cache is disabled or can't be written."""
+        if not self.enabled:
+            yield None
+            return
+
+        try:
+            self._load()
+            file = tempfile.NamedTemporaryFile(  # noqa: SIM115 - closed below
+                dir=self.directory, prefix=".", delete=False
+            )
+        except OSError:
+            logger.warning("Unable to write to the cache in %s", self.directory, exc_info=True)
+            yield None
+            return
+
+        writer = DiskCacheWriter(file, max_bytes=self.max_bytes)
+        committed = False
+
+        try:
+            yield writer
+            file.close()
+
+            if not writer.too_large:
+                name = self._name(key)
+                extension = mimetypes.guess_extension(media_type.split(";", maxsplit=1)[0].strip())
+                path = self.directory / f"{name}.{writer.digest}{extension or '.bin'}"
+                os.replace(file.name, path)
+                committed = True
+                self._add(
+                    name,
+                    DiskCacheEntry(
+                        path=path,
+                        size=writer.size,
+                        media_type=media_type,
+                        etag=f'"{writer.digest}"',
+                        expires_at=time.time() + self.ttl,
+                    ),
+                )
+        finally:
+            file.close()
+            if not committed:
+                Path(file.name).unlink(missing_ok=True)
@@ -0,0 +1,98 @@
+from collections.abc import Iterable
+from typing import Any
+
+from stac_planet_api.search_model import POST_REQUEST_MODEL
+
+# Fields every feature keeps, whatever is included or excluded, so that results are still identifiable STAC items
+REQUIRED_FIELDS = frozenset(["type", "stac_version", "id", "collection"])
+
+# A compiled set of dotted field paths. A leaf of `True` selects the whole value at that path.
+type FieldTree = dict[str, FieldTree | bool]
+
+
+def compile_paths(paths: Iterable[str]) -> FieldTree:
+    tree: FieldTree = {}
+
+    for path in paths:
+        node = tree
+        *parents, leaf = path.strip().split(".")
+
+        for segment in parents:
+            child = node.setdefault(segment, {})
+            if not isinstance(child, dict):
+                break
+            node = child
+        else:
+            node[leaf] = True
+
+    return tree
+
+
+def include_fields(value: dict[str, Any], tree: FieldTree) -> dict[str, Any]:
+    included = {}
+
+    for key, subtree in tree.items():
+        if key not in value:
+            continue
+        if subtree is True:
+            included[key] = value[key]
+        elif isinstance(subtree, dict) and isinstance(value[key], dict):
+            included[key] = include_fields(value[key], subtree)
+
+    return included
+
+
+def exclude_fields(value: dict[str, Any], tree: FieldTree) -> dict[str, Any]:
+    excluded = dict(value)
+
+    for key, subtree in tree.items():
+        if key not in excluded:
+            continue
+        if subtree is True:
+            del excluded[key]
+        elif isinstance(subtree, dict) and isinstance(excluded[key], dict):
+            excluded[key] = exclude_fields(excluded[key], subtree)
+
+    return excluded
+
+
+class FieldsProjector:
+    """
+    The Fields extension's include/exclude spec for a request, compiled once and applied to every feature.
+
+    `wants` lets mapping skip computing top-level fields that would only be pruned afterwards.
+    """
+
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = ()) -> None:
+        self.include = compile_paths(field for field in include if field)
+        self.exclude = compile_paths(field for field in exclude if field)
+
+        for field in REQUIRED_FIELDS:
+            self.exclude.pop(field, None)
+            if self.include:
+                self.include[field] = True
+
+    @classmethod
+    def from_request(cls, search_request: POST_REQUEST_MODEL) -> "FieldsProjector":  # pyright: ignore[reportInvalidTypeForm]
+        fields = getattr(search_request, "fields", None)
+        if fields is None:
+            return cls()
+
+        return cls(include=fields.include or (), exclude=fields.exclude or ())
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    def wants(self, field: str) -> bool:
+        """Whether any part of a top-level field will be returned."""
+        if self.include and field not in self.include:
+            return False
+
+        return self.exclude.get(field) is not True
+
+    def project(self, feature: dict[str, Any]) -> dict[str, Any]:
+        if self.include:
+            feature = include_fields(feature, self.include)
+        if self.exclude:
+            feature = exclude_fields(feature, self.exclude)
+        return feature
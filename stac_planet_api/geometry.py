@@ -0,0 +1,107 @@
+from operator import itemgetter
+from typing import Any
+
+type Position = list[float]
+
+
+def add_positions(geometry: dict[str, Any], positions: list[Position]) -> None:
+    """Append every position in a GeoJSON geometry to `positions`, extending whole rings and lines at once."""
+    geometry_type = geometry.get("type")
+    coordinates = geometry.get("coordinates")
+
+    if geometry_type == "GeometryCollection":
+        for member in geometry.get("geometries") or []:
+            add_positions(member, positions)
+
+    elif not coordinates:
+        return
+
+    elif geometry_type == "Point":
+        positions.append(coordinates)
+
+    elif geometry_type in ["LineString", "MultiPoint"]:
+        positions.extend(coordinates)
+
+    elif geometry_type in ["Polygon", "MultiLineString"]:
+        for line in coordinates:
+            positions.extend(line)
+
+    elif geometry_type == "MultiPolygon":
+        for polygon in coordinates:
+            for ring in polygon:
+                positions.extend(ring)
+
+
+def get_bbox(geometry: dict[str, Any] | None) -> list[float] | None:
+    """
+    Get the bbox of a GeoJSON geometry.
+
+    Bboxes are `[min x, min y, max x, max y]`, or have 6 values if every position has an elevation. Geometries without
+    any positions have no bbox.
+    """
+    positions: list[Position] = []
+    if geometry:
+        add_positions(geometry, positions)
+
+    if not positions:
+        return None
+
+    dimensions = len(positions[0])
+    if dimensions > 2 and any(len(position) != dimensions for position in positions):
+        # Positions with and without elevation, so only the horizontal axes are comparable
+        dimensions = 2
+
+    minima: list[float] = []
+    maxima: list[float] = []
+    for axis in range(dimensions):
+        # A flat list per axis keeps min and max in C, without the per-position tuples zip would create
+        values = list(map(itemgetter(axis), positions))
+        minima.append(min(values))
+        maxima.append(max(values))
+
+    return minima + maxima
+
+
+def round_coordinates(coordinates: list[Any], precision: int) -> list[Any]:
+    if coordinates and not isinstance(coordinates[0], list | tuple):
+        return [round(value, precision) for value in coordinates]
+    return [round_coordinates(member, precision) for member in coordinates]
+
+
+class GeometrySimplifier:
+    """
+    Reduce the size of response geometries, for clients that only draw outlines.
+
+    Geometries are simplified to within `tolerance` (in degrees) without changing their topology, which needs shapely,
+    and/or have their coordinates rounded to `precision` decimal places.
+    """
+
+    def __init__(self, tolerance: float | None = None, precision: int | None = None) -> None:
+        self.tolerance = tolerance
+        self.precision = precision
+
+        if tolerance is not None:
+            import shapely  # noqa: PLC0415 - optional dependency
+            import shapely.geometry  # noqa: PLC0415 - optional dependency
+
+            self._shapely = shapely
+
+    def __bool__(self) -> bool:
+        return self.tolerance is not None or self.precision is not None
+
+    def simplify(self, geometry: dict[str, Any]) -> dict[str, Any]:
+        if self.tolerance is not None:
+            geometry = self._shapely.geometry.mapping(
+                self._shapely.geometry.shape(geometry).simplify(self.tolerance, preserve_topology=True)
+            )
+
+        if self.precision is not None:
+            geometry = self.round(geometry, self.precision)
+
+        return geometry
+
+    @classmethod
+    def round(cls, geometry: dict[str, Any], precision: int) -> dict[str, Any]:
+        if geometry.get("type") == "GeometryCollection":
+            return geometry | {"geometries": [cls.round(member, precision) for member in geometry["geometries"]]}
+        return geometry | {"coordinates": round_coordinates(geometry["coordinates"], precision)}
@@ -0,0 +1,60 @@
+import hashlib
+from dataclasses import dataclass, field
+
+import orjson
+from fastapi import Request, Response
+
+
+def strong_etag(content: bytes) -> str:
+    """An entity tag that changes whenever the content does."""
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def weak_etag(content: bytes) -> str:
+    """An entity tag for content whose representation varies without its meaning changing."""
+    return f"W/{strong_etag(content)}"
+
+
+def cache_control(max_age: int) -> dict[str, str]:
+    return {"Cache-Control": f"max-age={max_age}" if max_age > 0 else "no-store"}
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's `If-None-Match` header matches `etag`, compared weakly as RFC 9110 requires."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    return etag.removeprefix("W/") in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+@dataclass(frozen=True)
+class Document:
+    """
+    A response body serialised once, with its entity tag, for documents that only change on restart.
+    """
+
+    content: bytes
+    etag: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "etag", strong_etag(self.content))
+
+    @classmethod
+    def from_json(cls, value: object) -> "Document":
+        return cls(orjson.dumps(value))
+
+
+def conditional_response(
+    request: Request, content: bytes, media_type: str, etag: str | None = None, headers: dict[str, str] | None = None
+) -> Response:
+    """A response with an `ETag`, or a 304 without a body if the client already has this content."""
+    headers = {**(headers or {}), "ETag": etag or strong_etag(content)}
+
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content, media_type=media_type, headers=headers)
@@ -0,0 +1,61 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import Callable
+
+import httpx
+
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.config import Settings
+from stac_planet_api.resilience import UpstreamUnavailable
+
+settings = Settings()
+
+logger = logging.getLogger(__name__)
+
+
+class ItemTypesRegistry:
+    """
+    The Planet item types (STAC collections) available to search.
+
+    Starts from the configured item types and is loaded from Planet in the background, first at startup and then every
+    `refresh_interval` seconds, so the list is always available without a Planet call on the request path and a slow
+    Planet can't hold up startup. If Planet can't be reached the last known list is kept.
+    """
+
+    def __init__(self, default: list[str], refresh_interval: float) -> None:
+        self.item_types = list(default)
+        self.refresh_interval = refresh_interval
+        self._task: asyncio.Task | None = None
+
+    async def refresh(self, client: PlanetSession) -> None:
+        try:
+            planet_response = await client.get("https://api.planet.com/data/v1/item-types")
+            planet_response.raise_for_status()
+            item_types = [item_type["id"] for item_type in planet_response.json()["item_types"]]
+        except (httpx.HTTPError, UpstreamUnavailable, ValueError, KeyError, TypeError):
+            logger.warning("Unable to load item types from Planet, using %s", self.item_types, exc_info=True)
+            return
+
+        if item_types:
+            self.item_types = item_types
+
+    async def start(self, get_client: Callable[[], PlanetSession]) -> None:
+        self._task = asyncio.create_task(self._refresh_periodically(get_client))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _refresh_periodically(self, get_client: Callable[[], PlanetSession]) -> None:
+        await self.refresh(get_client())
+
+        while self.refresh_interval > 0:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh(get_client())
+
+
+ITEM_TYPES = ItemTypesRegistry(default=settings.item_types, refresh_interval=settings.item_types_refresh_interval)
@@ -0,0 +1,156 @@
+import base64
+import email.utils
+import time
+from collections.abc import Generator, Iterable
+from dataclasses import dataclass
+
+import httpx
+
+from stac_planet_api.cache import credential_hash
+
+
+@dataclass
+class KeyStats:
+    requests: int = 0
+    in_flight: int = 0
+    throttled: int = 0
+    retried: int = 0
+    # Exponentially weighted moving average of response times, in seconds
+    latency: float = 0.0
+    benched_until: float = 0.0
+
+
+def basic_auth_header(api_key: str) -> str:
+    return "Basic " + base64.b64encode(f"{api_key}:".encode()).decode()
+
+
+def retry_after(response: httpx.Response, default: float) -> float:
+    """Seconds to wait before retrying, from a `Retry-After` header in seconds or as an HTTP date."""
+    value = response.headers.get("retry-after")
+    if value is None:
+        return default
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class KeyScheduler:
+    """
+    Share upstream calls between a pool of Planet API keys.
+
+    Each call uses the healthy key with the fewest calls in flight, then the lowest recent latency. A key that is
+    throttled (429) is benched for its `Retry-After`, or `bench_time` seconds, and is only used again before then if
+    every key is benched.
+    """
+
+    def __init__(
+        self, keys: Iterable[str], bench_time: float, max_bench_time: float, latency_smoothing: float = 0.2
+    ) -> None:
+        self.keys = list(dict.fromkeys(keys))
+        if not self.keys:
+            raise ValueError("At least one API key is needed")
+
+        self.bench_time = bench_time
+        self.max_bench_time = max_bench_time
+        self.latency_smoothing = latency_smoothing
+        self.key_stats = {key: KeyStats() for key in self.keys}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.key_stats
+
+    def pick(self, exclude: Iterable[str] = ()) -> str:
+        """The key to use for the next call, avoiding keys in `exclude` unless no others are left."""
+        excluded = set(exclude)
+        candidates = [key for key in self.keys if key not in excluded] or self.keys
+        now = time.monotonic()
+
+        healthy = [key for key in candidates if self.key_stats[key].benched_until <= now]
+        if not healthy:
+            return min(candidates, key=lambda key: self.key_stats[key].benched_until)
+
+        return min(healthy, key=lambda key: (self.key_stats[key].in_flight, self.key_stats[key].latency))
+
+    def started(self, key: str) -> None:
+        stats = self.key_stats[key]
+        stats.requests += 1
+        stats.in_flight += 1
+
+    def finished(self, key: str, elapsed: float | None) -> None:
+        stats = self.key_stats[key]
+        stats.in_flight -= 1
+        if elapsed is not None:
+            if stats.latency:
+                stats.latency += self.latency_smoothing * (elapsed - stats.latency)
+            else:
+                stats.latency = elapsed
+
+    def throttled(self, key: str, response: httpx.Response) -> None:
+        stats = self.key_stats[key]
+        stats.throttled += 1
+        bench_time = min(retry_after(response, default=self.bench_time), self.max_bench_time)
+        stats.benched_until = max(stats.benched_until, time.monotonic() + bench_time)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Usage of each key, identified by its position in `keys` so that no part of the key is given away."""
+        now = time.monotonic()
+        return {
+            str(index): {
+                "requests": stats.requests,
+                "in_flight": stats.in_flight,
+                "throttled": stats.throttled,
+                "retried": stats.retried,
+                "latency": round(stats.latency, 4),
+                "benched_for": round(max(stats.benched_until - now, 0.0), 1),
+            }
+            for index, stats in enumerate(self.key_stats.values())
+        }
+
+
+class KeyPoolAuth(httpx.Auth):
+    """
+    Authenticate each call with a key chosen by a `KeyScheduler`.
+
+    A throttled call is retried with another key until every key has been tried. Planet has not processed a call it
+    answered with 429, so this is safe whatever the method.
+    """
+
+    def __init__(self, scheduler: KeyScheduler) -> None:
+        self.scheduler = scheduler
+
+    @property
+    def credential_hash(self) -> str:
+        """All keys in the pool are treated as one credential, so cached responses are shared between them."""
+        return credential_hash("\n".join(sorted(self.scheduler.keys)))
+
+    def auth_flow(self, request: httpx.Request) -> Generator[httpx.Request, httpx.Response]:
+        tried: list[str] = []
+
+        while True:
+            key = self.scheduler.pick(exclude=tried)
+            tried.append(key)
+            request.headers["Authorization"] = basic_auth_header(key)
+
+            self.scheduler.started(key)
+            start = time.monotonic()
+            elapsed = None
+            try:
+                response = yield request
+                elapsed = time.monotonic() - start
+            finally:
+                self.scheduler.finished(key, elapsed)
+
+            if response.status_code != 429:
+                return
+
+            self.scheduler.throttled(key, response)
+            if len(tried) >= len(self.scheduler.keys):
+                return
+
+            self.scheduler.key_stats[key].retried += 1
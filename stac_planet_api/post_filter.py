@@ -0,0 +1,210 @@
+import functools
+import re
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+import fastapi
+import orjson
+
+type Predicate = Callable[[dict[str, Any]], bool]
+
+COMPARISONS: dict[str, Callable[[Any, Any], bool]] = {
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+SPATIAL_PREDICATES = {
+    "s_intersects": "intersects",
+    "s_within": "within",
+    "s_contains": "contains",
+    "s_disjoint": "disjoint",
+    "s_overlaps": "overlaps",
+    "s_touches": "touches",
+    "s_crosses": "crosses",
+    "s_equals": "equals",
+}
+
+# STAC properties that are stored under a different name, or outside `properties`, in Planet items
+PLANET_PROPERTIES: dict[str, Callable[[dict[str, Any]], Any]] = {
+    "id": lambda planet_item: planet_item.get("id"),
+    "collection": lambda planet_item: planet_item["properties"].get("item_type"),
+    "geometry": lambda planet_item: planet_item.get("geometry"),
+    "datetime": lambda planet_item: planet_item["properties"].get("acquired"),
+}
+
+TEMPORAL_PROPERTIES = {"datetime", "acquired", "published", "updated"}
+
+
+def unsupported(op: str) -> fastapi.HTTPException:
+    return fastapi.HTTPException(status_code=400, detail=f"Filter operator `{op}` is not supported.")
+
+
+def get_property(name: str) -> Callable[[dict[str, Any]], Any]:
+    name = name.removeprefix("properties.")
+    if name in PLANET_PROPERTIES:
+        return PLANET_PROPERTIES[name]
+    return lambda planet_item: planet_item["properties"].get(name)
+
+
+def parse_datetime(value: object) -> object:
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+def is_temporal(arg: object) -> bool:
+    return isinstance(arg, dict) and arg.get("property", "").removeprefix("properties.") in TEMPORAL_PROPERTIES
+
+
+def compile_value(arg: object, temporal: bool = False) -> Callable[[dict[str, Any]], Any]:
+    """Compile a CQL2 expression to a function of a Planet item.
+
+    Literal strings are read as timestamps if `temporal`, i.e. they are being compared with a temporal property.
+    """
+    if isinstance(arg, dict):
+        if "property" in arg:
+            getter = get_property(arg["property"])
+            if is_temporal(arg):
+                return lambda planet_item: parse_datetime(getter(planet_item))
+            return getter
+
+        if "timestamp" in arg or "date" in arg:
+            value = parse_datetime(arg.get("timestamp", arg.get("date")))
+            return lambda _: value
+
+        if "op" in arg:
+            return compile_predicate_node(arg)
+
+    if temporal:
+        value = parse_datetime(arg)
+        return lambda _: value
+
+    return lambda _: arg
+
+
+def compile_values(args: list[Any]) -> list[Callable[[dict[str, Any]], Any]]:
+    temporal = any(is_temporal(arg) for arg in args)
+    return [compile_value(arg, temporal=temporal) for arg in args]
+
+
+def like_pattern(pattern: str) -> re.Pattern:
+    regex = "".join(".*" if char == "%" else "." if char == "_" else re.escape(char) for char in pattern)
+    return re.compile(f"^{regex}$", re.DOTALL)
+
+
+def compile_spatial(op: str, args: list[Any]) -> Predicate:
+    try:
+        import shapely  # noqa: PLC0415 - optional dependency
+        import shapely.geometry  # noqa: PLC0415 - optional dependency
+    except ImportError as e:
+        raise fastapi.HTTPException(
+            status_code=400, detail=f"Filter operator `{op}` can't be evaluated on this server."
+        ) from e
+
+    def to_geometry(arg: dict[str, Any]) -> shapely.Geometry:
+        if isinstance(arg, dict) and "bbox" in arg:
+            bbox = arg["bbox"]
+            return shapely.box(bbox[0], bbox[1], bbox[len(bbox) // 2], bbox[len(bbox) // 2 + 1])
+        return shapely.geometry.shape(arg)
+
+    relation = SPATIAL_PREDICATES[op]
+    left, right = compile_values(args)
+
+    def predicate(planet_item: dict[str, Any]) -> bool:
+        left_value, right_value = left(planet_item), right(planet_item)
+        if left_value is None or right_value is None:
+            return False
+        return bool(getattr(to_geometry(left_value), relation)(to_geometry(right_value)))
+
+    return predicate
+
+
+def compile_predicate_node(node: dict[str, Any]) -> Predicate:
+    op = node["op"].lower()
+    args = node.get("args", [])
+
+    if op in ["and", "or"]:
+        parts = [compile_predicate_node(arg) for arg in args]
+        if op == "and":
+            return lambda planet_item: all(part(planet_item) for part in parts)
+        return lambda planet_item: any(part(planet_item) for part in parts)
+
+    if op == "not":
+        part = compile_predicate_node(args[0])
+        return lambda planet_item: not part(planet_item)
+
+    if op == "isnull":
+        value = compile_value(args[0])
+        return lambda planet_item: value(planet_item) is None
+
+    if op in COMPARISONS:
+        compare = COMPARISONS[op]
+        left, right = compile_values(args)
+
+        def comparison(planet_item: dict[str, Any]) -> bool:
+            left_value, right_value = left(planet_item), right(planet_item)
+            if left_value is None or right_value is None:
+                return False
+            try:
+                return compare(left_value, right_value)
+            except TypeError:
+                return False
+
+        return comparison
+
+    if op == "between":
+        value, lower, upper = compile_values(args)
+
+        def between(planet_item: dict[str, Any]) -> bool:
+            item_value = value(planet_item)
+            try:
+                return item_value is not None and lower(planet_item) <= item_value <= upper(planet_item)
+            except TypeError:
+                return False
+
+        return between
+
+    if op == "in":
+        value, *options = compile_values([args[0], *args[1]])
+        option_values = [option({}) for option in options]
+        return lambda planet_item: value(planet_item) in option_values
+
+    if op == "like":
+        value = compile_value(args[0])
+        pattern = like_pattern(args[1])
+        return lambda planet_item: (
+            isinstance(item_value := value(planet_item), str) and bool(pattern.match(item_value))
+        )
+
+    if op in SPATIAL_PREDICATES:
+        return compile_spatial(op, args)
+
+    raise unsupported(node["op"])
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_canonical_predicate(canonical_filter: bytes) -> Predicate:
+    return compile_predicate_node(orjson.loads(canonical_filter))
+
+
+def compile_predicate(stac_filter: dict[str, Any]) -> Predicate:
+    """Compile a CQL2-JSON filter to a predicate over Planet items, for filtering that Planet can't do.
+
+    Raises a 400 error if the filter uses an operator that can't be evaluated.
+    """
+    return _compile_canonical_predicate(orjson.dumps(stac_filter, option=orjson.OPT_SORT_KEYS))
+
+
+def filter_planet_items(planet_items: list[dict[str, Any]], predicate: Predicate | None) -> list[dict[str, Any]]:
+    if predicate is None:
+        return planet_items
+    return [planet_item for planet_item in planet_items if predicate(planet_item)]
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from stac_planet_api.cache import TTLCache
+from stac_planet_api.resilience import UpstreamUnavailable
+
+
+class UpstreamOverloaded(UpstreamUnavailable):
+    """Raised instead of queueing a call to Planet when the rate limiter's wait queue is full."""
+
+    retry_after: float
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Too many calls to Planet are waiting, retry in {retry_after:.1f}s", retry_after=retry_after)
+
+
+@dataclass
+class RateLimiterStats:
+    acquired: int = 0
+    delayed: int = 0
+    shed: int = 0
+
+
+class TokenBucket:
+    """
+    Allow `rate` calls per second on average, in bursts of up to `burst` calls.
+
+    Tokens are taken as calls are admitted, so the count goes negative while calls are waiting for their turn and the
+    delay for the next call includes every call queued ahead of it.
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is free for the next call."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (1.0 - self.tokens) / self.rate)
+
+    def take(self) -> None:
+        self.tokens -= 1.0
+
+
+class RateLimiter:
+    """
+    Pace calls to Planet with token buckets, one shared by all calls and one per credential. A rate of 0 disables a
+    bucket.
+
+    Calls over the rate wait their turn, up to `max_waiting` at a time for at most `max_wait` seconds. Calls beyond
+    that are shed with `UpstreamOverloaded` rather than queued, so a burst of requests fails fast instead of holding
+    connections open until Planet would have throttled them anyway.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        credential_rate: float,
+        credential_burst: float,
+        max_waiting: int,
+        max_wait: float,
+        max_credentials: int = 4096,
+    ) -> None:
+        self.credential_rate = credential_rate
+        self.credential_burst = credential_burst
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.waiting = 0
+        self.stats = RateLimiterStats()
+        self._bucket = TokenBucket(rate, burst) if rate > 0 else None
+        # Buckets of idle credentials are full again after `burst / rate` seconds, so forgetting them is harmless
+        self._credential_buckets: TTLCache[TokenBucket] = TTLCache(maxsize=max_credentials, ttl=3600)
+
+    @property
+    def enabled(self) -> bool:
+        return self._bucket is not None or self.credential_rate > 0
+
+    def _credential_bucket(self, credential: str, keys: int) -> TokenBucket | None:
+        if self.credential_rate <= 0:
+            return None
+
+        bucket = self._credential_buckets.get(credential)
+        if bucket is None:
+            bucket = TokenBucket(self.credential_rate * keys, self.credential_burst * keys)
+            self._credential_buckets.set(credential, bucket)
+        return bucket
+
+    async def acquire(self, credential: str, keys: int = 1) -> None:
+        """
+        Wait until a call made with `credential` is allowed, or raise `UpstreamOverloaded` if it would wait too long.
+
+        `keys` is the number of API keys the credential stands for, such as a pool that shares calls between its keys,
+        and multiplies its rate and burst.
+        """
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        buckets = [
+            bucket for bucket in (self._bucket, self._credential_bucket(credential, keys)) if bucket is not None
+        ]
+        delay = max(bucket.delay(now) for bucket in buckets)
+
+        if delay > 0 and (self.waiting >= self.max_waiting or delay > self.max_wait):
+            self.stats.shed += 1
+            raise UpstreamOverloaded(retry_after=delay)
+
+        for bucket in buckets:
+            bucket.take()
+        self.stats.acquired += 1
+
+        if delay > 0:
+            self.stats.delayed += 1
+            self.waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.waiting -= 1
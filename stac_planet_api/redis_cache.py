@@ -0,0 +1,42 @@
+import logging
+
+import redis
+import redis.asyncio
+
+from stac_planet_api.cache import CacheBackend
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache payloads in a Redis-protocol server so that they are shared between replicas.
+
+    Cache errors are logged and treated as misses so that an unavailable server never fails a request.
+    """
+
+    def __init__(self, client: redis.asyncio.Redis, prefix: str = "stac-planet-api:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisCacheBackend":
+        return cls(redis.asyncio.from_url(url))
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            value = await self.client.get(self.prefix + key)
+        except redis.RedisError:
+            logger.warning("Unable to read %s from cache", key, exc_info=True)
+            return None
+
+        return value.encode() if isinstance(value, str) else value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        try:
+            await self.client.set(self.prefix + key, value, px=max(int(ttl * 1000), 1))
+        except redis.RedisError:
+            logger.warning("Unable to write %s to cache", key, exc_info=True)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
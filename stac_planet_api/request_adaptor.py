@@ -1,13 +1,17 @@
+import functools
 import logging
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, cast
 
 import fastapi
+import orjson
+from pygeofilter import ast as pygeofilter_ast
+from pygeofilter.backends.cql2_json import to_cql2
+from pygeofilter.parsers.cql2_text import parse as parse_cql2_text
 
-from stac_planet_api.config import Settings
+from stac_planet_api.item_types import ITEM_TYPES
 from stac_planet_api.search_model import POST_REQUEST_MODEL
 
-settings = Settings()
-
 COMPARISONS = {
     ">": "gt",
     "<": "lt",
@@ -119,48 +123,142 @@ def equals_filter(eq_filter: dict[str, Any]) -> dict[str, Any]:
 
 
 def geometry_filter(geo_filter: dict[str, Any]) -> dict[str, Any]:
+    geometry = geo_filter["args"][1]
+
+    if "bbox" in geometry:
+        # A 3D bbox is (min x, min y, min z, max x, max y, max z)
+        bbox = geometry["bbox"]
+        min_x, min_y, max_x, max_y = bbox[0], bbox[1], bbox[len(bbox) // 2], bbox[len(bbox) // 2 + 1]
+        geometry = {
+            "type": "Polygon",
+            "coordinates": [[[min_x, min_y], [max_x, min_y], [max_x, max_y], [min_x, max_y], [min_x, min_y]]],
+        }
+
     return {
         "type": "GeometryFilter",
         "field_name": geo_filter["args"][0]["property"].removeprefix("properties."),
         "config": {
-            "type": "Polygon",
-            "coordinates": geo_filter["args"][1]["coordinates"],
+            "type": geometry["type"],
+            "coordinates": geometry["coordinates"],
         },
     }
 
 
-def convert_filter(stac_filter: dict[str, Any]) -> dict[str, Any] | None:
-    collections: list[str] = []
-    if stac_filter["op"] in ["and", "or"]:
-        config = []
-        for sub_filter in stac_filter["args"]:
-            result = convert_filter(sub_filter)
+def like_filter(like: dict[str, Any]) -> dict[str, Any] | None:
+    pattern = like["args"][1]
 
-            if result is None:
-                continue
-            if result["type"] == "Collection":
-                collections.extend(result["collections"])
-            else:
-                config.append(convert_filter(sub_filter))
+    # Planet has no pattern matching, so only patterns without wildcards can be pushed down
+    if "%" in pattern or "_" in pattern:
+        return None
 
-        config = [
-            c for c in config if c is not None
-        ]  # if there are any unrecognised filters then ignore them instead of erroring
+    return equals_filter({"op": "=", "args": [like["args"][0], pattern]})
 
-        return {"type": f"{stac_filter['op'].title()}Filter", "collections": collections, "config": config}
 
-    elif stac_filter["op"].lower() in ["between", "<", ">", "<=", ">="]:
-        return comparison_filter(stac_filter)
+@dataclass(frozen=True)
+class PlanetFilter:
+    """
+    A CQL2 filter translated to a Planet search filter.
 
-    elif stac_filter["op"].lower() in ["in", "="]:
-        return equals_filter(stac_filter)
+    `config` is None if no restriction could be pushed down to Planet. `collections` are the item types the filter
+    restricts the search to. `residual` is the part of the CQL2 filter that Planet doesn't apply and that must be
+    evaluated on the items Planet returns, or None if the Planet filter is exact.
+    """
 
-    elif stac_filter["op"] == "s_intersects":
-        return geometry_filter(stac_filter)
+    config: dict[str, Any] | None
+    collections: tuple[str, ...] = ()
+    residual: dict[str, Any] | None = None
 
-    else:
-        logging.info("Filter %s not recognised", stac_filter["op"])
-        return None
+    @property
+    def exact(self) -> bool:
+        return self.residual is None
+
+
+def translate_filter(stac_filter: dict[str, Any]) -> PlanetFilter:
+    """Translate a CQL2-JSON filter to a Planet filter, converting each node once."""
+    op = stac_filter["op"].lower()
+
+    if op in ["and", "or"]:
+        parts = [translate_filter(sub_filter) for sub_filter in stac_filter["args"]]
+        collections = tuple(collection for part in parts for collection in part.collections)
+        config = [part.config for part in parts if part.config is not None]
+
+        if op == "or":
+            if all(part.config is None and part.collections and part.exact for part in parts):
+                return PlanetFilter(config=None, collections=collections)
+
+            # Dropping part of an OR would narrow it, so it can only be pushed down if every part is a Planet filter
+            if any(part.config is None or part.collections for part in parts):
+                return PlanetFilter(config=None, residual=stac_filter)
+
+            residual = None if all(part.exact for part in parts) else stac_filter
+        else:
+            residuals = [part.residual for part in parts if part.residual is not None]
+            residual = residuals[0] if len(residuals) == 1 else {"op": "and", "args": residuals} if residuals else None
+
+        return PlanetFilter(
+            config={"type": f"{op.title()}Filter", "config": config}, collections=collections, residual=residual
+        )
+
+    if op == "not":
+        part = translate_filter(stac_filter["args"][0])
+        if part.config is None or part.collections or not part.exact:
+            return PlanetFilter(config=None, residual=stac_filter)
+        return PlanetFilter(config={"type": "NotFilter", "config": part.config})
+
+    if op in ["between", "<", ">", "<=", ">="]:
+        return PlanetFilter(config=comparison_filter(stac_filter))
+
+    if op in ["in", "="]:
+        planet_filter = equals_filter(stac_filter)
+        if planet_filter["type"] == "Collection":
+            return PlanetFilter(config=None, collections=tuple(planet_filter["collections"]))
+        return PlanetFilter(config=planet_filter)
+
+    if op in ["<>", "!="]:
+        planet_filter = equals_filter({"op": "=", "args": stac_filter["args"]})
+        if planet_filter["type"] == "Collection":
+            return PlanetFilter(config=None, residual=stac_filter)
+        return PlanetFilter(config={"type": "NotFilter", "config": planet_filter})
+
+    if op == "like":
+        planet_filter = like_filter(stac_filter)
+        return PlanetFilter(config=planet_filter, residual=None if planet_filter is not None else stac_filter)
+
+    if op == "s_intersects":
+        return PlanetFilter(config=geometry_filter(stac_filter))
+
+    if op == "s_within":
+        # Planet only filters on intersection, which matches a superset of the items within the geometry
+        return PlanetFilter(config=geometry_filter(stac_filter), residual=stac_filter)
+
+    logging.info("Filter %s not pushed down to Planet", stac_filter["op"])
+    return PlanetFilter(config=None, residual=stac_filter)
+
+
+@functools.lru_cache(maxsize=1024)
+def _convert_canonical_filter(canonical_filter: bytes) -> PlanetFilter:
+    return translate_filter(orjson.loads(canonical_filter))
+
+
+def convert_filter(stac_filter: dict[str, Any]) -> PlanetFilter:
+    """Translate a CQL2-JSON filter to a Planet filter, memoised on the filter's canonical JSON.
+
+    The result is shared between requests and must not be modified.
+    """
+    return _convert_canonical_filter(orjson.dumps(stac_filter, option=orjson.OPT_SORT_KEYS))
+
+
+@functools.lru_cache(maxsize=1024)
+def cql2_text_to_json(cql2_text: str) -> str:
+    """Parse a CQL2-text filter to CQL2-JSON, memoised."""
+    return to_cql2(cast(pygeofilter_ast.Node, parse_cql2_text(cql2_text)))
+
+
+def get_residual_filter(stac_request: POST_REQUEST_MODEL) -> dict[str, Any] | None:  # pyright: ignore[reportInvalidTypeForm]
+    """The part of a search's CQL2 filter that Planet doesn't apply, if any."""
+    if stac_filter := getattr(stac_request, "filter", None):
+        return convert_filter(stac_filter).residual
+    return None
 
 
 def build_search_filter(stac_request: POST_REQUEST_MODEL) -> dict[str, Any]:  # pyright: ignore[reportInvalidTypeForm]
@@ -172,9 +270,9 @@ def build_search_filter(stac_request: POST_REQUEST_MODEL) -> dict[str, Any]:  #
 
     if stac_filter := getattr(stac_request, "filter", None):
         planet_filter = convert_filter(stac_filter)
-        if planet_filter is not None:
-            collections.extend(planet_filter.pop("collections", []))
-            config.append(planet_filter)
+        collections.extend(planet_filter.collections)
+        if planet_filter.config is not None:
+            config.append(planet_filter.config)
 
     if intersects := getattr(stac_request, "intersects", None):
         config.append(
@@ -206,7 +304,7 @@ def stac_to_planet_request(stac_request: POST_REQUEST_MODEL) -> tuple[dict[str,
     collections = stac_request.collections or []
     collections.extend(search_filter.pop("collections", []))
 
-    planet_request["item_types"] = collections or settings.item_types
+    planet_request["item_types"] = collections or ITEM_TYPES.item_types
 
     if limit := getattr(stac_request, "limit", None):
         planet_parameters["_page_size"] = limit
@@ -0,0 +1,210 @@
+import asyncio
+import random
+import re
+import time
+from collections.abc import Awaitable, Callable, Collection
+from dataclasses import dataclass
+
+import httpx
+
+from stac_planet_api.keys import retry_after
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when Planet can't be called for an incoming request, which is then answered with 503."""
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    pass
+
+
+class Deadline:
+    """
+    The time left for the Planet calls made on behalf of one incoming request.
+
+    `degraded` counts the results left incomplete because the deadline passed or Planet was unavailable, so that the
+    response can say it is partial.
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.expires_at = time.monotonic() + seconds
+        self.degraded = 0
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+@dataclass
+class ResilienceStats:
+    retries: int = 0
+    failures: int = 0
+    short_circuited: int = 0
+    deadline_exceeded: int = 0
+
+
+def endpoint(url: str | httpx.URL) -> str:
+    """The Planet endpoint a URL calls, with ids wildcarded, e.g. `api.planet.com/data/v1/item-types/*/items/*`."""
+    url = httpx.URL(url)
+    return url.host + re.sub(r"/(item-types|items|searches)/[^/]+", r"/\1/*", url.path.rstrip("/"))
+
+
+class RetryPolicy:
+    """
+    Which failed calls are retried, and how long to wait before each retry.
+
+    Delays grow exponentially from `base_delay` up to `max_delay`, with full jitter so that calls failing together
+    don't retry together, and are at least the `Retry-After` of the failed response where that fits under `max_delay`.
+    """
+
+    def __init__(self, attempts: int, base_delay: float, max_delay: float, statuses: Collection[int]) -> None:
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = frozenset(statuses)
+
+    def retryable(self, response: httpx.Response) -> bool:
+        return response.status_code in self.statuses
+
+    def backoff(self, attempt: int, response: httpx.Response | None = None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if response is not None:
+            delay = max(delay, min(retry_after(response, default=0.0), self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Stop calling an endpoint for `reset_time` seconds once `failure_threshold` consecutive calls to it have failed.
+
+    After that one call is let through as a probe, holding the rest back for another `reset_time`, and the circuit
+    closes again as soon as a call succeeds.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_time: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_time = reset_time
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() < self.opened_at + self.reset_time
+
+    def check(self) -> None:
+        """Raise `CircuitOpen` if the endpoint shouldn't be called now."""
+        if self.opened_at is None:
+            return
+
+        now = time.monotonic()
+        if now < self.opened_at + self.reset_time:
+            raise CircuitOpen(
+                f"{self.name} is failing, not calling it", retry_after=self.opened_at + self.reset_time - now
+            )
+        self.opened_at = now
+
+    def succeeded(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def failed(self) -> None:
+        self.failures += 1
+        if self.failure_threshold > 0 and self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class Resilience:
+    """
+    Retry failed calls to Planet within the deadline of the incoming request, behind a circuit breaker per endpoint.
+
+    Transport errors and responses with a retryable status are retried. Server errors and transport errors count as
+    failures of the endpoint; any other response counts as a success.
+    """
+
+    def __init__(self, policy: RetryPolicy, failure_threshold: int, reset_time: float) -> None:
+        self.policy = policy
+        self.failure_threshold = failure_threshold
+        self.reset_time = reset_time
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.stats = ResilienceStats()
+
+    def breaker(self, url: str | httpx.URL) -> CircuitBreaker:
+        name = endpoint(url)
+        if (breaker := self.breakers.get(name)) is None:
+            breaker = self.breakers[name] = CircuitBreaker(name, self.failure_threshold, self.reset_time)
+        return breaker
+
+    def _can_retry(self, attempt: int, delay: float, deadline: Deadline | None) -> bool:
+        return attempt + 1 < self.policy.attempts and (deadline is None or delay < deadline.remaining())
+
+    async def call(
+        self,
+        url: str | httpx.URL,
+        send: Callable[[float | None], Awaitable[httpx.Response]],
+        deadline: Deadline | None = None,
+        retry_if: Callable[[httpx.Response], bool] | None = None,
+        retry_throttled: bool = True,
+    ) -> httpx.Response:
+        """
+        Make a call with `send`, which is given the seconds left before `deadline` to use as its timeout.
+
+        `retry_if` marks further responses as retryable, such as a success whose body can't be decoded. Throttled
+        (429) responses aren't retried if `retry_throttled` is false, for auth that has already retried them itself.
+        The last response or transport error is returned or raised once retries run out.
+        """
+        breaker = self.breaker(url)
+        attempt = 0
+
+        while True:
+            if deadline is not None and deadline.expired:
+                self.stats.deadline_exceeded += 1
+                raise DeadlineExceeded(f"Ran out of time calling {breaker.name}")
+            try:
+                breaker.check()
+            except CircuitOpen:
+                self.stats.short_circuited += 1
+                raise
+
+            try:
+                response = await send(deadline.remaining() if deadline is not None else None)
+            except httpx.TransportError as error:
+                self.stats.failures += 1
+                breaker.failed()
+                delay = self.policy.backoff(attempt)
+                if deadline is not None and deadline.expired:
+                    self.stats.deadline_exceeded += 1
+                    raise DeadlineExceeded(f"Ran out of time calling {breaker.name}") from error
+                if not self._can_retry(attempt, delay, deadline):
+                    raise
+            else:
+                if response.is_server_error:
+                    self.stats.failures += 1
+                    breaker.failed()
+                else:
+                    breaker.succeeded()
+
+                throttled = response.status_code == 429
+                retryable = (self.policy.retryable(response) and (retry_throttled or not throttled)) or (
+                    retry_if is not None and retry_if(response)
+                )
+                delay = self.policy.backoff(attempt, response)
+                if not retryable or not self._can_retry(attempt, delay, deadline):
+                    return response
+                # Release the connection of a streamed response that won't be read
+                await response.aclose()
+
+            self.stats.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
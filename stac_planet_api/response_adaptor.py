@@ -1,17 +1,29 @@
-import concurrent.futures
+import asyncio
+import contextlib
 import json
-from json import JSONDecodeError
+import logging
+from collections.abc import AsyncIterator
 from typing import Any
 from urllib.parse import urljoin
 
 import httpx
-from cryptography.fernet import Fernet
+import orjson
+from fastapi import HTTPException
 
+from stac_planet_api.cache import Cache, create_cache_backend
+from stac_planet_api.client import PlanetSession
 from stac_planet_api.config import Settings
+from stac_planet_api.fields import FieldsProjector
+from stac_planet_api.geometry import GeometrySimplifier, get_bbox
+from stac_planet_api.http_cache import Document
+from stac_planet_api.resilience import Deadline, UpstreamUnavailable
+from stac_planet_api.tokens import TokenCodec
 
 settings = Settings()
 
-FERNET = Fernet(settings.fernet_key)
+logger = logging.getLogger(__name__)
+
+TOKENS = TokenCodec(settings.fernet_key, cache_size=settings.cache_max_entries)
 
 with open("stac_planet_api/queyables.json", encoding="utf-8") as file:
     QUERYABLES: dict = json.load(file)
@@ -19,6 +31,11 @@ with open("stac_planet_api/queyables.json", encoding="utf-8") as file:
 with open("stac_planet_api/asset_types.json", encoding="utf-8") as file:
     ASSET_TYPES: dict = json.load(file)
 
+CACHE_BACKEND = create_cache_backend(settings)
+
+# Planet asset listings, keyed by listing URL and credentials so permissions are not shared between users
+ASSET_CACHE = Cache(CACHE_BACKEND, "assets", ttl=settings.asset_cache_ttl)
+
 
 def get_item_links(base_url: str, collection_id: str, item_id: str) -> list[dict[str, str]]:
     """
@@ -45,11 +62,18 @@ def get_item_links(base_url: str, collection_id: str, item_id: str) -> list[dict
 
 
 def get_search_links(
-    base_url: str, next_token: str | None, prev_token: str | None, api_key: str
+    base_url: str,
+    next_token: str | None,
+    prev_token: str | None,
+    api_key: str,
+    residual: dict[str, Any] | None = None,
+    next_offset: int = 0,
 ) -> list[dict[str, Any]]:
     """
-    Get search links
+    Get search links, with one token for each of the next and previous pages shared by their GET and POST links.
+    `next_offset` is the number of items at the start of the next page that have already been returned.
     """
+    residual_json = orjson.dumps(residual) if residual is not None else None
     links: list[dict[str, Any]] = [
         {
             "rel": "self",
@@ -60,7 +84,7 @@ def get_search_links(
     ]
 
     if next_token:
-        next_token = FERNET.encrypt(f"{next_token}\\{api_key}".encode()).decode("utf-8")
+        next_token = TOKENS.encode(next_token, api_key, residual_json, next_offset)
         links.extend(
             [
                 {
@@ -83,7 +107,7 @@ def get_search_links(
         )
 
     if prev_token:
-        prev_token = FERNET.encrypt(f"{prev_token}\\{api_key}".encode()).decode("utf-8")
+        prev_token = TOKENS.encode(prev_token, api_key, residual_json)
         links.extend(
             [
                 {
@@ -108,15 +132,16 @@ def get_search_links(
     return links
 
 
-def get_assets(
-    collection_id: str,
-    thumbnail_href: str,
-    assets_href: str,
-    auth: httpx.BasicAuth,
-    path: str | None = None,
-) -> dict[str, Any]:
+def get_thumbnail_url(collection_id: str, item_id: str) -> str:
     """
-    Get item assets
+    Get the Planet thumbnail URL for an item, which needs no call to Planet
+    """
+    return f"https://tiles.planet.com/data/v1/item-types/{collection_id}/items/{item_id}/thumb"
+
+
+def get_thumbnail_assets(thumbnail_href: str, path: str | None = None) -> dict[str, Any]:
+    """
+    Get item thumbnail assets, which need no call to Planet
     """
     output: dict[str, Any] = {
         "external_thumbnail": {
@@ -126,29 +151,6 @@ def get_assets(
         }
     }
 
-    client = httpx.Client(
-        auth=auth,
-        verify=False,
-        timeout=180,
-    )
-
-    assets: dict = {}
-    count = 0
-    while count < 10:
-        count += 1
-        try:
-            assets = client.get(assets_href).json()
-            break
-        except JSONDecodeError:
-            pass
-
-    for key, value in assets.items():
-        output[key] = {
-            "href": value["_links"]["_self"],
-            "roles": ["data"],
-            "type": ASSET_TYPES.get(collection_id, {}).get(value["type"], "UNKNOWN"),
-        }
-
     if path:
         output["thumbnail"] = {
             "href": f"{path}/thumbnail",
@@ -159,114 +161,163 @@ def get_assets(
     return output
 
 
-def point(coordinates: list[float]) -> list[float]:
-    """
-    Get point bbox
-    """
-    return [
-        coordinates[0],
-        coordinates[1],
-        coordinates[0],
-        coordinates[1],
-    ]
-
-
-def line(coordinates: list[list[float]]) -> list[float]:
-    """
-    Get line bbox
-    """
-    bbox = point(coordinates[0])
-
-    for coordinate in coordinates[1:]:
-        if coordinate[0] < bbox[0]:
-            bbox[0] = coordinate[0]
-
-        elif coordinate[0] > bbox[2]:
-            bbox[2] = coordinate[0]
-
-        if coordinate[1] < bbox[1]:
-            bbox[1] = coordinate[1]
+def decoded(response: httpx.Response) -> dict[str, Any]:
+    """The JSON object in a response, decoded once however often it's asked for. Raises `orjson.JSONDecodeError`."""
+    if "decoded" not in response.extensions:
+        response.extensions["decoded"] = orjson.loads(response.content)
+    return response.extensions["decoded"]
 
-        elif coordinate[1] > bbox[3]:
-            bbox[3] = coordinate[1]
 
-    return bbox
+def undecodable(response: httpx.Response) -> bool:
+    """Whether a successful response has a body that isn't JSON, as Planet occasionally sends under load."""
+    if not response.is_success:
+        return False
+    try:
+        decoded(response)
+    except orjson.JSONDecodeError:
+        return True
+    return False
 
 
-def polygon(coordinates: list[Any]) -> list[float]:
+async def get_asset_listing(assets_href: str, client: PlanetSession) -> dict[str, Any]:
     """
-    Get polygon bbox
-    """
-    return line(coordinates[0][1:])
-
+    Get the Planet asset listing for an item
 
-def multi(coordinate_type: str, coordinates: list[Any]) -> list[float]:
-    """
-    Get polygon bbox
+    Raises `UpstreamUnavailable` if Planet fails to return a listing, after retrying where that is worthwhile, or
+    `HTTPException` with Planet's status if it refuses the call.
     """
+    cache_key = f"{assets_href}|{client.credential_hash}"
+    cached_assets = await ASSET_CACHE.get_json(cache_key)
+    if cached_assets is not None:
+        return cached_assets
+
+    try:
+        assets_response = await client.get(assets_href, retry_if=undecodable)
+    except httpx.TransportError as error:
+        raise UpstreamUnavailable(f"Unable to reach Planet listing assets for {assets_href}") from error
+
+    if assets_response.is_client_error:
+        raise HTTPException(
+            status_code=assets_response.status_code,
+            detail=f"Planet returned {assets_response.status_code} listing assets.",
+            headers={"Retry-After": retry_after}
+            if (retry_after := assets_response.headers.get("Retry-After"))
+            else None,
+        )
+    if not assets_response.is_success:
+        raise UpstreamUnavailable(f"Planet returned {assets_response.status_code} listing assets for {assets_href}")
 
-    bboxes_or_none = [get_bbox(coordinate_type.removeprefix("Multi"), coordinate) for coordinate in coordinates]
-    bboxes = [bbox for bbox in bboxes_or_none if bbox is not None]
-    return [
-        min(bbox[0] for bbox in bboxes),
-        max(bbox[2] for bbox in bboxes),
-        min(bbox[1] for bbox in bboxes),
-        max(bbox[3] for bbox in bboxes),
-    ]
+    try:
+        assets = decoded(assets_response)
+    except orjson.JSONDecodeError as error:
+        raise UpstreamUnavailable(f"Planet returned an undecodable asset listing for {assets_href}") from error
+
+    await ASSET_CACHE.set_json(cache_key, assets)
+    return assets
 
 
-def get_bbox(coordinate_type: str, coordinates: list[Any]) -> list[float] | None:
+async def get_assets(
+    collection_id: str,
+    thumbnail_href: str,
+    assets_href: str,
+    client: PlanetSession,
+    path: str | None = None,
+) -> dict[str, Any]:
     """
-    Get bbox from geometry
+    Get item assets
     """
-    if coordinate_type == "Point":
-        return point(coordinates)
-
-    if coordinate_type == "Line":
-        return line(coordinates)
-
-    if coordinate_type == "Polygon":
-        return polygon(coordinates)
+    thumbnails = get_thumbnail_assets(thumbnail_href, path=path)
+    output: dict[str, Any] = {"external_thumbnail": thumbnails.pop("external_thumbnail")}
 
-    if coordinate_type.startswith("Multi"):
-        return multi(coordinate_type, coordinates)
+    for key, value in (await get_asset_listing(assets_href, client)).items():
+        output[key] = {
+            "href": value["_links"]["_self"],
+            "roles": ["data"],
+            "type": ASSET_TYPES.get(collection_id, {}).get(value["type"], "UNKNOWN"),
+        }
 
-    return None
+    return output | thumbnails
 
 
-def map_item(
+async def map_item(
     order: int,
     planet_item: dict[str, Any],
     base_url: str,
-    auth: httpx.BasicAuth,
+    client: PlanetSession,
     path: str | None = None,
+    semaphore: asyncio.Semaphore | None = None,
+    expand_assets: bool = True,
+    fields: FieldsProjector | None = None,
+    simplifier: GeometrySimplifier | None = None,
+    deadline: Deadline | None = None,
 ) -> tuple[int, dict[str, Any]]:
-    return order, {
+    """
+    Map a Planet item to a STAC item.
+
+    If `expand_assets` is false, or the assets can't be listed, only the thumbnail assets are included, with an
+    `assets` link to the full assets; not expanding them saves a call to Planet per item. Assets not listed by
+    `deadline` are left lazy in the same way, and counted in `deadline.degraded`. Parts of the item not selected by
+    `fields` are not computed at all. The bbox is always that of the full geometry, even if the geometry is simplified
+    by `simplifier`.
+    """
+    fields = fields or FieldsProjector()
+    collection_id = planet_item["properties"]["item_type"]
+
+    stac_item: dict[str, Any] = {
         "type": "Feature",
         "stac_version": "1.0.0",
         "stac_extensions": [],
         "id": planet_item["id"],
-        "collection": planet_item["properties"]["item_type"],
-        "geometry": planet_item["geometry"],
-        "bbox": get_bbox(
-            coordinate_type=planet_item["geometry"]["type"],
-            coordinates=planet_item["geometry"]["coordinates"],
-        ),
-        "properties": planet_item["properties"] | {"datetime": planet_item["properties"]["acquired"]},
-        "links": get_item_links(
-            base_url=base_url,
-            collection_id=planet_item["properties"]["item_type"],
-            item_id=planet_item["id"],
-        ),
-        "assets": get_assets(
-            collection_id=planet_item["properties"]["item_type"],
-            thumbnail_href=planet_item["_links"]["thumbnail"],
-            assets_href=planet_item["_links"]["assets"],
-            auth=auth,
-            path=path,
-        ),
+        "collection": collection_id,
     }
 
+    if fields.wants("geometry"):
+        stac_item["geometry"] = simplifier.simplify(planet_item["geometry"]) if simplifier else planet_item["geometry"]
+
+    if fields.wants("bbox"):
+        stac_item["bbox"] = get_bbox(planet_item["geometry"])
+
+    if fields.wants("properties"):
+        stac_item["properties"] = planet_item["properties"] | {"datetime": planet_item["properties"]["acquired"]}
+
+    assets = None
+    if fields.wants("assets") and expand_assets:
+        try:
+            async with (
+                asyncio.timeout(deadline.remaining() if deadline is not None else None),
+                semaphore or contextlib.nullcontext(),
+            ):
+                assets = await get_assets(
+                    collection_id=collection_id,
+                    thumbnail_href=planet_item["_links"]["thumbnail"],
+                    assets_href=planet_item["_links"]["assets"],
+                    client=client,
+                    path=path,
+                )
+        except (UpstreamUnavailable, HTTPException, TimeoutError):
+            logger.warning("Unable to list assets of %s, leaving them to be resolved lazily", planet_item["id"])
+            if deadline is not None:
+                deadline.degraded += 1
+
+    if fields.wants("links"):
+        stac_item["links"] = get_item_links(base_url=base_url, collection_id=collection_id, item_id=planet_item["id"])
+
+        if assets is None and fields.wants("assets"):
+            stac_item["links"].append(
+                {
+                    "rel": "assets",
+                    "type": "application/json",
+                    "href": urljoin(base_url, f"collections/{collection_id}/items/{planet_item['id']}/assets"),
+                }
+            )
+
+    if fields.wants("assets"):
+        stac_item["assets"] = (
+            assets if assets is not None else get_thumbnail_assets(planet_item["_links"]["thumbnail"], path=path)
+        )
+
+    return order, fields.project(stac_item) if fields else stac_item
+
 
 def get_quertables(collection_id: str = "") -> dict[str, Any]:
     queryables: dict[str, Any] = {
@@ -312,36 +363,150 @@ def get_quertables(collection_id: str = "") -> dict[str, Any]:
     return queryables
 
 
-def planet_to_stac_response(
+# Queryables only change on restart, so each document is serialised once. Keyed by lower case collection id, with the
+# catalogue's queryables under "".
+QUERYABLES_DOCUMENTS: dict[str, Document] = {
+    collection_id: Document.from_json(get_quertables(collection_id=collection_id))
+    for collection_id in ["", *QUERYABLES]
+}
+
+
+async def iter_mapped_items(
+    planet_items: list[dict[str, Any]],
+    base_url: str,
+    client: PlanetSession,
+    expand_assets: bool = True,
+    fields: FieldsProjector | None = None,
+    simplifier: GeometrySimplifier | None = None,
+    deadline: Deadline | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Map a page of Planet items concurrently, yielding each in order as soon as it and those before it are mapped.
+    """
+    semaphore = asyncio.Semaphore(settings.asset_concurrency)
+
+    tasks = [
+        asyncio.ensure_future(
+            map_item(
+                order=order,
+                planet_item=planet_item,
+                base_url=base_url,
+                client=client,
+                path=f"{base_url}collections/{planet_item['properties']['item_type']}/items/{planet_item['id']}",
+                semaphore=semaphore,
+                expand_assets=expand_assets,
+                fields=fields,
+                simplifier=simplifier,
+                deadline=deadline,
+            )
+        )
+        for order, planet_item in enumerate(planet_items)
+    ]
+
+    try:
+        for task in tasks:
+            _, stac_item = await task
+            yield stac_item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def map_items(
+    planet_items: list[dict[str, Any]],
+    base_url: str,
+    client: PlanetSession,
+    expand_assets: bool = True,
+    fields: FieldsProjector | None = None,
+    simplifier: GeometrySimplifier | None = None,
+    deadline: Deadline | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Map a page of Planet items concurrently, preserving their order.
+    """
+    return [
+        stac_item
+        async for stac_item in iter_mapped_items(
+            planet_items,
+            base_url=base_url,
+            client=client,
+            expand_assets=expand_assets,
+            fields=fields,
+            simplifier=simplifier,
+            deadline=deadline,
+        )
+    ]
+
+
+def get_response_links(
+    planet_response: dict[str, Any], base_url: str, api_key: str, residual: dict[str, Any] | None = None
+) -> list[dict[str, Any]]:
+    return get_search_links(
+        base_url=base_url,
+        next_token=planet_response["_links"].get("_next"),
+        prev_token=planet_response["_links"].get("_prev"),
+        api_key=api_key,
+        residual=residual,
+        next_offset=planet_response.get("_next_offset", 0),
+    )
+
+
+async def planet_to_stac_response(
     planet_response: dict[str, Any],
     base_url: str,
-    auth: httpx.BasicAuth,
+    client: PlanetSession,
     api_key: str,
+    expand_assets: bool = True,
+    fields: FieldsProjector | None = None,
+    simplifier: GeometrySimplifier | None = None,
+    residual: dict[str, Any] | None = None,
+    deadline: Deadline | None = None,
 ) -> dict[str, Any]:
-    stac_items: dict[int, dict[str, Any]] = {}
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        fut = []
-        for order, planet_item in enumerate(planet_response["features"]):
-            collection_id = planet_item["properties"]["item_type"]
-            item_id = planet_item["id"]
-            item_path = f"{base_url}collections/{collection_id}/items/{item_id}"
-            fut.append(executor.submit(map_item, order, planet_item, base_url, auth, item_path))
-
-        for r in concurrent.futures.as_completed(fut):
-            try:
-                order, data = r.result()
-                stac_items[order] = data
-            except json.decoder.JSONDecodeError:
-                pass
-
     return {
         "type": "FeatureCollection",
-        "features": [stac_items[k] for k in sorted(stac_items)],
-        "links": get_search_links(
+        "features": await map_items(
+            planet_response["features"],
             base_url=base_url,
-            next_token=planet_response["_links"].get("_next"),
-            prev_token=planet_response["_links"].get("_prev"),
-            api_key=api_key,
+            client=client,
+            expand_assets=expand_assets,
+            fields=fields,
+            simplifier=simplifier,
+            deadline=deadline,
         ),
+        "links": get_response_links(planet_response, base_url=base_url, api_key=api_key, residual=residual),
     }
+
+
+async def stream_stac_response(
+    planet_response: dict[str, Any],
+    base_url: str,
+    client: PlanetSession,
+    api_key: str,
+    expand_assets: bool = True,
+    fields: FieldsProjector | None = None,
+    simplifier: GeometrySimplifier | None = None,
+    residual: dict[str, Any] | None = None,
+    deadline: Deadline | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Serialise the STAC FeatureCollection incrementally, writing each feature as soon as it has been mapped.
+
+    The headers are sent before any item is mapped, so the response can't say if `deadline` left some incomplete.
+    """
+    yield b'{"type":"FeatureCollection","features":['
+
+    separator = b""
+    async for stac_item in iter_mapped_items(
+        planet_response["features"],
+        base_url=base_url,
+        client=client,
+        expand_assets=expand_assets,
+        fields=fields,
+        simplifier=simplifier,
+        deadline=deadline,
+    ):
+        yield separator + orjson.dumps(stac_item)
+        separator = b","
+
+    links = get_response_links(planet_response, base_url=base_url, api_key=api_key, residual=residual)
+    yield b'],"links":' + orjson.dumps(links) + b"}"
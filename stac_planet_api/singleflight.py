@@ -0,0 +1,59 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+
+@dataclass
+class SingleFlightStats:
+    calls: int = 0
+    collapsed: int = 0
+
+
+class SingleFlight[T]:
+    """
+    Coalesce concurrent calls with the same key so that only one of them does the work.
+
+    Callers that arrive while a call with their key is in flight await the same result (or exception) instead of
+    starting their own. The shared call runs as a task so that it isn't cancelled if the caller that started it is, but
+    it is cancelled once every caller awaiting it has been.
+    """
+
+    def __init__(self) -> None:
+        self.stats = SingleFlightStats()
+        self._in_flight: dict[str, asyncio.Task[T]] = {}
+        self._waiting: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        self.stats.calls += 1
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.stats.collapsed += 1
+
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                del self._waiting[key]
+                # Nobody is left to use the result, so stop working on it, and let callers arriving before the task
+                # has finished start afresh rather than join it
+                if self._in_flight.get(key) is task:
+                    del self._in_flight[key]
+                task.cancel()
+
+    def _finished(self, key: str, task: asyncio.Task[T]) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+        # Mark any exception as retrieved in case every caller was cancelled before it completed
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,115 @@
+import importlib.util
+import io
+import math
+import secrets
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+# Size in pixels of the cells of a sprite when no `size` is requested, that of Planet thumbnails
+DEFAULT_SPRITE_CELL_SIZE = 256
+
+
+class ThumbnailReference(BaseModel):
+    collection: str
+    id: str
+
+
+class ThumbnailsRequest(BaseModel):
+    """A batch of item thumbnails, optionally downscaled to fit within `size` pixels."""
+
+    items: list[ThumbnailReference] = Field(min_length=1)
+    size: int | None = Field(default=None, gt=0, le=1024)
+    format: Literal["multipart", "sprite"] = "multipart"
+
+
+@dataclass(frozen=True)
+class Thumbnail:
+    reference: ThumbnailReference
+    content: bytes
+    media_type: str
+
+
+def can_resize() -> bool:
+    """Whether Pillow, needed to downscale thumbnails and build sprites, is installed."""
+    return importlib.util.find_spec("PIL") is not None
+
+
+def downscale(thumbnail: Thumbnail, size: int) -> Thumbnail:
+    """Shrink a thumbnail to fit within `size` pixels, keeping its aspect ratio. Needs Pillow.
+
+    Thumbnails that can't be decoded are returned unchanged.
+    """
+    from PIL import Image  # noqa: PLC0415 - optional dependency
+
+    try:
+        with Image.open(io.BytesIO(thumbnail.content)) as image:
+            if max(image.size) <= size:
+                return thumbnail
+
+            image.thumbnail((size, size))
+            output = io.BytesIO()
+            image.save(output, format="PNG")
+    except OSError:
+        return thumbnail
+
+    return Thumbnail(reference=thumbnail.reference, content=output.getvalue(), media_type="image/png")
+
+
+def multipart(thumbnails: Sequence[Thumbnail], path: str) -> tuple[bytes, str]:
+    """Encode thumbnails as a `multipart/mixed` body, each part located by its thumbnail URL under `path`.
+
+    Returns the body and its media type.
+    """
+    boundary = secrets.token_hex(16)
+    body = bytearray()
+
+    for thumbnail in thumbnails:
+        reference = thumbnail.reference
+        body += (
+            f"--{boundary}\r\n"
+            f"Content-Type: {thumbnail.media_type}\r\n"
+            f"Content-Length: {len(thumbnail.content)}\r\n"
+            f"Content-Location: {path}collections/{reference.collection}/items/{reference.id}/thumbnail\r\n"
+            "\r\n"
+        ).encode()
+        body += thumbnail.content
+        body += b"\r\n"
+
+    body += f"--{boundary}--\r\n".encode()
+    return bytes(body), f"multipart/mixed; boundary={boundary}"
+
+
+def sprite_grid(count: int) -> tuple[int, int]:
+    """The number of columns and rows of a sprite of `count` cells, as near square as possible."""
+    columns = math.ceil(math.sqrt(count))
+    return columns, math.ceil(count / columns)
+
+
+def sprite(thumbnails: Sequence[Thumbnail | None], cell_size: int) -> tuple[bytes, int]:
+    """Tile thumbnails into a single PNG, in rows of square cells in request order. Needs Pillow.
+
+    Missing thumbnails, and those that can't be decoded, leave their cell empty. Returns the image and its number of
+    columns.
+    """
+    from PIL import Image  # noqa: PLC0415 - optional dependency
+
+    columns, rows = sprite_grid(len(thumbnails))
+    mosaic = Image.new("RGBA", (columns * cell_size, rows * cell_size))
+
+    for index, thumbnail in enumerate(thumbnails):
+        if thumbnail is None:
+            continue
+        try:
+            with Image.open(io.BytesIO(thumbnail.content)) as image:
+                image.thumbnail((cell_size, cell_size))
+                row, column = divmod(index, columns)
+                mosaic.paste(image.convert("RGBA"), (column * cell_size, row * cell_size))
+        except OSError:
+            continue
+
+    output = io.BytesIO()
+    mosaic.save(output, format="PNG")
+    return output.getvalue(), columns
@@ -0,0 +1,143 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+from cryptography.fernet import InvalidToken as InvalidFernetToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+TOKEN_VERSION = b"\x01"
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+# Flags in the first byte of a token's plaintext
+COMPRESSED = 1
+PLANET_SEARCH_LINK = 2
+OFFSET = 4
+
+# Raw deflate with a small window: tokens are short and already authenticated, so zlib's header and checksum and a
+# large window only cost time and bytes
+DEFLATE_WBITS = -9
+
+# Every Planet search page link starts with this, so it is left out of tokens
+PLANET_SEARCHES_URL = "https://api.planet.com/data/v1/searches/"
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class PageToken:
+    """
+    The Planet page link a pagination token leads to, the API key to follow it with and the residual filter.
+
+    `offset` is the number of items at the start of the page that an earlier page of results already covered.
+    """
+
+    link: str
+    api_key: str
+    residual_json: bytes | None = None
+    offset: int = 0
+
+    @property
+    def residual(self) -> dict[str, Any] | None:
+        return orjson.loads(self.residual_json) if self.residual_json is not None else None
+
+
+class TokenCodec:
+    """
+    Encode Planet page links as short, authenticated pagination tokens.
+
+    A token is the link, less the prefix shared by every Planet search page link, with the API key and residual
+    filter, compressed when that makes it shorter and encrypted with AES-GCM. The nonce is derived from the contents,
+    so a page always gets the same token and both encoding and decoding can be memoised. Fernet tokens from earlier
+    releases are still accepted.
+    """
+
+    def __init__(self, key: str, cache_size: int = 4096) -> None:
+        secret = base64.urlsafe_b64decode(key)
+        self._fernet = Fernet(key)
+        self._aead = AESGCM(hashlib.sha256(b"stac-planet-api pagination token key" + secret).digest())
+        self._nonce_key = hashlib.sha256(b"stac-planet-api pagination token nonce" + secret).digest()
+
+        self.encode = lru_cache(maxsize=cache_size)(self._encode)
+        self.decode = lru_cache(maxsize=cache_size)(self._decode)
+
+    def _encode(self, link: str, api_key: str, residual_json: bytes | None = None, offset: int = 0) -> str:
+        """A token for `link`. `residual_json` is the residual filter serialised as JSON, so that it is hashable."""
+        flags = 0
+        if link.startswith(PLANET_SEARCHES_URL):
+            link = link.removeprefix(PLANET_SEARCHES_URL)
+            flags |= PLANET_SEARCH_LINK
+
+        data = f"{link}\n{api_key}".encode()
+        if offset:
+            data = f"{offset}\n".encode() + data
+            flags |= OFFSET
+        if residual_json is not None:
+            data += b"\n" + residual_json
+
+        compressed = zlib.compress(data, wbits=DEFLATE_WBITS)
+        if len(compressed) < len(data):
+            data = compressed
+            flags |= COMPRESSED
+
+        plaintext = bytes([flags]) + data
+        nonce = hmac.digest(self._nonce_key, plaintext, "sha256")[:NONCE_SIZE]
+        raw = TOKEN_VERSION + nonce + self._aead.encrypt(nonce, plaintext, TOKEN_VERSION)
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+    def _decode(self, token: str) -> PageToken:
+        """The contents of a token, raising `InvalidToken` if it wasn't made with this key."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except (binascii.Error, ValueError) as e:
+            raise InvalidToken("Token is not base64") from e
+
+        if not raw.startswith(TOKEN_VERSION):
+            return self._decode_fernet(token)
+        if len(raw) < len(TOKEN_VERSION) + NONCE_SIZE + TAG_SIZE + 1:
+            raise InvalidToken("Token is too short")
+
+        nonce = raw[len(TOKEN_VERSION) : len(TOKEN_VERSION) + NONCE_SIZE]
+        try:
+            plaintext = self._aead.decrypt(nonce, raw[len(TOKEN_VERSION) + NONCE_SIZE :], TOKEN_VERSION)
+        except InvalidTag as e:
+            raise InvalidToken("Token was not issued by this server") from e
+
+        flags, data = plaintext[0], plaintext[1:]
+        if flags & COMPRESSED:
+            data = zlib.decompress(data, wbits=DEFLATE_WBITS)
+
+        offset = 0
+        if flags & OFFSET:
+            offset_digits, data = data.split(b"\n", 1)
+            offset = int(offset_digits)
+
+        link, api_key, *residual_json = data.split(b"\n", 2)
+        prefix = PLANET_SEARCHES_URL if flags & PLANET_SEARCH_LINK else ""
+        return PageToken(
+            link=prefix + link.decode(),
+            api_key=api_key.decode(),
+            residual_json=residual_json[0] if residual_json else None,
+            offset=offset,
+        )
+
+    def _decode_fernet(self, token: str) -> PageToken:
+        try:
+            parts = self._fernet.decrypt(token).decode("utf-8").split("\\", 2)
+        except InvalidFernetToken as e:
+            raise InvalidToken("Token was not issued by this server") from e
+
+        if len(parts) < 2:
+            raise InvalidToken("Token is incomplete")
+
+        return PageToken(link=parts[0], api_key=parts[1], residual_json=parts[2].encode() if len(parts) > 2 else None)
@@ -0,0 +1,56 @@
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from stac_planet_api.cache import Cache, MemoryCacheBackend, TTLCache
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.disk_cache import DiskLRUCache
+
+
+@pytest.fixture(autouse=True)
+def empty_caches(tmp_path: Path) -> Iterator[None]:
+    """Give every test its own empty caches so that responses cached by one test can't leak into another."""
+    backend = MemoryCacheBackend(maxsize=256)
+
+    with (
+        patch("stac_planet_api.response_adaptor.ASSET_CACHE", Cache(backend, "assets", ttl=60)),
+        patch("stac_planet_api.api.ITEM_CACHE", Cache(backend, "items", ttl=60)),
+        patch("stac_planet_api.api.THUMBNAIL_CACHE", DiskLRUCache(tmp_path / "thumbnails", max_bytes=2**20, ttl=60)),
+        patch("stac_planet_api.api.ITEM_COLLECTION_HINTS", TTLCache(maxsize=256, ttl=60)),
+    ):
+        yield
+
+
+@pytest.fixture
+def planet_item() -> Callable[..., dict[str, Any]]:
+    """Build a minimal Planet item."""
+
+    def make(item_id: str, item_type: str = "PSScene") -> dict[str, Any]:
+        return {
+            "id": item_id,
+            "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]},
+            "properties": {"item_type": item_type, "acquired": "2024-01-01T00:00:00Z", "cloud_cover": 0.1},
+            "_links": {
+                "thumbnail": f"https://tiles.planet.com/data/v1/item-types/{item_type}/items/{item_id}/thumb",
+                "assets": f"https://api.planet.com/data/v1/item-types/{item_type}/items/{item_id}/assets/",
+            },
+        }
+
+    return make
+
+
+@pytest.fixture
+def planet_session() -> Callable[[Callable], PlanetSession]:
+    """Build a PlanetSession whose requests are answered by a handler instead of Planet."""
+
+    def make(handler: Callable) -> PlanetSession:
+        return PlanetSession(
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            auth=httpx.BasicAuth(username="test-api-key", password=""),
+        )
+
+    return make
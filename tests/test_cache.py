@@ -0,0 +1,105 @@
+"""Tests for the in-process TTL/LRU cache."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app
+from stac_planet_api.cache import Cache, CacheBackend, MemoryCacheBackend, TTLCache, credential_hash
+
+
+def test_lru_eviction() -> None:
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats.evictions == 1
+    assert (cache.stats.hits, cache.stats.misses) == (3, 1)
+
+
+def test_entries_expire() -> None:
+    cache = TTLCache(maxsize=2, ttl=10)
+
+    with patch("stac_planet_api.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+
+    with patch("stac_planet_api.cache.time.monotonic", return_value=109.0):
+        assert cache.get("a") == 1
+
+    with patch("stac_planet_api.cache.time.monotonic", return_value=110.0):
+        assert cache.get("a") is None
+
+    assert cache.stats.expirations == 1
+    assert len(cache) == 0
+
+
+def test_credential_hash_does_not_contain_credential() -> None:
+    assert "secret" not in credential_hash("secret")
+    assert credential_hash("secret") != credential_hash("other")
+
+
+@pytest.mark.parametrize("backend_factory", ["memory", "redis"])
+def test_cache_backends_round_trip_json_with_ttl(backend_factory: str) -> None:
+    if backend_factory == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        from stac_planet_api.redis_cache import RedisCacheBackend  # noqa: PLC0415 - optional dependency
+
+        backend: CacheBackend = RedisCacheBackend(fakeredis.FakeAsyncRedis())
+    else:
+        backend = MemoryCacheBackend(maxsize=16)
+
+    items = Cache(backend, "items", ttl=60)
+    other_namespace = Cache(backend, "thumbnails", ttl=60)
+
+    async def run() -> None:
+        await items.set_json("PSScene/1", {"id": "1", "properties": {"cloud_cover": 0.1}})
+
+        assert await items.get_json("PSScene/1") == {"id": "1", "properties": {"cloud_cover": 0.1}}
+        assert await other_namespace.get_json("PSScene/1") is None
+
+        await items.set_bytes("expired", b"payload", ttl=0.001)
+        await asyncio.sleep(0.01)
+        assert await items.get_bytes("expired") is None
+
+        await backend.aclose()
+
+    asyncio.run(run())
+
+    assert items.stats.hits == 1
+    assert items.stats.misses == 1
+
+
+def test_disabled_cache_does_not_store() -> None:
+    backend = MemoryCacheBackend(maxsize=16)
+    disabled = Cache(backend, "items", ttl=0)
+
+    async def run() -> bytes | None:
+        await disabled.set_bytes("key", b"payload")
+        return await disabled.get_bytes("key")
+
+    assert asyncio.run(run()) is None
+    assert len(backend.entries) == 0
+
+
+def test_backend_evictions_are_reported_in_stats() -> None:
+    backend = MemoryCacheBackend(maxsize=1)
+    items = Cache(backend, "items", ttl=60)
+
+    async def run() -> None:
+        await items.set_bytes("a", b"payload")
+        await items.set_bytes("b", b"payload")
+
+    asyncio.run(run())
+
+    with patch("stac_planet_api.api.ITEM_CACHE", items):
+        stats = TestClient(app).get("/_mgmt/stats").json()["caches"]
+
+    assert stats["backend"]["evictions"] == 1
+    assert stats["items"] == {"hits": 0, "misses": 0}
@@ -0,0 +1,42 @@
+"""Tests for the shared, pooled Planet client."""
+
+import asyncio
+
+import httpx
+
+from stac_planet_api.client import PlanetClientManager
+from stac_planet_api.config import Settings
+
+
+def test_sessions_share_one_pooled_client() -> None:
+    manager = PlanetClientManager(Settings())
+
+    first = manager.session(httpx.BasicAuth(username="key-1", password=""))
+    second = manager.session(httpx.BasicAuth(username="key-2", password=""))
+
+    assert first.client is second.client
+    asyncio.run(manager.aclose())
+
+
+def test_session_injects_auth_per_request() -> None:
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers["Authorization"])
+        return httpx.Response(200, json={})
+
+    manager = PlanetClientManager(Settings())
+    manager._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def run() -> None:
+        await manager.session(httpx.BasicAuth(username="key-1", password="")).get("https://api.planet.com/a")
+        await manager.session(httpx.BasicAuth(username="key-2", password="")).get("https://api.planet.com/b")
+        await manager.aclose()
+
+    asyncio.run(run())
+
+    assert seen == [
+        httpx.BasicAuth(username="key-1", password="")._auth_header,
+        httpx.BasicAuth(username="key-2", password="")._auth_header,
+    ]
+    assert manager._client is None
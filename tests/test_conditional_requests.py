@@ -0,0 +1,77 @@
+"""Tests for per-endpoint caching policy and conditional requests."""
+
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app, settings
+from stac_planet_api.client import PlanetSession
+
+
+@pytest.fixture
+def session(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> PlanetSession:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("quick-search"):
+            return httpx.Response(
+                200,
+                json={
+                    "features": [planet_item("1")],
+                    "_links": {"_next": "https://api.planet.com/data/v1/searches/abc/results?_page=1"},
+                },
+            )
+        if request.url.path.endswith("/items/missing"):
+            return httpx.Response(404)
+        if request.url.path.endswith("/assets/"):
+            return httpx.Response(200, json={})
+        return httpx.Response(200, json=planet_item("1"))
+
+    return planet_session(handler)
+
+
+@pytest.mark.parametrize(
+    ("path", "max_age"),
+    [
+        ("/collections/PSScene/items/1", settings.item_max_age),
+        ("/search", settings.search_max_age),
+    ],
+)
+def test_unchanged_responses_are_not_modified(session: PlanetSession, path: str, max_age: int) -> None:
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        client = TestClient(app)
+        first = client.get(path, auth=("test-api-key", ""))
+        second = client.get(path, auth=("test-api-key", ""), headers={"If-None-Match": first.headers["etag"]})
+
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == f"max-age={max_age}"
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.headers["cache-control"] == f"max-age={max_age}"
+
+
+def test_search_pages_get_the_same_tokens_and_etags(session: PlanetSession) -> None:
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        client = TestClient(app)
+        first = client.get("/search", auth=("test-api-key", ""))
+        second = client.get("/search", auth=("test-api-key", ""))
+
+    assert first.json()["links"] == second.json()["links"]
+    assert first.headers["etag"].startswith("W/")
+    assert first.headers["etag"] == second.headers["etag"]
+
+
+def test_errors_are_not_cached(session: PlanetSession) -> None:
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        client = TestClient(app, raise_server_exceptions=False)
+        not_found = client.get("/collections/unknown/queryables")
+        upstream_error = client.get("/collections/PSScene/items/missing", auth=("test-api-key", ""))
+
+    assert not_found.headers["cache-control"] == "no-store"
+    assert upstream_error.status_code >= 400
+    assert "max-age" not in upstream_error.headers.get("cache-control", "")
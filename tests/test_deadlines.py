@@ -0,0 +1,75 @@
+"""Tests for search deadlines and partial results."""
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from stac_planet_api.api import app, request_deadline, settings
+from stac_planet_api.client import PlanetSession
+
+
+@pytest.fixture
+def session(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> PlanetSession:
+    """Planet with one item, "slow", whose assets take half a second to list."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("quick-search"):
+            return httpx.Response(200, json={"features": [planet_item("fast"), planet_item("slow")], "_links": {}})
+        if "/slow/" in request.url.path:
+            await asyncio.sleep(0.5)
+        return httpx.Response(200, json={"analytic": {"_links": {"_self": "https://example.com"}, "type": "analytic"}})
+
+    return planet_session(handler)
+
+
+def search(session: PlanetSession, **params: str) -> httpx.Response:
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        return TestClient(app).get("/search", params={"assets": "expand", **params}, auth=("test-api-key", ""))
+
+
+def query(query_string: str) -> Request:
+    return Request({"type": "http", "method": "GET", "headers": [], "query_string": query_string.encode()})
+
+
+def test_items_missing_the_deadline_get_lazy_assets(session: PlanetSession) -> None:
+    response = search(session, timeout="0.1")
+
+    fast, slow = response.json()["features"]
+    assert response.status_code == 200
+    assert "analytic" in fast["assets"]
+    assert "analytic" not in slow["assets"]
+    assert "assets" in {link["rel"] for link in slow["links"]}
+    assert response.headers["x-partial-results"] == "1"
+    assert response.headers["cache-control"] == "no-store"
+
+
+def test_complete_pages_are_not_marked_partial(session: PlanetSession) -> None:
+    response = search(session, timeout="5")
+
+    assert all("analytic" in item["assets"] for item in response.json()["features"])
+    assert "x-partial-results" not in response.headers
+    assert response.headers["cache-control"] == f"max-age={settings.search_max_age}"
+
+
+@pytest.mark.parametrize("timeout", ["soon", "0", "-1", "nan"])
+def test_invalid_timeouts_are_rejected(session: PlanetSession, timeout: str) -> None:
+    assert search(session, timeout=timeout).status_code == 400
+
+
+def test_deadlines_are_capped_by_the_request_budget() -> None:
+    with patch.object(settings, "planet_request_budget", 5), patch.object(settings, "search_timeout", 0):
+        requested = request_deadline(query("timeout=600"))
+        default = request_deadline(query(""))
+
+    assert requested is not None
+    assert 4 < requested.remaining() <= 5
+    assert default is not None
+    assert 4 < default.remaining() <= 5
@@ -0,0 +1,128 @@
+"""Tests for exporting search results as newline-delimited GeoJSON."""
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import orjson
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.resilience import Deadline, Resilience, RetryPolicy
+
+PAGES = 3
+PAGE_SIZE = 2
+
+
+def test_export_follows_planet_pages_up_to_max_items(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    requests: list[httpx.Request] = []
+
+    def results_page(page: int) -> dict[str, Any]:
+        return {
+            "features": [planet_item(f"{page}-{i}") for i in range(PAGE_SIZE)],
+            "_links": {"_next": f"https://api.planet.com/data/v1/searches/abc/results?_page={page + 1}"}
+            if page + 1 < PAGES
+            else {},
+        }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("quick-search"):
+            return httpx.Response(200, json=results_page(0))
+        if request.url.path.endswith("results"):
+            return httpx.Response(200, json=results_page(int(request.url.params["_page"])))
+        return httpx.Response(200, json={})
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=planet_session(handler)):
+        client = TestClient(app)
+        everything = client.post("/search/export", json={"collections": ["PSScene"]}, auth=("test-api-key", ""))
+        capped = client.post(
+            "/search/export?max_items=3", json={"collections": ["PSScene"]}, auth=("test-api-key", "")
+        )
+
+    assert everything.status_code == 200
+    assert everything.headers["content-type"] == "application/x-ndjson"
+    assert [orjson.loads(line)["id"] for line in everything.content.splitlines()] == [
+        "0-0",
+        "0-1",
+        "1-0",
+        "1-1",
+        "2-0",
+        "2-1",
+    ]
+    assert [orjson.loads(line)["id"] for line in capped.content.splitlines()] == ["0-0", "0-1", "1-0"]
+    assert sum(request.url.path.endswith("results") for request in requests) == 3
+
+
+def test_export_rejects_max_items_below_one(planet_session: Callable[[Callable], PlanetSession]) -> None:
+    session = planet_session(lambda request: httpx.Response(200, json={"features": [], "_links": {}}))
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        client = TestClient(app)
+        responses = [
+            client.post(f"/search/export?max_items={max_items}", json={"collections": ["PSScene"]}, auth=("key", ""))
+            for max_items in (0, -5)
+        ]
+
+    assert [response.status_code for response in responses] == [422, 422]
+
+
+def test_exports_outlast_the_request_budget(planet_item: Callable[..., dict[str, Any]]) -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.05)
+        page = int(request.url.params.get("_page", 0))
+        return httpx.Response(
+            200,
+            json={
+                "features": [planet_item(f"{page}")],
+                "_links": {"_next": f"https://api.planet.com/data/v1/searches/abc/results?_page={page + 1}"}
+                if page + 1 < PAGES
+                else {},
+            },
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    resilience = Resilience(RetryPolicy(attempts=1, base_delay=0, max_delay=0, statuses=[]), 5, 30)
+
+    def session(auth: httpx.Auth, deadline: Deadline | None = None) -> PlanetSession:
+        return PlanetSession(client, auth, resilience=resilience, deadline=deadline)
+
+    with (
+        patch("stac_planet_api.api.get_authenticated_client", side_effect=session),
+        patch("stac_planet_api.api.settings.planet_request_budget", 0.1),
+    ):
+        response = TestClient(app).post(
+            "/search/export?assets=lazy", json={"collections": ["PSScene"]}, auth=("test-api-key", "")
+        )
+
+    assert [orjson.loads(line)["id"] for line in response.content.splitlines()] == ["0", "1", "2"]
+
+
+def test_failed_exports_end_with_an_error_line(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("quick-search"):
+            return httpx.Response(
+                200,
+                json={
+                    "features": [planet_item("0")],
+                    "_links": {"_next": "https://api.planet.com/data/v1/searches/abc/results?_page=1"},
+                },
+            )
+        return httpx.Response(404)
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=planet_session(handler)):
+        response = TestClient(app).post(
+            "/search/export?assets=lazy", json={"collections": ["PSScene"]}, auth=("test-api-key", "")
+        )
+
+    *features, error = [orjson.loads(line) for line in response.content.splitlines()]
+    assert response.status_code == 200
+    assert [feature["id"] for feature in features] == ["0"]
+    assert error["type"] == "Error"
@@ -0,0 +1,89 @@
+"""Tests for applying the Fields extension while mapping items."""
+
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.fields import FieldsProjector
+
+FEATURE = {
+    "type": "Feature",
+    "stac_version": "1.0.0",
+    "id": "1",
+    "collection": "PSScene",
+    "bbox": [0, 0, 1, 1],
+    "properties": {"datetime": "2024-01-01T00:00:00Z", "cloud_cover": 0.1, "gsd": 3.7},
+    "links": [],
+}
+
+
+@pytest.mark.parametrize(
+    ("include", "exclude", "expected"),
+    [
+        ([], [], FEATURE),
+        (
+            ["properties.cloud_cover"],
+            [],
+            {
+                "type": "Feature",
+                "stac_version": "1.0.0",
+                "id": "1",
+                "collection": "PSScene",
+                "properties": {"cloud_cover": 0.1},
+            },
+        ),
+        (
+            [],
+            ["properties.gsd", "links", "id"],
+            {k: v for k, v in FEATURE.items() if k != "links"}
+            | {"properties": {"datetime": "2024-01-01T00:00:00Z", "cloud_cover": 0.1}},
+        ),
+        (
+            ["properties"],
+            ["properties.gsd"],
+            {
+                "type": "Feature",
+                "stac_version": "1.0.0",
+                "id": "1",
+                "collection": "PSScene",
+                "properties": {"datetime": "2024-01-01T00:00:00Z", "cloud_cover": 0.1},
+            },
+        ),
+        (["properties.gsd", "properties"], [], {k: v for k, v in FEATURE.items() if k not in ["bbox", "links"]}),
+    ],
+)
+def test_project(include: list[str], exclude: list[str], expected: dict[str, Any]) -> None:
+    assert FieldsProjector(include=include, exclude=exclude).project(FEATURE) == expected
+
+
+def test_wants() -> None:
+    projector = FieldsProjector(include=["properties.cloud_cover", "assets"], exclude=["assets"])
+
+    assert projector.wants("properties")
+    assert projector.wants("id")
+    assert not projector.wants("assets")
+    assert not projector.wants("bbox")
+
+
+def test_excluded_assets_are_not_looked_up(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"features": [planet_item("1"), planet_item("2")], "_links": {}})
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=planet_session(handler)):
+        response = TestClient(app).get("/search?collections=PSScene&fields=-assets,-links", auth=("test-api-key", ""))
+
+    assert len(requests) == 1
+    assert [set(feature) for feature in response.json()["features"]] == [
+        {"type", "stac_version", "stac_extensions", "id", "collection", "geometry", "bbox", "properties"}
+    ] * 2
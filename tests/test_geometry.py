@@ -0,0 +1,101 @@
+"""Tests for computing item bboxes from GeoJSON geometries and reducing their size."""
+
+import math
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.geometry import GeometrySimplifier, get_bbox
+
+SQUARE = [[[2, 1], [3, 1], [3, 4], [2, 4], [2, 1]]]
+
+
+@pytest.mark.parametrize(
+    ("geometry", "expected"),
+    [
+        ({"type": "Point", "coordinates": [1, 2]}, [1, 2, 1, 2]),
+        ({"type": "LineString", "coordinates": [[3, 0], [1, 5], [2, -1]]}, [1, -1, 3, 5]),
+        ({"type": "Polygon", "coordinates": [[[-5, 0], [1, 0], [1, 1], [-5, 0]]]}, [-5, 0, 1, 1]),
+        ({"type": "MultiPoint", "coordinates": [[1, 2], [-1, 3]]}, [-1, 2, 1, 3]),
+        ({"type": "MultiLineString", "coordinates": [[[0, 0], [1, 1]], [[5, -2], [6, 0]]]}, [0, -2, 6, 1]),
+        ({"type": "MultiPolygon", "coordinates": [SQUARE, [[[10, 0], [11, 0], [11, 1], [10, 0]]]]}, [2, 0, 11, 4]),
+        (
+            {
+                "type": "GeometryCollection",
+                "geometries": [{"type": "Point", "coordinates": [-1, -1]}, {"type": "Polygon", "coordinates": SQUARE}],
+            },
+            [-1, -1, 3, 4],
+        ),
+        ({"type": "LineString", "coordinates": [[0, 0, 10], [1, 2, 5]]}, [0, 0, 5, 1, 2, 10]),
+        ({"type": "LineString", "coordinates": [[0, 0, 10], [1, 2]]}, [0, 0, 1, 2]),
+        ({"type": "Polygon", "coordinates": []}, None),
+        ({"type": "GeometryCollection", "geometries": []}, None),
+        (None, None),
+    ],
+)
+def test_get_bbox(geometry: dict[str, Any] | None, expected: list[float] | None) -> None:
+    assert get_bbox(geometry) == expected
+
+
+def circle(vertices: int) -> dict[str, Any]:
+    ring = [[math.cos(2 * math.pi * i / vertices), math.sin(2 * math.pi * i / vertices)] for i in range(vertices)]
+    return {"type": "Polygon", "coordinates": [[*ring, ring[0]]]}
+
+
+def test_coordinates_are_rounded_to_precision() -> None:
+    geometry = {
+        "type": "GeometryCollection",
+        "geometries": [
+            {"type": "Point", "coordinates": [0.123456, 1.987654]},
+            {"type": "LineString", "coordinates": [[0.111, 0.999], [2, 3]]},
+        ],
+    }
+
+    assert GeometrySimplifier(precision=2).simplify(geometry) == {
+        "type": "GeometryCollection",
+        "geometries": [
+            {"type": "Point", "coordinates": [0.12, 1.99]},
+            {"type": "LineString", "coordinates": [[0.11, 1.0], [2, 3]]},
+        ],
+    }
+
+
+def test_simplification_keeps_a_valid_outline() -> None:
+    simplified = GeometrySimplifier(tolerance=0.05).simplify(circle(500))
+
+    assert simplified["type"] == "Polygon"
+    assert 4 < len(simplified["coordinates"][0]) < 100
+    assert simplified["coordinates"][0][0] == simplified["coordinates"][0][-1]
+
+
+def test_search_simplifies_geometries_on_request(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    footprint = planet_item("1") | {"geometry": circle(500)}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("quick-search"):
+            return httpx.Response(200, json={"features": [footprint], "_links": {}})
+        return httpx.Response(200, json={})
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=planet_session(handler)):
+        client = TestClient(app)
+        full = client.post("/search", json={"collections": ["PSScene"]}, auth=("test-api-key", ""))
+        simplified = client.post(
+            "/search?simplify=0.05&precision=3", json={"collections": ["PSScene"]}, auth=("test-api-key", "")
+        )
+        invalid = client.post("/search?precision=-1", json={"collections": ["PSScene"]}, auth=("test-api-key", ""))
+
+    full_feature, simplified_feature = full.json()["features"][0], simplified.json()["features"][0]
+    assert len(simplified.content) < len(full.content) / 4
+    assert simplified_feature["bbox"] == full_feature["bbox"]
+    assert all(
+        round(value, 3) == value for position in simplified_feature["geometry"]["coordinates"][0] for value in position
+    )
+    assert invalid.status_code == 400
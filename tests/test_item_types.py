@@ -0,0 +1,88 @@
+"""Tests for the item types registry."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.item_types import ItemTypesRegistry
+from stac_planet_api.request_adaptor import stac_to_planet_request
+from stac_planet_api.search_model import POST_REQUEST_MODEL
+
+
+def _session(response: httpx.Response) -> PlanetSession:
+    return PlanetSession(
+        client=httpx.AsyncClient(transport=httpx.MockTransport(lambda _: response)),
+        auth=httpx.BasicAuth(username="key", password=""),
+    )
+
+
+def test_refresh_loads_item_types_from_planet() -> None:
+    registry = ItemTypesRegistry(default=["PSScene"], refresh_interval=0)
+
+    asyncio.run(
+        registry.refresh(
+            _session(httpx.Response(200, json={"item_types": [{"id": "PSScene"}, {"id": "SkySatScene"}]}))
+        )
+    )
+
+    assert registry.item_types == ["PSScene", "SkySatScene"]
+
+
+def test_refresh_keeps_item_types_when_planet_is_unavailable() -> None:
+    registry = ItemTypesRegistry(default=["PSScene"], refresh_interval=0)
+
+    asyncio.run(registry.refresh(_session(httpx.Response(503, text="unavailable"))))
+
+    assert registry.item_types == ["PSScene"]
+
+
+def test_background_refresh_runs_until_stopped() -> None:
+    registry = ItemTypesRegistry(default=["PSScene"], refresh_interval=0.01)
+    responses = iter([{"item_types": [{"id": "PSScene"}]}, {"item_types": [{"id": "SkySatScene"}]}])
+
+    def handler(_: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=next(responses, {"item_types": [{"id": "SkySatScene"}]}))
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def run() -> None:
+        await registry.start(lambda: PlanetSession(client=client, auth=httpx.BasicAuth(username="key", password="")))
+        assert registry.item_types == ["PSScene"]
+        await asyncio.sleep(0.05)
+        await registry.stop()
+
+    asyncio.run(run())
+
+    assert registry.item_types == ["SkySatScene"]
+
+
+def test_start_does_not_wait_for_planet() -> None:
+    registry = ItemTypesRegistry(default=["PSScene"], refresh_interval=0)
+    loaded = asyncio.Event()
+
+    async def handler(_: httpx.Request) -> httpx.Response:
+        await loaded.wait()
+        return httpx.Response(200, json={"item_types": [{"id": "SkySatScene"}]})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def run() -> None:
+        await registry.start(lambda: PlanetSession(client=client, auth=httpx.BasicAuth(username="key", password="")))
+        # The configured item types are served until Planet answers
+        assert registry.item_types == ["PSScene"]
+        loaded.set()
+        await asyncio.sleep(0.01)
+        assert registry.item_types == ["SkySatScene"]
+        await registry.stop()
+
+    asyncio.run(run())
+
+
+def test_request_adaptor_defaults_to_registry_item_types(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("stac_planet_api.request_adaptor.ITEM_TYPES.item_types", ["PSScene", "SkySatCollect"])
+
+    _, planet_request = stac_to_planet_request(POST_REQUEST_MODEL(limit=10))
+
+    assert planet_request["item_types"] == ["PSScene", "SkySatCollect"]
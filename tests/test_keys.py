@@ -0,0 +1,135 @@
+"""Tests for scheduling upstream calls between a pool of Planet API keys."""
+
+import asyncio
+import base64
+from unittest.mock import patch
+
+import httpx
+from fastapi.security import HTTPBasicCredentials
+from fastapi.testclient import TestClient
+
+from stac_planet_api import api
+from stac_planet_api.api import app
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.keys import KeyPoolAuth, KeyScheduler, retry_after
+from stac_planet_api.resilience import Resilience, RetryPolicy
+
+
+def scheduler(*keys: str) -> KeyScheduler:
+    return KeyScheduler(keys, bench_time=10, max_bench_time=60)
+
+
+def used_key(request: httpx.Request) -> str:
+    return base64.b64decode(request.headers["Authorization"].removeprefix("Basic ")).decode().removesuffix(":")
+
+
+def test_least_loaded_key_is_picked() -> None:
+    keys = scheduler("key-a", "key-b", "key-c")
+    keys.started("key-a")
+    keys.started("key-b")
+    keys.finished("key-b", elapsed=0.5)
+    keys.started("key-c")
+    keys.finished("key-c", elapsed=0.1)
+
+    assert keys.pick() == "key-c"
+    assert keys.pick(exclude=["key-c"]) == "key-b"
+
+
+def test_throttled_calls_are_retried_on_another_key() -> None:
+    keys = scheduler("key-a", "key-b")
+    used: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        used.append(used_key(request))
+        if used_key(request) == "key-a":
+            return httpx.Response(429, headers={"Retry-After": "30"})
+        return httpx.Response(200, json={})
+
+    async def search() -> list[int]:
+        session = PlanetSession(
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), auth=KeyPoolAuth(keys)
+        )
+        first = await session.post("https://api.planet.com/data/v1/quick-search", json={})
+        second = await session.get("https://api.planet.com/data/v1/item-types")
+        return [first.status_code, second.status_code]
+
+    assert asyncio.run(search()) == [200, 200]
+    # The throttled key is benched, so the second call goes straight to the other one
+    assert used == ["key-a", "key-b", "key-b"]
+    assert keys.stats()["0"]["throttled"] == 1
+    assert 29 < keys.stats()["0"]["benched_for"] <= 30
+    assert keys.stats()["1"]["requests"] == 2
+
+
+def test_throttling_is_returned_once_every_key_is_tried() -> None:
+    keys = scheduler("key-a", "key-b")
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(used_key(request))
+        return httpx.Response(429)
+
+    async def get() -> httpx.Response:
+        session = PlanetSession(
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), auth=KeyPoolAuth(keys)
+        )
+        return await session.get("https://api.planet.com/data/v1/item-types")
+
+    assert asyncio.run(get()).status_code == 429
+    assert sorted(calls) == ["key-a", "key-b"]
+    assert all(stats["in_flight"] == 0 for stats in keys.stats().values())
+
+
+def test_throttling_is_not_retried_again_once_every_key_is_tried() -> None:
+    keys = scheduler("key-a", "key-b")
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(used_key(request))
+        return httpx.Response(429)
+
+    async def get() -> httpx.Response:
+        session = PlanetSession(
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            auth=KeyPoolAuth(keys),
+            resilience=Resilience(
+                RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.01, statuses=[429, 503]),
+                failure_threshold=5,
+                reset_time=30,
+            ),
+        )
+        return await session.get("https://api.planet.com/data/v1/item-types")
+
+    assert asyncio.run(get()).status_code == 429
+    assert len(calls) == 2
+
+
+def test_stats_do_not_give_keys_away() -> None:
+    with patch("stac_planet_api.api.PLANET_API_KEYS", scheduler("secret-key-a", "secret-key-b")):
+        response = TestClient(app).get("/_mgmt/stats")
+
+    assert list(response.json()["api_keys"]) == ["0", "1"]
+    assert "key-" not in response.text
+
+
+def test_retry_after_is_read_in_seconds_or_as_a_date() -> None:
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "5"}), default=10) == 5
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), default=10) == 0
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "soon"}), default=10) == 10
+    assert retry_after(httpx.Response(429), default=10) == 10
+
+
+def test_pool_keys_in_tokens_share_the_pool() -> None:
+    keys = scheduler("key-a", "key-b")
+
+    with patch.object(api, "PLANET_API_KEYS", keys):
+        pool_auth, _ = api.get_auth(HTTPBasicCredentials(username="key-a", password=""))
+        user_auth, user_key = api.get_auth(HTTPBasicCredentials(username="user-key", password=""))
+        default_auth, default_key = api.get_auth(None)
+
+    assert isinstance(pool_auth, KeyPoolAuth)
+    assert isinstance(user_auth, httpx.BasicAuth)
+    assert user_key == "user-key"
+    assert isinstance(default_auth, KeyPoolAuth)
+    # Tokens for calls made with the pool carry no key
+    assert default_key == ""
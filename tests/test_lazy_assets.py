@@ -0,0 +1,59 @@
+"""Tests for returning search results without resolving their assets."""
+
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app
+from stac_planet_api.client import PlanetSession
+
+
+@pytest.fixture
+def planet(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> tuple[PlanetSession, list[httpx.Request]]:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("quick-search"):
+            return httpx.Response(200, json={"features": [planet_item("1"), planet_item("2")], "_links": {}})
+        if request.url.path.endswith("/assets/"):
+            return httpx.Response(
+                200, json={"ortho_visual": {"type": "ortho_visual", "_links": {"_self": "https://asset"}}}
+            )
+        return httpx.Response(200, json=planet_item("1"))
+
+    return planet_session(handler), requests
+
+
+def test_lazy_search_makes_a_single_planet_call(planet: tuple[PlanetSession, list[httpx.Request]]) -> None:
+    session, requests = planet
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        response = TestClient(app).post(
+            "/search?assets=lazy", json={"collections": ["PSScene"]}, auth=("test-api-key", "")
+        )
+
+    feature = response.json()["features"][0]
+    assert len(requests) == 1
+    assert set(feature["assets"]) == {"external_thumbnail", "thumbnail"}
+    assert {
+        "rel": "assets",
+        "type": "application/json",
+        "href": "http://testserver/collections/PSScene/items/1/assets",
+    } in feature["links"]
+
+
+def test_assets_endpoint_resolves_full_assets(planet: tuple[PlanetSession, list[httpx.Request]]) -> None:
+    session, _ = planet
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        response = TestClient(app).get("/collections/PSScene/items/1/assets", auth=("test-api-key", ""))
+
+    assert response.json()["ortho_visual"] == {"href": "https://asset", "roles": ["data"], "type": "image/tiff"}
+    assert response.json()["thumbnail"]["href"] == "http://testserver/collections/PSScene/items/1/thumbnail"
@@ -0,0 +1,195 @@
+"""Tests for evaluating the parts of CQL2 filters that Planet can't apply."""
+
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import fastapi
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import TOKENS, app
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.post_filter import compile_predicate, filter_planet_items
+
+INSTRUMENT_LIKE = {"op": "like", "args": [{"property": "instrument"}, "PSB%"]}
+
+
+@pytest.mark.parametrize(
+    ("stac_filter", "expected"),
+    [
+        (INSTRUMENT_LIKE, ["b"]),
+        ({"op": "not", "args": [INSTRUMENT_LIKE]}, ["a", "c"]),
+        ({"op": "isNull", "args": [{"property": "instrument"}]}, ["c"]),
+        ({"op": "<>", "args": [{"property": "collection"}, "PSScene"]}, ["c"]),
+        ({"op": ">", "args": [{"property": "datetime"}, {"timestamp": "2024-01-01T12:00:00Z"}]}, ["b"]),
+        (
+            {
+                "op": "s_within",
+                "args": [
+                    {"property": "geometry"},
+                    {"type": "Polygon", "coordinates": [[[-1, -1], [1.5, -1], [1.5, 1.5], [-1, 1.5], [-1, -1]]]},
+                ],
+            },
+            ["a", "b", "c"],
+        ),
+        ({"op": "s_within", "args": [{"property": "geometry"}, {"bbox": [0, 0, 0.5, 0.5]}]}, []),
+    ],
+)
+def test_predicate_matches_planet_items(
+    planet_item: Callable[..., dict[str, Any]], stac_filter: dict[str, Any], expected: list[str]
+) -> None:
+    planet_items = [planet_item("a"), planet_item("b"), planet_item("c", item_type="SkySatCollect")]
+    planet_items[0]["properties"]["instrument"] = "PS2"
+    planet_items[1]["properties"]["instrument"] = "PSB.SD"
+    planet_items[1]["properties"]["acquired"] = "2024-01-02T00:00:00Z"
+
+    matches = filter_planet_items(planet_items, compile_predicate(stac_filter))
+
+    assert [match["id"] for match in matches] == expected
+
+
+def test_unsupported_operators_are_rejected() -> None:
+    with pytest.raises(fastapi.HTTPException) as error:
+        compile_predicate({"op": "t_intersects", "args": [{"property": "datetime"}, {"interval": ["..", ".."]}]})
+
+    assert error.value.status_code == 400
+
+
+def test_search_reads_pages_until_limit_matches(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    def results_page(page: int) -> dict[str, Any]:
+        features = [planet_item(f"{page}-{i}") for i in range(3)]
+        features[page % 3]["properties"]["instrument"] = "PSB.SD"
+        return {
+            "features": features,
+            "_links": {"_next": f"https://api.planet.com/data/v1/searches/abc/results?_page={page + 1}"},
+        }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("quick-search"):
+            return httpx.Response(200, json=results_page(0))
+        if request.url.path.endswith("results"):
+            return httpx.Response(200, json=results_page(int(request.url.params["_page"])))
+        return httpx.Response(200, json={})
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=planet_session(handler)):
+        client = TestClient(app)
+        response = client.post(
+            "/search",
+            json={"collections": ["PSScene"], "limit": 2, "filter": INSTRUMENT_LIKE, "filter-lang": "cql2-json"},
+            auth=("test-api-key", ""),
+        )
+        next_token = next(link for link in response.json()["links"] if link["rel"] == "next" and "body" in link)[
+            "body"
+        ]["token"]
+        next_response = client.post("/search", json={"token": next_token, "limit": 2}, auth=("test-api-key", ""))
+
+    assert [feature["id"] for feature in response.json()["features"]] == ["0-0", "1-1"]
+    assert TOKENS.decode(next_token).link.endswith("_page=2")
+    assert [feature["id"] for feature in next_response.json()["features"]] == ["2-2", "3-0"]
+
+
+def test_search_pages_hold_at_most_limit_matches(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    def results_page(page: int) -> dict[str, Any]:
+        features = [planet_item(f"{page}-{i}") for i in range(4)]
+        for feature in features[:3]:
+            feature["properties"]["instrument"] = "PSB.SD"
+        return {
+            "features": features,
+            "_links": {
+                "_self": f"https://api.planet.com/data/v1/searches/abc/results?_page={page}",
+                "_next": f"https://api.planet.com/data/v1/searches/abc/results?_page={page + 1}",
+            },
+        }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("quick-search"):
+            return httpx.Response(200, json=results_page(0))
+        if request.url.path.endswith("results"):
+            return httpx.Response(200, json=results_page(int(request.url.params["_page"])))
+        return httpx.Response(200, json={})
+
+    def next_token(response: httpx.Response) -> str:
+        return next(link for link in response.json()["links"] if link["rel"] == "next" and "body" in link)["body"][
+            "token"
+        ]
+
+    pages = []
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=planet_session(handler)):
+        client = TestClient(app)
+        response = client.post(
+            "/search",
+            json={"collections": ["PSScene"], "limit": 2, "filter": INSTRUMENT_LIKE, "filter-lang": "cql2-json"},
+            auth=("test-api-key", ""),
+        )
+        for _ in range(3):
+            pages.append([feature["id"] for feature in response.json()["features"]])
+            response = client.post(
+                "/search", json={"token": next_token(response), "limit": 2}, auth=("test-api-key", "")
+            )
+
+    assert pages == [["0-0", "0-1"], ["0-2", "1-0"], ["1-1", "1-2"]]
+
+
+def test_search_pages_without_a_link_of_their_own_are_not_overfilled(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("quick-search"):
+            features = [planet_item(f"{i}") for i in range(3)]
+            for feature in features:
+                feature["properties"]["instrument"] = "PSB.SD"
+            return httpx.Response(
+                200,
+                json={
+                    "features": features,
+                    "_links": {"_next": "https://api.planet.com/data/v1/searches/abc/results?_page=1"},
+                },
+            )
+        return httpx.Response(200, json={})
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=planet_session(handler)):
+        response = TestClient(app).post(
+            "/search",
+            json={"collections": ["PSScene"], "limit": 2, "filter": INSTRUMENT_LIKE, "filter-lang": "cql2-json"},
+            auth=("test-api-key", ""),
+        )
+
+    assert [feature["id"] for feature in response.json()["features"]] == ["0", "1"]
+    assert "next" not in {link["rel"] for link in response.json()["links"]}
+
+
+def test_search_stops_after_max_pages(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    pages_read: list[int] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params.get("_page", 0))
+        pages_read.append(page)
+        return httpx.Response(
+            200,
+            json={
+                "features": [planet_item(f"{page}")],
+                "_links": {"_next": f"https://api.planet.com/data/v1/searches/abc/results?_page={page + 1}"},
+            },
+        )
+
+    with (
+        patch("stac_planet_api.api.get_authenticated_client", return_value=planet_session(handler)),
+        patch("stac_planet_api.api.settings.post_filter_max_pages", 3),
+    ):
+        response = TestClient(app).post(
+            "/search",
+            json={"collections": ["PSScene"], "filter": INSTRUMENT_LIKE, "filter-lang": "cql2-json"},
+            auth=("test-api-key", ""),
+        )
+
+    assert response.status_code == 200
+    assert response.json()["features"] == []
+    assert pages_read == [0, 1, 2]
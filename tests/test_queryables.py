@@ -0,0 +1,35 @@
+"""Tests for serving the precomputed queryables documents."""
+
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app
+
+
+def test_queryables_are_served_with_etags() -> None:
+    client = TestClient(app)
+
+    catalogue = client.get("/queryables")
+    collection = client.get("/collections/PSScene/queryables")
+
+    assert catalogue.status_code == collection.status_code == 200
+    assert "cloud_cover" in collection.json()["properties"]
+    assert set(collection.json()["properties"]) <= set(catalogue.json()["properties"])
+    assert catalogue.headers["etag"] != collection.headers["etag"]
+    assert client.get("/collections/psscene/queryables").headers["etag"] == collection.headers["etag"]
+
+
+def test_matching_etags_return_not_modified() -> None:
+    client = TestClient(app)
+    etag = client.get("/collections/PSScene/queryables").headers["etag"]
+
+    not_modified = client.get("/collections/PSScene/queryables", headers={"If-None-Match": f'"other", W/{etag}'})
+    modified = client.get("/collections/PSScene/queryables", headers={"If-None-Match": '"other"'})
+
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    assert modified.status_code == 200
+
+
+def test_unknown_collection_is_not_found() -> None:
+    assert TestClient(app).get("/collections/unknown/queryables").status_code == 404
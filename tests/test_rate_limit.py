@@ -0,0 +1,128 @@
+"""Tests for pacing and shedding calls to Planet with the client-side rate limiter."""
+
+import asyncio
+import contextlib
+import time
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.rate_limit import RateLimiter, TokenBucket, UpstreamOverloaded
+
+
+def limiter(**overrides: float) -> RateLimiter:
+    options: dict[str, Any] = {
+        "rate": 0,
+        "burst": 1,
+        "credential_rate": 0,
+        "credential_burst": 1,
+        "max_waiting": 10,
+        "max_wait": 10,
+    } | overrides
+    return RateLimiter(**options)
+
+
+def test_buckets_allow_bursts_then_pace_calls() -> None:
+    bucket = TokenBucket(rate=10, burst=2)
+    now = bucket.updated
+
+    for _ in range(2):
+        assert bucket.delay(now) == 0
+        bucket.take()
+    assert bucket.delay(now) == pytest.approx(0.1)
+    bucket.take()
+    # The queued call is counted against the next one
+    assert bucket.delay(now) == pytest.approx(0.2)
+    assert bucket.delay(now + 0.25) == 0
+
+
+def test_disabled_limiter_never_waits() -> None:
+    rate_limiter = limiter()
+
+    asyncio.run(rate_limiter.acquire("credential"))
+
+    assert not rate_limiter.enabled
+    assert rate_limiter.stats.acquired == 0
+
+
+def test_calls_over_the_rate_wait_their_turn() -> None:
+    rate_limiter = limiter(rate=50, burst=1)
+
+    async def acquire() -> float:
+        start = time.monotonic()
+        await asyncio.gather(*(rate_limiter.acquire("credential") for _ in range(3)))
+        return time.monotonic() - start
+
+    assert asyncio.run(acquire()) >= 0.035
+    assert rate_limiter.stats.acquired == 3
+    assert rate_limiter.stats.delayed == 2
+    assert rate_limiter.waiting == 0
+
+
+def test_credentials_are_limited_separately() -> None:
+    rate_limiter = limiter(credential_rate=1, credential_burst=1, max_wait=0.5)
+
+    async def acquire() -> None:
+        await rate_limiter.acquire("credential-a")
+        await rate_limiter.acquire("credential-b")
+        # A pool of keys gets a burst per key
+        await rate_limiter.acquire("pool", keys=2)
+        await rate_limiter.acquire("pool", keys=2)
+        await rate_limiter.acquire("credential-a")
+
+    with pytest.raises(UpstreamOverloaded):
+        asyncio.run(acquire())
+    assert rate_limiter.stats.acquired == 4
+    assert rate_limiter.stats.shed == 1
+
+
+def test_calls_are_shed_when_the_queue_is_full() -> None:
+    rate_limiter = limiter(rate=1, burst=1, max_waiting=1)
+
+    async def acquire() -> None:
+        await rate_limiter.acquire("credential")
+        waiter = asyncio.create_task(rate_limiter.acquire("credential"))
+        await asyncio.sleep(0)
+        assert rate_limiter.waiting == 1
+
+        with pytest.raises(UpstreamOverloaded) as exc_info:
+            await rate_limiter.acquire("credential")
+        assert 0 < exc_info.value.retry_after <= 2
+
+        waiter.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(acquire())
+    assert rate_limiter.stats.shed == 1
+    assert rate_limiter.waiting == 0
+
+
+def test_overloaded_searches_are_shed_with_retry_after(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    calls: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={"features": [planet_item("1")], "_links": {}})
+
+    session = planet_session(handler)
+    session.rate_limiter = limiter(credential_rate=0.5, credential_burst=1, max_wait=1)
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        client = TestClient(app)
+        first = client.get("/search", params={"assets": "lazy"}, auth=("test-api-key", ""))
+        second = client.get("/search", params={"assets": "lazy"}, auth=("test-api-key", ""))
+
+    assert first.status_code == 200
+    assert second.status_code == 503
+    assert second.headers["retry-after"] == "2"
+    assert second.headers["cache-control"] == "no-store"
+    assert len(calls) == 1
@@ -0,0 +1,124 @@
+"""Tests for translating STAC search requests to Planet searches."""
+
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from stac_planet_api import request_adaptor
+from stac_planet_api.request_adaptor import PlanetFilter, convert_filter, cql2_text_to_json, translate_filter
+
+CLOUD_COVER = {"op": "<=", "args": [{"property": "cloud_cover"}, 0.1]}
+CLOUD_COVER_FILTER = {"type": "RangeFilter", "field_name": "cloud_cover", "config": {"lte": 0.1}}
+UNSUPPORTED = {"op": "isNull", "args": [{"property": "cloud_cover"}]}
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]}
+
+
+@pytest.mark.parametrize(
+    ("stac_filter", "expected"),
+    [
+        (CLOUD_COVER, PlanetFilter(config=CLOUD_COVER_FILTER)),
+        (
+            {"op": "not", "args": [CLOUD_COVER]},
+            PlanetFilter(config={"type": "NotFilter", "config": CLOUD_COVER_FILTER}),
+        ),
+        (
+            {"op": "<>", "args": [{"property": "instrument"}, "PS2"]},
+            PlanetFilter(
+                config={
+                    "type": "NotFilter",
+                    "config": {"type": "StringInFilter", "field_name": "instrument", "config": ["PS2"]},
+                }
+            ),
+        ),
+        (
+            {"op": "like", "args": [{"property": "instrument"}, "PS2"]},
+            PlanetFilter(config={"type": "StringInFilter", "field_name": "instrument", "config": ["PS2"]}),
+        ),
+        (
+            {"op": "like", "args": [{"property": "instrument"}, "PS%"]},
+            PlanetFilter(config=None, residual={"op": "like", "args": [{"property": "instrument"}, "PS%"]}),
+        ),
+        (UNSUPPORTED, PlanetFilter(config=None, residual=UNSUPPORTED)),
+        (
+            {"op": "s_within", "args": [{"property": "geometry"}, POLYGON]},
+            PlanetFilter(
+                config={"type": "GeometryFilter", "field_name": "geometry", "config": POLYGON},
+                residual={"op": "s_within", "args": [{"property": "geometry"}, POLYGON]},
+            ),
+        ),
+        (
+            {"op": "s_intersects", "args": [{"property": "geometry"}, {"bbox": [0, 0, 1, 1]}]},
+            PlanetFilter(
+                config={
+                    "type": "GeometryFilter",
+                    "field_name": "geometry",
+                    "config": POLYGON,
+                }
+            ),
+        ),
+        (
+            {"op": "s_intersects", "args": [{"property": "geometry"}, {"bbox": [0, 0, -10, 1, 1, 10]}]},
+            PlanetFilter(config={"type": "GeometryFilter", "field_name": "geometry", "config": POLYGON}),
+        ),
+        (
+            {
+                "op": "and",
+                "args": [CLOUD_COVER, UNSUPPORTED, {"op": "=", "args": [{"property": "collection"}, "PSScene"]}],
+            },
+            PlanetFilter(
+                config={"type": "AndFilter", "config": [CLOUD_COVER_FILTER]},
+                collections=("PSScene",),
+                residual=UNSUPPORTED,
+            ),
+        ),
+        (
+            {"op": "or", "args": [CLOUD_COVER, UNSUPPORTED]},
+            PlanetFilter(config=None, residual={"op": "or", "args": [CLOUD_COVER, UNSUPPORTED]}),
+        ),
+        (
+            {
+                "op": "or",
+                "args": [
+                    {"op": "=", "args": [{"property": "collection"}, "PSScene"]},
+                    {"op": "=", "args": [{"property": "collection"}, "SkySatCollect"]},
+                ],
+            },
+            PlanetFilter(config=None, collections=("PSScene", "SkySatCollect")),
+        ),
+        (
+            {"op": "not", "args": [UNSUPPORTED]},
+            PlanetFilter(config=None, residual={"op": "not", "args": [UNSUPPORTED]}),
+        ),
+    ],
+)
+def test_translate_filter(stac_filter: dict[str, Any], expected: PlanetFilter) -> None:
+    assert translate_filter(stac_filter) == expected
+
+
+def nested_filter(depth: int) -> dict[str, Any]:
+    stac_filter: dict[str, Any] = CLOUD_COVER
+    for level in range(depth):
+        stac_filter = {"op": "and" if level % 2 else "or", "args": [stac_filter, CLOUD_COVER]}
+    return stac_filter
+
+
+def test_each_node_is_translated_once() -> None:
+    with patch.object(request_adaptor, "comparison_filter", wraps=request_adaptor.comparison_filter) as comparison:
+        translate_filter(nested_filter(depth=12))
+
+    assert comparison.call_count == 13
+
+
+def test_translations_are_memoised_on_canonical_json() -> None:
+    first = {"op": "<=", "args": [{"property": "gsd"}, 4]}
+    reordered = {"args": [{"property": "gsd"}, 4], "op": "<="}
+
+    with patch.object(request_adaptor, "translate_filter", wraps=request_adaptor.translate_filter) as translate:
+        assert convert_filter(first) is convert_filter(reordered)
+
+    assert translate.call_count == 1
+
+
+def test_cql2_text_is_parsed_to_json() -> None:
+    assert cql2_text_to_json("cloud_cover <= 0.1") == '{"op": "<=", "args": [{"property": "cloud_cover"}, 0.1]}'
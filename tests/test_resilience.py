@@ -0,0 +1,234 @@
+"""Tests for retries, circuit breakers and deadlines on calls to Planet."""
+
+import asyncio
+import time
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.resilience import (
+    CircuitBreaker,
+    CircuitOpen,
+    Deadline,
+    DeadlineExceeded,
+    Resilience,
+    RetryPolicy,
+    endpoint,
+)
+from stac_planet_api.response_adaptor import decoded, undecodable
+
+ASSETS_URL = "https://api.planet.com/data/v1/item-types/PSScene/items/1/assets/"
+
+
+def resilience(attempts: int = 3, failure_threshold: int = 5, reset_time: float = 30) -> Resilience:
+    policy = RetryPolicy(attempts=attempts, base_delay=0.001, max_delay=0.01, statuses=[429, 502, 503])
+    return Resilience(policy, failure_threshold=failure_threshold, reset_time=reset_time)
+
+
+def responses(*responses: httpx.Response) -> tuple[Callable[[httpx.Request], httpx.Response], list[httpx.Request]]:
+    """A handler answering with each of `responses` in turn, then repeating the last, and the requests it got."""
+    calls: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return responses[min(len(calls), len(responses)) - 1]
+
+    return handler, calls
+
+
+def test_endpoints_group_urls_by_path_without_ids() -> None:
+    assert endpoint(ASSETS_URL) == "api.planet.com/data/v1/item-types/*/items/*/assets"
+    assert endpoint("https://api.planet.com/data/v1/searches/abc/results?_page=2") == (
+        "api.planet.com/data/v1/searches/*/results"
+    )
+    assert endpoint("https://api.planet.com/data/v1/quick-search") == "api.planet.com/data/v1/quick-search"
+
+
+def test_backoff_grows_with_jitter_and_honours_retry_after() -> None:
+    policy = RetryPolicy(attempts=5, base_delay=1, max_delay=4, statuses=[503])
+
+    assert all(0 <= policy.backoff(0) <= 1 for _ in range(100))
+    assert all(0 <= policy.backoff(5) <= 4 for _ in range(100))
+    assert len({policy.backoff(2) for _ in range(100)}) > 1
+    assert policy.backoff(0, httpx.Response(503, headers={"Retry-After": "3"})) >= 3
+    assert policy.backoff(0, httpx.Response(503, headers={"Retry-After": "60"})) <= 4
+
+
+def test_failed_calls_are_retried(planet_session: Callable[[Callable], PlanetSession]) -> None:
+    handler, calls = responses(httpx.Response(503), httpx.Response(502), httpx.Response(200, json={}))
+    session = planet_session(handler)
+    session.resilience = resilience()
+
+    response = asyncio.run(session.get(ASSETS_URL))
+
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert session.resilience.stats.retries == 2
+
+
+def test_client_errors_are_not_retried(planet_session: Callable[[Callable], PlanetSession]) -> None:
+    handler, calls = responses(httpx.Response(404))
+    session = planet_session(handler)
+    session.resilience = resilience()
+
+    assert asyncio.run(session.get(ASSETS_URL)).status_code == 404
+    assert len(calls) == 1
+
+
+def test_last_failure_is_returned_once_retries_run_out(planet_session: Callable[[Callable], PlanetSession]) -> None:
+    handler, calls = responses(httpx.Response(503))
+    session = planet_session(handler)
+    session.resilience = resilience(attempts=2)
+
+    assert asyncio.run(session.get(ASSETS_URL)).status_code == 503
+    assert len(calls) == 2
+
+
+def test_circuit_opens_after_consecutive_failures(planet_session: Callable[[Callable], PlanetSession]) -> None:
+    handler, calls = responses(httpx.Response(500))
+    session = planet_session(handler)
+    session.resilience = resilience(attempts=1, failure_threshold=2)
+
+    async def get() -> None:
+        for _ in range(3):
+            await session.get(ASSETS_URL)
+
+    with pytest.raises(CircuitOpen) as exc_info:
+        asyncio.run(get())
+    assert len(calls) == 2
+    assert exc_info.value.retry_after is not None
+    assert 29 < exc_info.value.retry_after <= 30
+    assert session.resilience.stats.short_circuited == 1
+
+
+def test_circuit_lets_a_probe_through_after_its_reset_time() -> None:
+    breaker = CircuitBreaker("assets", failure_threshold=1, reset_time=0.01)
+    breaker.failed()
+
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    time.sleep(0.02)
+    breaker.check()
+    # Other calls are held back while the probe is in flight
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+    breaker.succeeded()
+    breaker.check()
+    assert not breaker.open
+
+
+def test_calls_stop_at_the_deadline(planet_session: Callable[[Callable], PlanetSession]) -> None:
+    handler, calls = responses(httpx.Response(200, json={}))
+    session = planet_session(handler)
+    session.resilience = resilience()
+    session.deadline = Deadline(0)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(session.get(ASSETS_URL))
+    assert calls == []
+
+
+def test_retries_that_would_outlast_the_deadline_are_not_made(
+    planet_session: Callable[[Callable], PlanetSession],
+) -> None:
+    handler, calls = responses(httpx.Response(503, headers={"Retry-After": "5"}))
+    session = planet_session(handler)
+    session.resilience = Resilience(
+        RetryPolicy(attempts=3, base_delay=0.001, max_delay=10, statuses=[503]), failure_threshold=5, reset_time=30
+    )
+    session.deadline = Deadline(1)
+
+    assert asyncio.run(session.get(ASSETS_URL)).status_code == 503
+    assert len(calls) == 1
+
+
+def test_undecodable_asset_listings_are_retried_then_left_lazy(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    asset_calls: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("quick-search"):
+            return httpx.Response(200, json={"features": [planet_item("1")], "_links": {}})
+        asset_calls.append(request)
+        return httpx.Response(200, content=b"<html>Gateway busy</html>")
+
+    session = planet_session(handler)
+    session.resilience = resilience()
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        response = TestClient(app).get("/search", params={"assets": "expand"}, auth=("test-api-key", ""))
+
+    [item] = response.json()["features"]
+    assert len(asset_calls) == 3
+    assert "assets" in {link["rel"] for link in item["links"]}
+    assert set(item["assets"]) == {"external_thumbnail", "thumbnail"}
+
+
+def test_unavailable_asset_listings_are_answered_with_503(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/assets/"):
+            return httpx.Response(503)
+        return httpx.Response(200, json=planet_item("1"))
+
+    session = planet_session(handler)
+    session.resilience = resilience(attempts=1)
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        response = TestClient(app).get("/collections/PSScene/items/1/assets", auth=("test-api-key", ""))
+
+    assert response.status_code == 503
+    assert response.headers["cache-control"] == "no-store"
+
+
+def test_refused_asset_listings_are_answered_with_planets_status(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/assets/"):
+            return httpx.Response(403, json={"message": "No access to assets"})
+        return httpx.Response(200, json=planet_item("1"))
+
+    session = planet_session(handler)
+    session.resilience = resilience()
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        response = TestClient(app).get("/collections/PSScene/items/1/assets", auth=("test-api-key", ""))
+
+    assert response.status_code == 403
+
+
+def test_asset_listings_are_decoded_once() -> None:
+    response = httpx.Response(200, content=b'{"ortho_visual": {}}')
+
+    assert not undecodable(response)
+    assert decoded(response) is decoded(response)
+    assert undecodable(httpx.Response(200, content=b"<html>Gateway busy</html>"))
+
+
+def test_streams_are_retried_within_the_deadline(planet_session: Callable[[Callable], PlanetSession]) -> None:
+    handler, calls = responses(httpx.Response(503), httpx.Response(200, content=b"thumbnail"))
+    session = planet_session(handler)
+    session.resilience = resilience()
+
+    async def stream() -> bytes:
+        async with session.stream("GET", ASSETS_URL) as response:
+            return await response.aread()
+
+    assert asyncio.run(stream()) == b"thumbnail"
+    assert len(calls) == 2
+    assert session.resilience.stats.failures == 1
+
+    session.deadline = Deadline(0)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(stream())
+    assert len(calls) == 2
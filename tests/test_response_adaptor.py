@@ -0,0 +1,77 @@
+"""Tests for mapping Planet responses to STAC."""
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+
+from stac_planet_api.cache import Cache, MemoryCacheBackend
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.response_adaptor import map_items
+
+BASE_URL = "http://localhost/"
+
+
+def _planet_item(item_id: str, item_type: str = "PSScene") -> dict[str, Any]:
+    return {
+        "id": item_id,
+        "geometry": {"type": "Point", "coordinates": [1.0, 2.0]},
+        "properties": {"item_type": item_type, "acquired": "2024-01-01T00:00:00Z"},
+        "_links": {
+            "thumbnail": f"https://tiles.planet.com/data/v1/item-types/{item_type}/items/{item_id}/thumb",
+            "assets": f"https://api.planet.com/data/v1/item-types/{item_type}/items/{item_id}/assets/",
+        },
+    }
+
+
+def _session(handler: Callable) -> PlanetSession:
+    return PlanetSession(
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        auth=httpx.BasicAuth(username="key", password=""),
+    )
+
+
+def test_map_items_preserves_order_and_maps_assets() -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        # Respond to earlier items more slowly so completion order differs from page order
+        item_id = request.url.path.split("/")[-3]
+        await asyncio.sleep(0.01 * (3 - int(item_id)))
+        return httpx.Response(
+            200, json={"ortho_visual": {"type": "ortho_visual", "_links": {"_self": f"https://asset/{item_id}"}}}
+        )
+
+    items = asyncio.run(map_items([_planet_item(str(i)) for i in range(3)], BASE_URL, _session(handler)))
+
+    assert [item["id"] for item in items] == ["0", "1", "2"]
+    assert items[1]["assets"]["ortho_visual"] == {
+        "href": "https://asset/1",
+        "roles": ["data"],
+        "type": "image/tiff",
+    }
+    assert items[1]["assets"]["thumbnail"]["href"] == f"{BASE_URL}collections/PSScene/items/1/thumbnail"
+
+
+def test_asset_listings_are_cached_per_credential() -> None:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["Authorization"])
+        return httpx.Response(200, json={})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    first_user = PlanetSession(client=client, auth=httpx.BasicAuth(username="key-1", password=""))
+    second_user = PlanetSession(client=client, auth=httpx.BasicAuth(username="key-2", password=""))
+    planet_item = _planet_item("cached")
+
+    async def run() -> None:
+        await map_items([planet_item], BASE_URL, first_user)
+        await map_items([planet_item], BASE_URL, first_user)
+        await map_items([planet_item], BASE_URL, second_user)
+
+    with patch("stac_planet_api.response_adaptor.ASSET_CACHE", Cache(MemoryCacheBackend(16), "assets", ttl=60)):
+        asyncio.run(run())
+
+    assert len(calls) == 2
+    assert calls[0] != calls[1]
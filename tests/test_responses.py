@@ -0,0 +1,26 @@
+"""Tests for serialising STAC responses."""
+
+from unittest.mock import patch
+
+import orjson
+import pytest
+from fastapi import Request
+from pydantic import ValidationError
+from stac_pydantic.item_collection import ItemCollection
+
+from stac_planet_api.api import stac_response
+
+INVALID_COLLECTION = {"type": "FeatureCollection", "features": [{"id": "no-geometry"}], "links": []}
+REQUEST = Request({"type": "http", "method": "GET", "headers": []})
+
+
+def test_responses_are_serialised_without_validation_by_default() -> None:
+    response = stac_response(REQUEST, INVALID_COLLECTION, model=ItemCollection, max_age=60)
+
+    assert response.media_type == "application/geo+json"
+    assert orjson.loads(response.body) == INVALID_COLLECTION
+
+
+def test_responses_are_validated_in_strict_mode() -> None:
+    with patch("stac_planet_api.api.settings.validate_responses", True), pytest.raises(ValidationError):
+        stac_response(REQUEST, INVALID_COLLECTION, model=ItemCollection, max_age=60)
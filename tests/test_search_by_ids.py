@@ -0,0 +1,113 @@
+"""Tests for searching Planet items by id."""
+
+import asyncio
+import json
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+
+from stac_planet_api import api
+from stac_planet_api.api import search_planet_items_by_id
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.singleflight import SingleFlight
+
+CATALOGUE = {("PSScene", "ps-1"), ("PSScene", "ps-2"), ("SkySatCollect", "ssc-1")}
+
+
+def _planet_item(collection_id: str, item_id: str) -> dict[str, Any]:
+    return {"id": item_id, "properties": {"item_type": collection_id}}
+
+
+def _session(requests: list[httpx.Request]) -> PlanetSession:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+
+        if request.url.path.endswith("quick-search"):
+            body = json.loads(request.content)
+            return httpx.Response(
+                200,
+                json={
+                    "features": [
+                        _planet_item(collection_id, item_id)
+                        for collection_id, item_id in sorted(CATALOGUE)
+                        if collection_id in body["item_types"] and item_id in body["filter"]["config"]
+                    ]
+                },
+            )
+
+        _, collection_id, _, item_id = request.url.path.removeprefix("/data/v1/").split("/")
+        if (collection_id, item_id) in CATALOGUE:
+            return httpx.Response(200, json=_planet_item(collection_id, item_id))
+        return httpx.Response(404, json={})
+
+    return PlanetSession(
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        auth=httpx.BasicAuth(username="key", password=""),
+    )
+
+
+def test_items_are_probed_per_id_and_returned_in_order() -> None:
+    requests: list[httpx.Request] = []
+
+    planet_items = asyncio.run(
+        search_planet_items_by_id(
+            _session(requests), ids=["ssc-1", "missing", "ps-1"], collections=["PSScene", "SkySatCollect"]
+        )
+    )
+
+    assert [planet_item["id"] for planet_item in planet_items] == ["ssc-1", "ps-1"]
+    assert not any(request.url.path.endswith("quick-search") for request in requests)
+
+
+def test_hinted_collection_is_probed_first() -> None:
+    requests: list[httpx.Request] = []
+    api.ITEM_COLLECTION_HINTS.set("ssc-1", "SkySatCollect")
+
+    planet_items = asyncio.run(
+        search_planet_items_by_id(_session(requests), ids=["ssc-1"], collections=["PSScene", "SkySatCollect"])
+    )
+
+    assert [planet_item["id"] for planet_item in planet_items] == ["ssc-1"]
+    assert [request.url.path for request in requests] == ["/data/v1/item-types/SkySatCollect/items/ssc-1"]
+
+
+def test_losing_probes_are_cancelled() -> None:
+    finished: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if "/SkySatCollect/" in request.url.path:
+            return httpx.Response(200, json=_planet_item("SkySatCollect", "ssc-1"))
+        await asyncio.sleep(0.1)
+        finished.append(request.url.path)
+        return httpx.Response(404, json={})
+
+    session = PlanetSession(
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        auth=httpx.BasicAuth(username="key", password=""),
+        single_flight=SingleFlight(),
+    )
+
+    async def search() -> list[dict[str, Any]]:
+        planet_items = await search_planet_items_by_id(
+            session, ids=["ssc-1"], collections=["PSScene", "SkySatCollect"]
+        )
+        await asyncio.sleep(0.2)
+        return planet_items
+
+    assert [planet_item["id"] for planet_item in asyncio.run(search())] == ["ssc-1"]
+    assert finished == []
+
+
+def test_long_id_lists_use_quick_search() -> None:
+    requests: list[httpx.Request] = []
+
+    with patch("stac_planet_api.api.settings.ids_quick_search_threshold", 2):
+        planet_items = asyncio.run(
+            search_planet_items_by_id(
+                _session(requests), ids=["ps-2", "ssc-1", "ps-1"], collections=["PSScene", "SkySatCollect"]
+            )
+        )
+
+    assert [planet_item["id"] for planet_item in planet_items] == ["ps-2", "ssc-1", "ps-1"]
+    assert len(requests) == 1
@@ -0,0 +1,131 @@
+"""Tests for coalescing identical concurrent upstream calls."""
+
+import asyncio
+import contextlib
+
+import httpx
+import pytest
+
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result() -> None:
+    single_flight: SingleFlight[int] = SingleFlight()
+    calls = 0
+
+    async def call() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def run() -> list[int]:
+        return await asyncio.gather(*(single_flight.do("key", call) for _ in range(5)))
+
+    assert asyncio.run(run()) == [1] * 5
+    assert calls == 1
+    assert single_flight.stats.calls == 5
+    assert single_flight.stats.collapsed == 4
+    assert len(single_flight) == 0
+
+
+def test_exceptions_are_shared() -> None:
+    single_flight: SingleFlight[int] = SingleFlight()
+
+    async def call() -> int:
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def run() -> list[int | BaseException]:
+        return await asyncio.gather(*(single_flight.do("key", call) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert single_flight.stats.collapsed == 2
+
+
+def test_calls_after_a_cancellation_start_afresh() -> None:
+    single_flight: SingleFlight[int] = SingleFlight()
+    calls = 0
+
+    async def call() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def run() -> int:
+        first = asyncio.ensure_future(single_flight.do("key", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await first
+        # The cancelled call hasn't finished yet, but isn't joined
+        return await single_flight.do("key", call)
+
+    assert asyncio.run(run()) == 2
+
+
+@pytest.mark.parametrize(
+    ("first", "second", "upstream_calls"),
+    [
+        (("key-1", {"a": 1, "b": 2}), ("key-1", {"b": 2, "a": 1}), 1),
+        (("key-1", {"a": 1}), ("key-1", {"a": 2}), 2),
+        (("key-1", {"a": 1}), ("key-2", {"a": 1}), 2),
+    ],
+)
+def test_session_coalesces_by_body_and_credentials(
+    first: tuple[str, dict], second: tuple[str, dict], upstream_calls: int
+) -> None:
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    single_flight: SingleFlight[httpx.Response] = SingleFlight()
+
+    async def search(api_key: str, body: dict) -> httpx.Response:
+        session = PlanetSession(client, httpx.BasicAuth(username=api_key, password=""), single_flight=single_flight)
+        return await session.post("https://api.planet.com/data/v1/quick-search", json=body)
+
+    async def run() -> None:
+        await asyncio.gather(search(*first), search(*second))
+
+    asyncio.run(run())
+
+    assert calls == upstream_calls
+
+
+def test_call_is_cancelled_once_every_caller_is() -> None:
+    single_flight: SingleFlight[int] = SingleFlight()
+    finished = False
+
+    async def call() -> int:
+        nonlocal finished
+        await asyncio.sleep(0.05)
+        finished = True
+        return 1
+
+    async def run() -> None:
+        callers = [asyncio.ensure_future(single_flight.do("key", call)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        callers[0].cancel()
+        await asyncio.sleep(0.01)
+        # The call carries on while a caller is still waiting for it
+        assert len(single_flight) == 1
+
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert len(single_flight) == 0
+
+    asyncio.run(run())
+
+    assert not finished
@@ -0,0 +1,40 @@
+"""Tests for streaming search responses."""
+
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import orjson
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app
+from stac_planet_api.client import PlanetSession
+
+
+def test_streamed_search_matches_buffered_search(
+    planet_item: Callable[..., dict[str, Any]], planet_session: Callable[[Callable], PlanetSession]
+) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("quick-search"):
+            return httpx.Response(
+                200,
+                json={
+                    "features": [planet_item(str(i)) for i in range(5)],
+                    "_links": {"_next": "https://api.planet.com/data/v1/searches/abc/results?_page=next"},
+                },
+            )
+        return httpx.Response(200, json={})
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=planet_session(handler)):
+        client = TestClient(app)
+        buffered = client.post("/search", json={"collections": ["PSScene"]}, auth=("test-api-key", ""))
+        streamed = client.post("/search?stream=true", json={"collections": ["PSScene"]}, auth=("test-api-key", ""))
+
+    assert streamed.status_code == 200
+    assert streamed.headers["content-type"] == "application/geo+json"
+
+    buffered_json, streamed_json = buffered.json(), orjson.loads(streamed.content)
+    assert [feature["id"] for feature in streamed_json["features"]] == ["0", "1", "2", "3", "4"]
+    assert streamed_json["features"] == buffered_json["features"]
+    assert [link["rel"] for link in streamed_json["links"]] == [link["rel"] for link in buffered_json["links"]]
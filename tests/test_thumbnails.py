@@ -0,0 +1,227 @@
+"""Tests for proxying item thumbnails through the on-disk cache."""
+
+import gzip
+import io
+from collections.abc import Callable
+from email.parser import BytesParser
+from email.policy import HTTP
+from pathlib import Path
+from types import ModuleType
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app, settings
+from stac_planet_api.client import PlanetSession
+from stac_planet_api.disk_cache import DiskLRUCache
+
+THUMBNAIL = b"\x89PNG" + b"0" * 1000
+
+
+@pytest.fixture
+def image() -> ModuleType:
+    """Pillow's Image module, skipping the test if Pillow isn't installed."""
+    return pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def planet(planet_session: Callable[[Callable], PlanetSession]) -> tuple[PlanetSession, list[httpx.Request]]:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("/missing/thumb"):
+            return httpx.Response(404)
+        return httpx.Response(200, content=THUMBNAIL, headers={"content-type": "image/webp"})
+
+    return planet_session(handler), requests
+
+
+def test_thumbnails_are_streamed_then_served_from_disk(planet: tuple[PlanetSession, list[httpx.Request]]) -> None:
+    session, requests = planet
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        client = TestClient(app)
+        streamed = client.get("/collections/PSScene/items/1/thumbnail", auth=("test-api-key", ""))
+        cached = client.get("/collections/PSScene/items/1/thumbnail", auth=("test-api-key", ""))
+        not_modified = client.get(
+            "/collections/PSScene/items/1/thumbnail",
+            auth=("test-api-key", ""),
+            headers={"If-None-Match": cached.headers["etag"]},
+        )
+
+    assert [str(request.url) for request in requests] == [
+        "https://tiles.planet.com/data/v1/item-types/PSScene/items/1/thumb"
+    ]
+    assert streamed.content == cached.content == THUMBNAIL
+    assert streamed.headers["content-type"] == cached.headers["content-type"] == "image/webp"
+    assert streamed.headers["content-length"] == str(len(THUMBNAIL))
+    assert cached.headers["cache-control"] == f"max-age={settings.thumbnail_max_age}"
+    assert not_modified.status_code == 304
+
+
+def test_compressed_thumbnails_are_streamed_without_their_compressed_length(
+    planet_session: Callable[[Callable], PlanetSession],
+) -> None:
+    compressed = gzip.compress(THUMBNAIL)
+    session = planet_session(
+        lambda request: httpx.Response(
+            200, content=compressed, headers={"content-type": "image/webp", "content-encoding": "gzip"}
+        )
+    )
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        response = TestClient(app).get("/collections/PSScene/items/1/thumbnail", auth=("test-api-key", ""))
+
+    assert response.content == THUMBNAIL
+    assert response.headers.get("content-length") != str(len(compressed))
+
+
+def test_missing_thumbnails_are_not_found(planet: tuple[PlanetSession, list[httpx.Request]]) -> None:
+    session, _ = planet
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        response = TestClient(app).get("/collections/PSScene/items/missing/thumbnail", auth=("test-api-key", ""))
+
+    assert response.status_code == 404
+    assert response.headers["cache-control"] == "no-store"
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = DiskLRUCache(tmp_path, max_bytes=25, ttl=60)
+
+    for key in ["a", "b", "c"]:
+        with cache.writer(key, media_type="image/png") as writer:
+            assert writer is not None
+            writer.write(key.encode() * 10)
+        if key == "b":
+            assert cache.get("a") is not None
+    cached = cache.get("c")
+    assert cached is not None
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.size == 20
+    assert len(list(tmp_path.iterdir())) == 2
+
+    reloaded = DiskLRUCache(tmp_path, max_bytes=25, ttl=60)
+    # Entries are reloaded without reading the files
+    with patch.object(Path, "read_bytes", side_effect=AssertionError):
+        entry = reloaded.get("c")
+    assert entry is not None
+    assert entry.media_type == "image/png"
+    assert entry.etag == cached.etag
+    assert entry.path.read_bytes() == b"c" * 10
+
+
+def test_incomplete_thumbnails_are_not_cached(tmp_path: Path) -> None:
+    cache = DiskLRUCache(tmp_path, max_bytes=100, ttl=60)
+
+    def interrupted_download() -> None:
+        with cache.writer("a", media_type="image/png") as writer:
+            assert writer is not None
+            writer.write(b"partial")
+            raise ConnectionError
+
+    with pytest.raises(ConnectionError):
+        interrupted_download()
+
+    with cache.writer("b", media_type="image/png") as writer:
+        assert writer is not None
+        writer.write(b"0" * 101)
+
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.fixture
+def gallery(
+    image: ModuleType, planet_session: Callable[[Callable], PlanetSession]
+) -> tuple[PlanetSession, list[httpx.Request]]:
+    requests: list[httpx.Request] = []
+    output = io.BytesIO()
+    image.new("RGB", (256, 256), "red").save(output, format="PNG")
+    png = output.getvalue()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if "/missing/" in request.url.path:
+            return httpx.Response(404)
+        return httpx.Response(200, content=png, headers={"content-type": "image/png"})
+
+    return planet_session(handler), requests
+
+
+def test_batch_thumbnails_are_returned_as_multipart(
+    image: ModuleType, gallery: tuple[PlanetSession, list[httpx.Request]]
+) -> None:
+    session, requests = gallery
+    items = [{"collection": "PSScene", "id": item_id} for item_id in ["1", "missing", "2"]]
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        client = TestClient(app)
+        response = client.post("/thumbnails", json={"items": items, "size": 64}, auth=("test-api-key", ""))
+        client.post("/thumbnails", json={"items": items}, auth=("test-api-key", ""))
+
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {response.headers['content-type']}\r\n\r\n".encode() + response.content
+    )
+    parts = list(message.iter_parts())
+
+    assert [part["Content-Location"] for part in parts] == [
+        "http://testserver/collections/PSScene/items/1/thumbnail",
+        "http://testserver/collections/PSScene/items/2/thumbnail",
+    ]
+    assert image.open(io.BytesIO(parts[0].get_content())).size == (64, 64)
+    # Found thumbnails are served from the cache the second time
+    assert len(requests) == 4
+
+
+def test_batch_thumbnails_are_returned_as_a_sprite(
+    image: ModuleType, gallery: tuple[PlanetSession, list[httpx.Request]]
+) -> None:
+    session, _ = gallery
+    items = [{"collection": "PSScene", "id": str(item_id)} for item_id in range(5)]
+
+    with patch("stac_planet_api.api.get_authenticated_client", return_value=session):
+        response = TestClient(app).post(
+            "/thumbnails", json={"items": items, "size": 32, "format": "sprite"}, auth=("test-api-key", "")
+        )
+
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["x-sprite-columns"] == "3"
+    assert image.open(io.BytesIO(response.content)).size == (96, 64)
+
+
+def test_batch_size_is_limited(gallery: tuple[PlanetSession, list[httpx.Request]]) -> None:
+    session, requests = gallery
+    items = [{"collection": "PSScene", "id": str(item_id)} for item_id in range(3)]
+
+    with (
+        patch("stac_planet_api.api.get_authenticated_client", return_value=session),
+        patch("stac_planet_api.api.settings.thumbnail_batch_max_items", 2),
+    ):
+        response = TestClient(app).post("/thumbnails", json={"items": items}, auth=("test-api-key", ""))
+
+    assert response.status_code == 400
+    assert requests == []
+
+
+def test_sprite_size_is_limited(gallery: tuple[PlanetSession, list[httpx.Request]]) -> None:
+    session, requests = gallery
+    items = [{"collection": "PSScene", "id": str(item_id)} for item_id in range(5)]
+
+    with (
+        patch("stac_planet_api.api.get_authenticated_client", return_value=session),
+        patch("stac_planet_api.api.settings.thumbnail_sprite_max_pixels", 6 * 32 * 32 - 1),
+        patch("stac_planet_api.api.can_resize", return_value=True),
+    ):
+        response = TestClient(app).post(
+            "/thumbnails", json={"items": items, "size": 32, "format": "sprite"}, auth=("test-api-key", "")
+        )
+
+    assert response.status_code == 400
+    assert requests == []
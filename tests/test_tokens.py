@@ -0,0 +1,90 @@
+"""Tests for compact pagination tokens."""
+
+from unittest.mock import patch
+
+import pytest
+from cryptography.fernet import Fernet
+from fastapi.testclient import TestClient
+
+from stac_planet_api.api import app
+from stac_planet_api.tokens import InvalidToken, TokenCodec
+
+KEY = Fernet.generate_key().decode()
+LINK = (
+    "https://api.planet.com/data/v1/searches/0f1e2d3c4b5a69788796a5b4c3d2e1f0/results"
+    "?_page=eyJzb3J0X2xhc3RfaWQiOiAiMjAyNDAxMDFfMTAwMDAwXzEyXzI0Y2YifQ&_page_size=250&_sort=acquired+desc"
+)
+RESIDUAL = b'{"op":"s_intersects","args":[{"property":"geometry"},{"type":"Point","coordinates":[0,0]}]}'
+
+
+def test_tokens_round_trip() -> None:
+    codec = TokenCodec(KEY)
+
+    token = codec.decode(codec.encode(LINK, "api-key", RESIDUAL))
+    other_link = codec.decode(codec.encode("https://example.com/page?2", ""))
+    offset = codec.decode(codec.encode(LINK, "api-key", RESIDUAL, 12))
+
+    assert (token.link, token.api_key, token.residual_json, token.offset) == (LINK, "api-key", RESIDUAL, 0)
+    assert (offset.link, offset.api_key, offset.residual_json, offset.offset) == (LINK, "api-key", RESIDUAL, 12)
+    assert token.residual == {
+        "op": "s_intersects",
+        "args": [{"property": "geometry"}, {"type": "Point", "coordinates": [0, 0]}],
+    }
+    assert (other_link.link, other_link.api_key, other_link.residual) == ("https://example.com/page?2", "", None)
+
+
+def test_tokens_are_compact_and_stable() -> None:
+    codec = TokenCodec(KEY)
+    previous = Fernet(KEY).encrypt(f"{LINK}\\api-key\\{RESIDUAL.decode()}".encode()).decode()
+
+    token = codec.encode(LINK, "api-key", RESIDUAL)
+
+    assert len(token) < len(previous) * 0.75
+    assert token == TokenCodec(KEY).encode(LINK, "api-key", RESIDUAL)
+    assert token != codec.encode(LINK, "other-key", RESIDUAL)
+
+
+def test_tokens_from_earlier_releases_are_accepted() -> None:
+    previous = Fernet(KEY).encrypt(f"{LINK}\\api-key\\{RESIDUAL.decode()}".encode()).decode()
+
+    token = TokenCodec(KEY).decode(previous)
+
+    assert (token.link, token.api_key, token.residual_json) == (LINK, "api-key", RESIDUAL)
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "not a token!",
+        "AQ",
+        TokenCodec(Fernet.generate_key().decode()).encode(LINK, "api-key"),
+        Fernet(Fernet.generate_key()).encrypt(b"link\\api-key").decode(),
+    ],
+)
+def test_tokens_from_elsewhere_are_rejected(token: str) -> None:
+    with pytest.raises(InvalidToken):
+        TokenCodec(KEY).decode(token)
+
+
+def test_tampered_tokens_are_rejected() -> None:
+    token = TokenCodec(KEY).encode(LINK, "api-key")
+    tampered = token[:20] + ("A" if token[20] != "A" else "B") + token[21:]
+
+    with pytest.raises(InvalidToken):
+        TokenCodec(KEY).decode(tampered)
+
+
+def test_decoded_tokens_are_memoised() -> None:
+    codec = TokenCodec(KEY)
+    token = codec.encode(LINK, "api-key")
+
+    assert codec.decode(token) is codec.decode(token)
+    assert codec.decode.cache_info().hits == 1
+
+
+def test_invalid_search_tokens_are_bad_requests() -> None:
+    with patch("stac_planet_api.api.get_authenticated_client") as get_authenticated_client:
+        response = TestClient(app).get("/search", params={"token": "not-a-token"}, auth=("test-api-key", ""))
+
+    assert response.status_code == 400
+    get_authenticated_client.assert_not_called()